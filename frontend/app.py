@@ -26,6 +26,7 @@ Utilisez le menu lateral pour naviguer entre les differentes sections:
 - **Salles** - Occupation des amphis et salles
 - **Conflits** - Detection et analyse des conflits
 - **Optimisation** - Generation automatique des plannings
+- **Etudiants** - Planning d'examens d'un etudiant (matricule ou nom)
 """)
 
 # Quick stats in the main page
@@ -34,25 +35,26 @@ st.subheader("Apercu Rapide")
 
 try:
     from utils.db import get_connection
+    from scripts import queries
 
     conn = get_connection()
     cur = conn.cursor()
 
     col1, col2, col3, col4 = st.columns(4)
 
-    cur.execute("SELECT COUNT(*) FROM etudiants")
+    cur.execute(queries.COUNT_STUDENTS)
     with col1:
         st.metric("Etudiants", f"{cur.fetchone()[0]:,}")
 
-    cur.execute("SELECT COUNT(*) FROM modules")
+    cur.execute(queries.COUNT_MODULES)
     with col2:
         st.metric("Modules", f"{cur.fetchone()[0]:,}")
 
-    cur.execute("SELECT COUNT(*) FROM professeurs")
+    cur.execute(queries.COUNT_PROFESSORS)
     with col3:
         st.metric("Professeurs", f"{cur.fetchone()[0]:,}")
 
-    cur.execute("SELECT COUNT(*) FROM examens")
+    cur.execute(queries.COUNT_EXAMS)
     with col4:
         st.metric("Examens Planifies", f"{cur.fetchone()[0]:,}")
 
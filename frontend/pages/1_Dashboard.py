@@ -4,9 +4,19 @@ Dashboard - KPIs et statistiques globales
 
 import streamlit as st
 import pandas as pd
-from utils.db import get_connection, execute_with_timing
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from utils.db import get_connection
+from utils.debug import debug_panel, trace_page
+from scripts.benchmark import flag_regressions, load_history, load_plan, run_benchmark
+from scripts.kpi import load_kpis
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
+trace_page("Dashboard")
 st.title("Dashboard - KPIs Academiques")
 st.markdown("---")
 
@@ -14,30 +24,26 @@ try:
     conn = get_connection()
     cur = conn.cursor()
 
+    # KPI snapshot computed by the optimizer for the current schedule version
+    version_id, kpis = load_kpis(cur)
+    if kpis is None:
+        st.warning("Aucun planning genere. Lancez l'optimisation pour calculer les indicateurs.")
+        st.stop()
+
     # === Section 1: KPIs principaux ===
     st.subheader("Indicateurs Cles")
 
     col1, col2, col3, col4, col5 = st.columns(5)
-
-    cur.execute("SELECT COUNT(*) FROM etudiants")
     with col1:
-        st.metric("Etudiants", f"{cur.fetchone()[0]:,}")
-
-    cur.execute("SELECT COUNT(*) FROM formations")
+        st.metric("Etudiants", f"{kpis['etudiants']:,}")
     with col2:
-        st.metric("Formations", f"{cur.fetchone()[0]:,}")
-
-    cur.execute("SELECT COUNT(DISTINCT module_id) FROM examens")
+        st.metric("Formations", f"{kpis['formations']:,}")
     with col3:
-        st.metric("Modules Planifies", cur.fetchone()[0])
-
-    cur.execute("SELECT COUNT(*) FROM surveillances")
+        st.metric("Modules Planifies", kpis["modules_planifies"])
     with col4:
-        st.metric("Surveillances", f"{cur.fetchone()[0]:,}")
-
-    cur.execute("SELECT COUNT(DISTINCT DATE(date_heure)) FROM examens")
+        st.metric("Surveillances", f"{kpis['surveillances']:,}")
     with col5:
-        st.metric("Jours d'Examen", cur.fetchone()[0])
+        st.metric("Jours d'Examen", kpis["jours_examen"])
 
     st.markdown("---")
 
@@ -47,37 +53,19 @@ try:
     col1, col2 = st.columns(2)
 
     with col1:
-        cur.execute("""
-            SELECT MIN(cnt), AVG(cnt), MAX(cnt)
-            FROM (SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id) t
-        """)
-        row = cur.fetchone()
-        if row and row[0]:
-            st.metric("Sessions Min/Moy/Max", f"{row[0]} / {row[1]:.1f} / {row[2]}")
+        sessions = kpis["sessions"]
+        if sessions["max"]:
+            st.metric("Sessions Min/Moy/Max",
+                      f"{sessions['min']} / {sessions['moy']:.1f} / {sessions['max']}")
 
             # Distribution des sessions
-            cur.execute("""
-                SELECT cnt as sessions, COUNT(*) as professeurs
-                FROM (SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id) t
-                GROUP BY cnt ORDER BY cnt
-            """)
-            df = pd.DataFrame(cur.fetchall(), columns=["Sessions", "Professeurs"])
+            df = pd.DataFrame(sessions["distribution"], columns=["Sessions", "Professeurs"])
             st.bar_chart(df.set_index("Sessions"))
 
     with col2:
         # Professeurs par departement
-        cur.execute("""
-            SELECT d.nom, COUNT(p.id) as profs,
-                   COALESCE(SUM(surv.cnt), 0) as total_sessions
-            FROM departements d
-            LEFT JOIN professeurs p ON p.dept_id = d.id
-            LEFT JOIN (
-                SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id
-            ) surv ON surv.prof_id = p.id
-            GROUP BY d.id, d.nom
-            ORDER BY total_sessions DESC
-        """)
-        df = pd.DataFrame(cur.fetchall(), columns=["Departement", "Professeurs", "Sessions"])
+        df = pd.DataFrame(kpis["professeurs_par_dept"],
+                          columns=["Departement", "Professeurs", "Sessions"])
         st.dataframe(df, use_container_width=True)
 
     st.markdown("---")
@@ -86,45 +74,20 @@ try:
     st.subheader("Utilisation des Salles")
 
     col1, col2 = st.columns(2)
+    salles = kpis["salles"]
 
     with col1:
-        # Taux d'occupation global
-        cur.execute("SELECT COUNT(DISTINCT DATE(date_heure)) FROM examens")
-        num_days = cur.fetchone()[0] or 1
-
-        cur.execute("SELECT COUNT(*) FROM lieu_examens")
-        total_rooms = cur.fetchone()[0]
-
-        total_slots = num_days * 4 * total_rooms  # 4 slots per day
-
-        cur.execute("SELECT COUNT(*) FROM examens")
-        used_slots = cur.fetchone()[0]
-
-        occupancy = (used_slots / total_slots * 100) if total_slots > 0 else 0
-        st.metric("Taux d'Occupation Global", f"{occupancy:.1f}%")
+        st.metric("Taux d'Occupation Global", f"{salles['taux_occupation']:.1f}%")
+        st.metric("Taux de Remplissage", f"{salles['taux_remplissage']:.1f}%")
 
         # Par type de salle
-        cur.execute("""
-            SELECT l.type, COUNT(DISTINCT l.id) as salles,
-                   COUNT(e.id) as utilisations
-            FROM lieu_examens l
-            LEFT JOIN examens e ON e.lieu_examen_id = l.id
-            GROUP BY l.type
-        """)
-        df = pd.DataFrame(cur.fetchall(), columns=["Type", "Nombre", "Utilisations"])
+        df = pd.DataFrame(salles["par_type"], columns=["Type", "Nombre", "Utilisations"])
         st.dataframe(df, use_container_width=True)
 
     with col2:
         # Occupation par jour
-        cur.execute("""
-            SELECT DATE(date_heure) as jour, COUNT(*) as examens
-            FROM examens
-            GROUP BY DATE(date_heure)
-            ORDER BY jour
-        """)
-        df = pd.DataFrame(cur.fetchall(), columns=["Jour", "Examens"])
+        df = pd.DataFrame(salles["par_jour"], columns=["Jour", "Examens"])
         if not df.empty:
-            df["Jour"] = pd.to_datetime(df["Jour"]).dt.strftime("%d/%m")
             st.bar_chart(df.set_index("Jour"))
 
     st.markdown("---")
@@ -132,24 +95,7 @@ try:
     # === Section 4: Statistiques par departement ===
     st.subheader("Statistiques par Departement")
 
-    cur.execute("""
-        SELECT
-            d.nom as departement,
-            COUNT(DISTINCT e.id) as etudiants,
-            COUNT(DISTINCT m.id) as modules,
-            COUNT(DISTINCT ex.id) as examens,
-            COUNT(DISTINCT p.id) as professeurs
-        FROM departements d
-        LEFT JOIN specialites s ON s.dept_id = d.id
-        LEFT JOIN formations f ON f.specialite_id = s.id
-        LEFT JOIN etudiants e ON e.formation_id = f.id
-        LEFT JOIN modules m ON m.formation_id = f.id
-        LEFT JOIN examens ex ON ex.module_id = m.id
-        LEFT JOIN professeurs p ON p.dept_id = d.id
-        GROUP BY d.id, d.nom
-        ORDER BY etudiants DESC
-    """)
-    df = pd.DataFrame(cur.fetchall(),
+    df = pd.DataFrame(kpis["departements"],
                       columns=["Departement", "Etudiants", "Modules", "Examens", "Professeurs"])
     st.dataframe(df, use_container_width=True)
 
@@ -158,45 +104,42 @@ try:
     # === Section 5: Benchmarks Performance ===
     st.subheader("Benchmarks Performance")
 
-    benchmarks = []
-
-    # Test queries
-    queries = [
-        ("Count etudiants", "SELECT COUNT(*) FROM etudiants"),
-        ("Count formations", "SELECT COUNT(*) FROM formations"),
-        ("Examens avec jointures", """
-            SELECT e.id, m.nom, l.nom, e.date_heure
-            FROM examens e
-            JOIN modules m ON e.module_id = m.id
-            JOIN lieu_examens l ON e.lieu_examen_id = l.id
-            LIMIT 100
-        """),
-        ("Conflits etudiants", """
-            SELECT COUNT(*) FROM (
-                SELECT e.id, DATE(ex.date_heure), COUNT(DISTINCT ex.module_id)
-                FROM etudiants e
-                JOIN modules m ON e.formation_id = m.formation_id
-                JOIN examens ex ON m.id = ex.module_id
-                GROUP BY e.id, DATE(ex.date_heure)
-                HAVING COUNT(DISTINCT ex.module_id) > 1
-            ) t
-        """),
-        ("Sessions par professeur", """
-            SELECT p.id, p.nom, COUNT(s.examen_id)
-            FROM professeurs p
-            LEFT JOIN surveillances s ON s.prof_id = p.id
-            GROUP BY p.id, p.nom
-        """),
-    ]
-
-    for name, query in queries:
-        _, _, elapsed = execute_with_timing(query)
-        benchmarks.append({"Requete": name, "Temps (ms)": f"{elapsed*1000:.2f}"})
-
-    df = pd.DataFrame(benchmarks)
-    st.dataframe(df, use_container_width=True)
+    # Catalog of the pages' queries, timed on one connection (warmup + repetitions)
+    if st.button("Lancer le benchmark"):
+        with st.spinner("Benchmark en cours..."):
+            run_benchmark(conn)
+
+    history = load_history(cur)
+    if not history:
+        st.info("Aucun benchmark enregistre. Lancez-le ci-dessus ou avec python -m scripts.benchmark.")
+    else:
+        df = pd.DataFrame(history, columns=["Execution", "Date", "Page", "Requete",
+                                            "p50 (ms)", "p95 (ms)", "p99 (ms)", "Lignes examinees"])
+        last_run = df["Execution"].max()
+        regressions = flag_regressions(history)
+
+        latest = df[df["Execution"] == last_run].drop(columns=["Execution", "Date"])
+        latest["Regression"] = latest["Requete"].map(lambda name: "⚠️" if name in regressions else "")
+        st.caption(f"Execution {last_run} du {df['Date'].max():%d/%m/%Y %H:%M}")
+        st.dataframe(latest.round(2), use_container_width=True)
+
+        for name, (last, baseline) in regressions.items():
+            st.warning(f"{name}: p95 {last:.2f} ms (executions precedentes: {baseline:.2f} ms)")
+
+        # p95 trend per query over the recorded runs
+        trend = df.pivot(index="Execution", columns="Requete", values="p95 (ms)")
+        if len(trend) > 1:
+            st.line_chart(trend)
+
+        with st.expander("Plans d'execution (EXPLAIN)"):
+            name = st.selectbox("Requete", latest["Requete"].tolist())
+            plan = load_plan(cur, int(last_run), name)
+            st.dataframe(pd.DataFrame(plan), use_container_width=True)
 
     conn.close()
 
 except Exception as e:
     st.error(f"Erreur: {e}")
+
+# SQL timeline of this render (SQL_TRACE=1 or ?debug=1)
+debug_panel()
@@ -5,8 +5,11 @@ Conflits - Detection et analyse des conflits
 import streamlit as st
 import pandas as pd
 from utils.db import get_connection
+from utils.debug import debug_panel, trace_page
+from scripts import queries
 
 st.set_page_config(page_title="Conflits", page_icon="⚠️", layout="wide")
+trace_page("Conflits")
 st.title("Detection et Analyse des Conflits")
 st.markdown("---")
 
@@ -19,18 +22,11 @@ try:
 
     col1, col2, col3 = st.columns(3)
 
+    # Conflicts are precomputed after each optimization (scripts/analytics.py)
+
     # Student conflicts (>1 exam per day)
-    cur.execute("""
-        SELECT COUNT(*) FROM (
-            SELECT e.id, DATE(ex.date_heure), COUNT(DISTINCT ex.module_id) as cnt
-            FROM etudiants e
-            JOIN modules m ON e.formation_id = m.formation_id
-            JOIN examens ex ON m.id = ex.module_id
-            GROUP BY e.id, DATE(ex.date_heure)
-            HAVING cnt > 1
-        ) t
-    """)
-    student_conflicts = cur.fetchone()[0]
+    cur.execute(queries.STUDENT_CONFLICTS)
+    student_conflicts = int(cur.fetchone()[0])
 
     with col1:
         if student_conflicts == 0:
@@ -39,15 +35,7 @@ try:
             st.error(f"Conflits Etudiants: {student_conflicts}")
 
     # Professor conflicts (>3 exams per day)
-    cur.execute("""
-        SELECT COUNT(*) FROM (
-            SELECT s.prof_id, DATE(ex.date_heure), COUNT(*) as cnt
-            FROM surveillances s
-            JOIN examens ex ON s.examen_id = ex.id
-            GROUP BY s.prof_id, DATE(ex.date_heure)
-            HAVING cnt > 3
-        ) t
-    """)
+    cur.execute(queries.PROFESSOR_CONFLICTS)
     prof_conflicts = cur.fetchone()[0]
 
     with col2:
@@ -57,18 +45,7 @@ try:
             st.error(f"Conflits Professeurs: {prof_conflicts}")
 
     # Room capacity conflicts
-    cur.execute("""
-        SELECT COUNT(*) FROM (
-            SELECT m.id,
-                   (SELECT COUNT(*) FROM etudiants e WHERE e.formation_id = m.formation_id) as enrollment,
-                   SUM(l.capacite) as capacity
-            FROM modules m
-            JOIN examens ex ON ex.module_id = m.id
-            JOIN lieu_examens l ON ex.lieu_examen_id = l.id
-            GROUP BY m.id
-            HAVING enrollment > capacity
-        ) t
-    """)
+    cur.execute(queries.CAPACITY_CONFLICTS)
     room_conflicts = cur.fetchone()[0]
 
     with col3:
@@ -83,28 +60,10 @@ try:
     st.subheader("Conflits Etudiants (>1 examen/jour)")
 
     if student_conflicts > 0:
-        cur.execute("""
-            SELECT
-                e.id as etudiant_id,
-                CONCAT(e.prenom, ' ', e.nom) as etudiant,
-                d.nom as departement,
-                DATE_FORMAT(ex.date_heure, '%d/%m/%Y') as date,
-                COUNT(DISTINCT ex.module_id) as nb_examens,
-                GROUP_CONCAT(DISTINCT m.nom SEPARATOR ', ') as modules
-            FROM etudiants e
-            JOIN formations f ON e.formation_id = f.id
-            JOIN specialites s ON f.specialite_id = s.id
-            JOIN departements d ON s.dept_id = d.id
-            JOIN modules m ON m.formation_id = e.formation_id
-            JOIN examens ex ON m.id = ex.module_id
-            GROUP BY e.id, e.prenom, e.nom, d.nom, DATE(ex.date_heure)
-            HAVING COUNT(DISTINCT ex.module_id) > 1
-            ORDER BY nb_examens DESC, date
-            LIMIT 100
-        """)
+        cur.execute(queries.STUDENT_CONFLICT_DETAIL)
         results = cur.fetchall()
         df = pd.DataFrame(results,
-                          columns=["ID", "Etudiant", "Departement", "Date", "Nb Examens", "Modules"])
+                          columns=["Departement", "Formation", "Date", "Nb Examens", "Etudiants"])
         st.dataframe(df, use_container_width=True)
     else:
         st.success("Aucun conflit etudiant detecte. Tous les etudiants ont maximum 1 examen par jour.")
@@ -114,27 +73,7 @@ try:
     # === Conflicts by Department ===
     st.subheader("Taux de Conflits par Departement")
 
-    cur.execute("""
-        SELECT
-            d.nom as departement,
-            COUNT(DISTINCT e.id) as total_etudiants,
-            COUNT(DISTINCT CASE WHEN conflict.cnt > 1 THEN conflict.etudiant_id END) as etudiants_en_conflit,
-            ROUND(COUNT(DISTINCT CASE WHEN conflict.cnt > 1 THEN conflict.etudiant_id END) * 100.0 /
-                  NULLIF(COUNT(DISTINCT e.id), 0), 2) as taux_conflit
-        FROM departements d
-        JOIN specialites s ON s.dept_id = d.id
-        JOIN formations f ON f.specialite_id = s.id
-        JOIN etudiants e ON e.formation_id = f.id
-        LEFT JOIN (
-            SELECT et.id as etudiant_id, DATE(ex.date_heure) as jour, COUNT(DISTINCT ex.module_id) as cnt
-            FROM etudiants et
-            JOIN modules m ON et.formation_id = m.formation_id
-            JOIN examens ex ON m.id = ex.module_id
-            GROUP BY et.id, DATE(ex.date_heure)
-        ) conflict ON conflict.etudiant_id = e.id
-        GROUP BY d.id, d.nom
-        ORDER BY taux_conflit DESC
-    """)
+    cur.execute(queries.DEPT_CONFLICT_RATES)
 
     results = cur.fetchall()
     df = pd.DataFrame(results,
@@ -150,28 +89,7 @@ try:
     # === Conflicts by Formation ===
     st.subheader("Conflits par Formation")
 
-    cur.execute("""
-        SELECT
-            d.nom as departement,
-            CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre) as formation,
-            COUNT(DISTINCT e.id) as total_etudiants,
-            COUNT(DISTINCT CASE WHEN conflict.cnt > 1 THEN conflict.etudiant_id END) as en_conflit
-        FROM departements d
-        JOIN specialites sp ON sp.dept_id = d.id
-        JOIN formations f ON f.specialite_id = sp.id
-        JOIN etudiants e ON e.formation_id = f.id
-        LEFT JOIN (
-            SELECT et.id as etudiant_id, DATE(ex.date_heure) as jour, COUNT(DISTINCT ex.module_id) as cnt
-            FROM etudiants et
-            JOIN modules m ON et.formation_id = m.formation_id
-            JOIN examens ex ON m.id = ex.module_id
-            GROUP BY et.id, DATE(ex.date_heure)
-        ) conflict ON conflict.etudiant_id = e.id
-        GROUP BY d.id, d.nom, f.id, sp.nom, f.cycle, f.semestre
-        HAVING en_conflit > 0
-        ORDER BY en_conflit DESC
-        LIMIT 50
-    """)
+    cur.execute(queries.FORMATION_CONFLICTS)
 
     results = cur.fetchall()
     if results:
@@ -190,20 +108,7 @@ try:
 
     with col1:
         st.write("**Professeurs avec plus de 3 surveillances/jour**")
-        cur.execute("""
-            SELECT
-                p.nom as professeur,
-                d.nom as departement,
-                DATE_FORMAT(ex.date_heure, '%d/%m/%Y') as date,
-                COUNT(*) as surveillances
-            FROM professeurs p
-            JOIN departements d ON p.dept_id = d.id
-            JOIN surveillances s ON s.prof_id = p.id
-            JOIN examens ex ON s.examen_id = ex.id
-            GROUP BY p.id, p.nom, d.nom, DATE(ex.date_heure)
-            HAVING COUNT(*) > 3
-            ORDER BY surveillances DESC
-        """)
+        cur.execute(queries.PROFESSOR_OVERLOADS)
         results = cur.fetchall()
         if results:
             df = pd.DataFrame(results, columns=["Professeur", "Departement", "Date", "Surveillances"])
@@ -213,21 +118,7 @@ try:
 
     with col2:
         st.write("**Distribution des sessions**")
-        cur.execute("""
-            SELECT
-                CASE
-                    WHEN cnt <= 5 THEN '1-5'
-                    WHEN cnt <= 8 THEN '6-8'
-                    WHEN cnt <= 10 THEN '9-10'
-                    ELSE '11+'
-                END as tranche,
-                COUNT(*) as professeurs
-            FROM (
-                SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id
-            ) t
-            GROUP BY tranche
-            ORDER BY MIN(cnt)
-        """)
+        cur.execute(queries.SESSION_BRACKETS)
         results = cur.fetchall()
         df = pd.DataFrame(results, columns=["Sessions", "Professeurs"])
         st.dataframe(df, use_container_width=True)
@@ -265,3 +156,6 @@ except Exception as e:
     st.error(f"Erreur: {e}")
     import traceback
     st.code(traceback.format_exc())
+
+# SQL timeline of this render (SQL_TRACE=1 or ?debug=1)
+debug_panel()
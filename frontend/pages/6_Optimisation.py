@@ -12,8 +12,12 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from utils.db import get_connection
+from scripts import queries
+from scripts.runs import flag_regressions, load_runs
+from utils.debug import debug_panel, trace_page
 
 st.set_page_config(page_title="Optimisation", page_icon="⚡", layout="wide")
+trace_page("Optimisation")
 st.title("Optimisation des Emplois du Temps")
 st.markdown("---")
 
@@ -26,10 +30,10 @@ try:
 
     col1, col2, col3, col4 = st.columns(4)
 
-    cur.execute("SELECT COUNT(*) FROM modules")
+    cur.execute(queries.COUNT_MODULES)
     total_modules = cur.fetchone()[0]
 
-    cur.execute("SELECT COUNT(DISTINCT module_id) FROM examens")
+    cur.execute(queries.SCHEDULED_MODULES)
     scheduled_modules = cur.fetchone()[0]
 
     with col1:
@@ -42,7 +46,7 @@ try:
         pct = (scheduled_modules / total_modules * 100) if total_modules > 0 else 0
         st.metric("Couverture", f"{pct:.0f}%")
 
-    cur.execute("SELECT COUNT(*) FROM examens")
+    cur.execute(queries.COUNT_EXAMS)
     with col4:
         st.metric("Examens", cur.fetchone()[0])
 
@@ -85,6 +89,12 @@ try:
     Cette operation prend environ 1 seconde.
     """)
 
+    sync_labels = {"Aucune": None, "Par departement": "departement", "Par cycle": "cycle"}
+    sync_label = st.selectbox(
+        "Sessions communes", list(sync_labels),
+        help="Modules communs (meme nom) passes dans le meme creneau, en partageant salles et surveillants",
+    )
+
     if st.button("Lancer l'Optimisation", type="primary"):
         with st.spinner("Optimisation en cours..."):
             try:
@@ -92,7 +102,7 @@ try:
                 from scripts.optimize import optimize_schedule
 
                 start_time = time.time()
-                result = optimize_schedule()
+                result = optimize_schedule(sync=sync_labels[sync_label])
                 elapsed = time.time() - start_time
 
                 st.success(f"Optimisation terminee en {elapsed:.2f} secondes!")
@@ -109,6 +119,28 @@ try:
                 with col3:
                     st.metric("Surveillances", result.get("num_surveillances", 0))
 
+                st.write("**Objectifs secondaires**")
+                soft_score = result["soft_score"]
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Jours de repos perdus", f"{soft_score['espacement']:.0f}",
+                              help="Etudiants avec des examens deux jours de suite")
+                with col2:
+                    st.metric("Dispersion departements", f"{soft_score['regroupement']:.0f}",
+                              help="Ecart des jours d'examen au jour moyen du departement")
+                with col3:
+                    st.metric("Jours de surveillance", f"{soft_score['compacite']:.0f}",
+                              help="Jours ou chaque professeur surveille au moins une fois")
+
+                st.write("**Ecart aux bornes inferieures**")
+                st.dataframe(pd.DataFrame([
+                    {"Borne": name, "Minimum": bound, "Obtenu": value, "Ecart": gap}
+                    for name, (bound, value, gap) in result["gaps"].items()
+                ]).set_index("Borne"), use_container_width=True)
+
+                st.write("**Temps par phase (s)**")
+                st.bar_chart(pd.Series(result["phase_times"], name="Secondes"))
+
                 # Check for violations
                 violations = result.get("student_violations", 0)
                 if violations == 0:
@@ -131,17 +163,10 @@ try:
             results = []
 
             # Check student constraint
-            cur.execute("""
-                SELECT COUNT(*) FROM (
-                    SELECT e.id, DATE(ex.date_heure), COUNT(DISTINCT ex.module_id) as cnt
-                    FROM etudiants e
-                    JOIN modules m ON e.formation_id = m.formation_id
-                    JOIN examens ex ON m.id = ex.module_id
-                    GROUP BY e.id, DATE(ex.date_heure)
-                    HAVING cnt > 1
-                ) t
-            """)
-            v = cur.fetchone()[0]
+            # Student, professor and capacity checks read the conflict facts
+            # computed after each optimization (scripts/analytics.py)
+            cur.execute(queries.STUDENT_CONFLICTS)
+            v = int(cur.fetchone()[0])
             results.append({
                 "Contrainte": "Max 1 examen/jour par etudiant",
                 "Statut": "OK" if v == 0 else "ECHEC",
@@ -149,15 +174,7 @@ try:
             })
 
             # Check professor constraint
-            cur.execute("""
-                SELECT COUNT(*) FROM (
-                    SELECT s.prof_id, DATE(ex.date_heure), COUNT(*) as cnt
-                    FROM surveillances s
-                    JOIN examens ex ON s.examen_id = ex.id
-                    GROUP BY s.prof_id, DATE(ex.date_heure)
-                    HAVING cnt > 3
-                ) t
-            """)
+            cur.execute(queries.PROFESSOR_CONFLICTS)
             v = cur.fetchone()[0]
             results.append({
                 "Contrainte": "Max 3 surveillances/jour par professeur",
@@ -166,18 +183,7 @@ try:
             })
 
             # Check room capacity
-            cur.execute("""
-                SELECT COUNT(*) FROM (
-                    SELECT m.id,
-                           (SELECT COUNT(*) FROM etudiants e WHERE e.formation_id = m.formation_id) as enroll,
-                           SUM(l.capacite) as cap
-                    FROM modules m
-                    JOIN examens ex ON ex.module_id = m.id
-                    JOIN lieu_examens l ON ex.lieu_examen_id = l.id
-                    GROUP BY m.id
-                    HAVING enroll > cap
-                ) t
-            """)
+            cur.execute(queries.CAPACITY_CONFLICTS)
             v = cur.fetchone()[0]
             results.append({
                 "Contrainte": "Capacite des salles",
@@ -186,10 +192,7 @@ try:
             })
 
             # Check no Fridays
-            cur.execute("""
-                SELECT COUNT(*) FROM examens
-                WHERE DAYOFWEEK(date_heure) = 6
-            """)
+            cur.execute(queries.FRIDAY_EXAMS)
             v = cur.fetchone()[0]
             results.append({
                 "Contrainte": "Pas d'examens le vendredi",
@@ -198,10 +201,7 @@ try:
             })
 
             # Check equal sessions
-            cur.execute("""
-                SELECT MAX(cnt) - MIN(cnt)
-                FROM (SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id) t
-            """)
+            cur.execute(queries.SESSION_SPREAD)
             diff = cur.fetchone()[0] or 0
             results.append({
                 "Contrainte": "Repartition equitable (ecart max 1)",
@@ -210,17 +210,7 @@ try:
             })
 
             # Department priority
-            cur.execute("""
-                SELECT
-                    ROUND(SUM(CASE WHEN p.dept_id = d.id THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1)
-                FROM surveillances s
-                JOIN examens ex ON s.examen_id = ex.id
-                JOIN modules m ON ex.module_id = m.id
-                JOIN formations f ON m.formation_id = f.id
-                JOIN specialites sp ON f.specialite_id = sp.id
-                JOIN departements d ON sp.dept_id = d.id
-                JOIN professeurs p ON s.prof_id = p.id
-            """)
+            cur.execute(queries.DEPT_PRIORITY)
             pct = cur.fetchone()[0] or 0
             results.append({
                 "Contrainte": "Priorite departement",
@@ -247,12 +237,7 @@ try:
 
     with col1:
         st.write("**Repartition des examens par jour**")
-        cur.execute("""
-            SELECT DATE_FORMAT(date_heure, '%d/%m') as jour, COUNT(*) as examens
-            FROM examens
-            GROUP BY DATE(date_heure)
-            ORDER BY DATE(date_heure)
-        """)
+        cur.execute(queries.EXAMS_PER_DAY)
         results = cur.fetchall()
         if results:
             df = pd.DataFrame(results, columns=["Jour", "Examens"])
@@ -260,20 +245,57 @@ try:
 
     with col2:
         st.write("**Repartition par creneau horaire**")
-        cur.execute("""
-            SELECT TIME_FORMAT(TIME(date_heure), '%H:%i') as heure, COUNT(*) as examens
-            FROM examens
-            GROUP BY TIME(date_heure)
-            ORDER BY TIME(date_heure)
-        """)
+        cur.execute(queries.EXAMS_PER_SLOT)
         results = cur.fetchall()
         if results:
             df = pd.DataFrame(results, columns=["Heure", "Examens"])
             st.bar_chart(df.set_index("Heure"))
 
+    st.markdown("---")
+
+    # === Run History ===
+    st.subheader("Historique des Executions")
+
+    conn.commit()  # end the read snapshot: a run started above must be visible
+    runs = load_runs(cur)
+    if not runs:
+        st.info("Aucune execution enregistree.")
+    else:
+        for metric, message in flag_regressions(runs):
+            st.warning(f"Regression ({metric}) par rapport a la meilleure execution: {message}")
+
+        df = pd.DataFrame([{
+            "Execution": run["id"],
+            "Date": run["lance_le"],
+            "Mode": run["mode"],
+            "Etudiants": run["parametres"].get("etudiants"),
+            "Temps (s)": round(run["duree_totale"], 2),
+            "Memoire (Mo)": round(run["memoire_pic_mo"], 1),
+            "Conflits": run["conflits"],
+            "Ecart sessions": run["ecart_sessions"],
+            "Remplissage (%)": round(run["taux_remplissage"], 1),
+        } for run in runs]).set_index("Execution")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("**Performance**")
+            st.line_chart(df[["Temps (s)", "Memoire (Mo)"]])
+        with col2:
+            st.write("**Qualite**")
+            st.line_chart(df[["Conflits", "Ecart sessions", "Remplissage (%)"]])
+
+        st.write("**Temps par phase (s)**")
+        phases = pd.DataFrame([run["durees"] for run in runs], index=df.index)
+        st.bar_chart(phases)
+
+        st.dataframe(df.iloc[::-1], use_container_width=True)
+
     conn.close()
 
 except Exception as e:
     st.error(f"Erreur: {e}")
     import traceback
     st.code(traceback.format_exc())
+
+# SQL timeline of this render (SQL_TRACE=1 or ?debug=1)
+debug_panel()
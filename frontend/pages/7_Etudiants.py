@@ -0,0 +1,92 @@
+"""
+Etudiants - Recherche du planning d'examens d'un etudiant
+"""
+
+import streamlit as st
+import pandas as pd
+import sys
+import os
+
+# Add project root to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from utils.db import get_connection
+from utils.debug import debug_panel, trace_page
+from scripts import ics
+from scripts.students import get_student_index
+
+st.set_page_config(page_title="Etudiants", page_icon="🎓", layout="wide")
+trace_page("Etudiants")
+st.title("Planning d'Examens par Etudiant")
+st.markdown("---")
+
+
+try:
+    conn = get_connection()
+    cur = conn.cursor()
+    # In-memory index, rebuilt only when a new schedule version is published
+    index = get_student_index(cur)
+
+    query = st.text_input("Matricule ou nom (debut du nom ou du prenom)")
+
+    if query:
+        results = index.lookup(query)
+
+        if not results:
+            st.info("Aucun etudiant trouve.")
+        else:
+            if len(results) > 1:
+                labels = [
+                    f"{s['nom']} {s['prenom']} ({s['id']}) - {s['formation']}"
+                    for s in results
+                ]
+                choice = st.selectbox(f"{len(results)} etudiants trouves", labels)
+                student = results[labels.index(choice)]
+            else:
+                student = results[0]
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Etudiant", f"{student['nom']} {student['prenom']}")
+            with col2:
+                st.metric("Formation", student["formation"])
+            with col3:
+                st.metric("Groupe", f"G{student['groupe']}")
+
+            if student["examens"]:
+                df = pd.DataFrame(student["examens"])
+                df = df[["date", "heure", "module", "salle"]]
+                df.columns = ["Date", "Heure", "Module", "Salle"]
+                st.subheader("Examens")
+                if student["rattrapages"]:
+                    st.caption(f"Dont {student['rattrapages']} examen(s) de rattrapage")
+                st.dataframe(df, use_container_width=True)
+
+                # The group's iCalendar feed, built once per schedule version
+                # (a student with retakes has their own feed)
+                if student["rattrapages"]:
+                    ics_bytes = ics.get_feed(cur, index.version_id, ics.STUDENT, student["id"])
+                else:
+                    ics_bytes = ics.get_feed(
+                        cur, index.version_id, ics.GROUP, student["formation_id"], student["groupe"]
+                    )
+                if ics_bytes:
+                    st.download_button(
+                        label="Ajouter a mon calendrier (.ics)",
+                        data=ics_bytes,
+                        file_name=f"Examens_{student['id']}.ics",
+                        mime="text/calendar",
+                    )
+            else:
+                st.info("Aucun examen planifie pour ce groupe.")
+
+    conn.close()
+
+except Exception as e:
+    st.error(f"Erreur: {e}")
+    import traceback
+
+    st.code(traceback.format_exc())
+
+# SQL timeline of this render (SQL_TRACE=1 or ?debug=1)
+debug_panel()
@@ -6,19 +6,24 @@ import time
 import mysql.connector
 from dotenv import load_dotenv
 
+# Project root, for the shared scripts package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from scripts import queries, tracing
+
 # Load environment variables from project root
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
 
 
 def get_connection():
-    """Create and return a database connection."""
-    return mysql.connector.connect(
+    """Create and return a database connection (traced while a trace is active)."""
+    return tracing.wrap(mysql.connector.connect(
         host=os.getenv("DB_HOST"),
         port=os.getenv("DB_PORT"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASS"),
         database=os.getenv("DB_NAME"),
-    )
+    ))
 
 
 def execute_with_timing(query, params=None):
@@ -36,3 +41,9 @@ def execute_with_timing(query, params=None):
     conn.close()
 
     return results, columns, elapsed
+
+
+def get_schedule_version(cur):
+    """Return the id of the current schedule version (None if never optimized)."""
+    cur.execute(queries.SCHEDULE_VERSION)
+    return cur.fetchone()[0]
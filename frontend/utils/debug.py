@@ -0,0 +1,56 @@
+"""SQL debug panel: per-render query timeline (scripts.tracing)."""
+
+import os
+
+import pandas as pd
+import streamlit as st
+
+from utils.db import tracing
+
+
+def trace_page(name):
+    """Trace this render's queries if SQL_TRACE is set or the URL has ?debug=1."""
+    tracing.stop()  # a previous render may have ended early (st.stop)
+    if os.getenv("SQL_TRACE") or st.query_params.get("debug") == "1":
+        tracing.start(name)
+
+
+def debug_panel():
+    """Render the current trace (if any) in a collapsed expander and end it."""
+    trace = tracing.stop()
+    if trace is None:
+        return
+    summary = trace.summary()
+    with st.expander(f"Debug SQL: {summary['queries']} requetes, {summary['db_ms']:.1f} ms"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Requetes", summary["queries"])
+        with col2:
+            st.metric("Temps base (ms)", f"{summary['db_ms']:.1f}")
+        with col3:
+            st.metric("Temps page (ms)", f"{summary['elapsed_ms']:.1f}")
+
+        if summary["n_plus_one"]:
+            for row in summary["n_plus_one"]:
+                st.warning(f"N+1 probable: {row['count']} executions ({', '.join(row['sites'])}): "
+                           f"{row['sql'][:120]}")
+
+        if not trace.records:
+            return
+
+        st.write("**Requetes les plus lentes**")
+        df = pd.DataFrame(summary["slowest"])[["ms", "rows", "caller", "site", "sql"]]
+        df.columns = ["ms", "Lignes", "Section", "Appel", "Requete"]
+        st.dataframe(df, use_container_width=True)
+
+        st.write("**Chronologie**")
+        df = pd.DataFrame(trace.records)[["caller", "site", "ms", "rows", "sql"]]
+        df.columns = ["Section", "Appel", "ms", "Lignes", "Requete"]
+        st.dataframe(df, use_container_width=True)
+
+        st.download_button(
+            label="Exporter (JSON)",
+            data=trace.to_json(),
+            file_name=f"trace_{trace.name}.json",
+            mime="application/json",
+        )
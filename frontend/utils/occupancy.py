@@ -0,0 +1,100 @@
+"""Room occupancy cube (built by scripts/analytics.py after each optimization).
+
+The cube has one row per room, slot and department: a room shared by a
+sitting of common modules has several rows in the same slot, so uses and
+exams count distinct (room, day, slot) and the capacity counts once per
+room and slot.
+"""
+
+import pandas as pd
+import streamlit as st
+from utils.db import get_connection
+from scripts import queries
+
+CUBE_COLUMNS = [
+    "Salle ID", "Salle", "Type", "Capacite", "Jour", "Heure",
+    "Departement", "Modules", "Places Utilisees", "Places Perdues",
+]
+
+SLOT_KEY = ["Salle ID", "Jour", "Heure"]
+
+
+@st.cache_data(show_spinner=False)
+def load_occupancy_cube(version_id):
+    """Load the occupancy cube and the room list, once per schedule version."""
+    conn = get_connection()
+    cur = conn.cursor()
+
+    cur.execute(queries.OCCUPANCY_CUBE)
+    cube = pd.DataFrame(cur.fetchall(), columns=CUBE_COLUMNS)
+
+    cur.execute(queries.ROOMS)
+    rooms = pd.DataFrame(cur.fetchall(), columns=["Salle ID", "Salle", "Type", "Capacite"])
+
+    cur.execute(queries.SLOTS_PER_DAY, (version_id,))
+    row = cur.fetchone()
+    slots_per_day = row[0] if row else 4
+
+    conn.close()
+    return cube, rooms, slots_per_day
+
+
+def slice_cube(cube, room_type=None, day=None):
+    """Filter the cube on room type and/or day."""
+    mask = pd.Series(True, index=cube.index)
+    if room_type:
+        mask &= cube["Type"] == room_type
+    if day is not None:
+        mask &= cube["Jour"] == day
+    return cube[mask]
+
+
+def room_usage(cube, rooms, room_type=None, day=None):
+    """Number of uses per room (unused rooms included) for the given filters."""
+    if room_type:
+        rooms = rooms[rooms["Type"] == room_type]
+    uses = slice_cube(cube, room_type, day).drop_duplicates(SLOT_KEY).groupby("Salle ID").size()
+    df = rooms.assign(Utilisations=rooms["Salle ID"].map(uses).fillna(0).astype(int))
+    df = df.sort_values(["Type", "Utilisations", "Salle"], ascending=[False, False, True])
+    return df.drop(columns=["Salle ID"]).reset_index(drop=True)
+
+
+def room_schedule(cube, room_id):
+    """Uses of one room, per (day, slot) and department, with the modules examined."""
+    df = cube[cube["Salle ID"] == room_id].sort_values(["Jour", "Heure", "Departement"])
+    df = df.assign(Date=pd.to_datetime(df["Jour"]).dt.strftime("%d/%m/%Y"))
+    return df[["Date", "Heure", "Departement", "Modules",
+               "Places Utilisees", "Places Perdues"]].reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False)
+def load_slot_occupancy(version_id, room_type=None):
+    """Per-slot occupancy and the date x slot matrix of exams, once per
+    schedule version and room type."""
+    cube, _, _ = load_occupancy_cube(version_id)
+    df_slots = slot_occupancy(slice_cube(cube, room_type))
+    df_slots["Date"] = pd.to_datetime(df_slots["Jour"]).dt.strftime("%d/%m/%Y")
+    matrix = None
+    if not df_slots.empty:
+        # Pivot on the day itself so the rows stay in date order
+        matrix = df_slots.pivot(index="Jour", columns="Heure", values="Examens").fillna(0).astype(int)
+        matrix.index = pd.to_datetime(matrix.index).strftime("%d/%m/%Y")
+        matrix.index.name = "Date"
+    return df_slots, matrix
+
+
+def slot_occupancy(cube):
+    """Rooms and seats used per (day, slot)."""
+    by_slot = cube.groupby(["Jour", "Heure"])
+    # Rooms and their capacity once per (room, day, slot), not per department row
+    rooms = cube.drop_duplicates(SLOT_KEY).groupby(["Jour", "Heure"])
+    return (
+        pd.DataFrame({
+            "Examens": rooms["Salle ID"].size(),
+            "Capacite Utilisee": rooms["Capacite"].sum(),
+            "Places Utilisees": by_slot["Places Utilisees"].sum(),
+            "Places Perdues": by_slot["Places Perdues"].sum(),
+        })
+        .reset_index()
+        .sort_values(["Jour", "Heure"])
+    )
@@ -0,0 +1,308 @@
+"""
+Precomputed analytics tables
+
+The frontend pages read these compact tables instead of re-running the
+per-student joins on every render. They are rebuilt once after each
+optimization run (see scripts/optimize.py), or manually with:
+
+    python -m scripts.analytics
+
+Conflict facts:
+- conflits_etudiants: (formation, day) pairs with more than 1 exam, with the
+  number of students affected (every student of a formation takes all of its
+  modules, so one row replaces one row per student; students with retakes,
+  from the inscriptions table, are counted one by one)
+- conflits_formations: students and students in conflict per formation
+- conflits_professeurs: (professor, day) pairs with more than 3 surveillances
+- conflits_capacite: modules whose rooms cannot seat their students
+  (formation headcount + retakers); a room shared by a sitting counts its
+  capacity once, split between its modules
+
+Occupancy cube:
+- occupation_salles: seats used and seats wasted per room, day, slot and
+  department, with the modules examined there, for the current schedule
+  version (versions_planning)
+"""
+
+from collections import Counter, defaultdict
+from scripts.helpers import create_connection
+
+MAX_EXAMS_PER_DAY_STUDENT = 1
+MAX_EXAMS_PER_DAY_PROF = 3
+
+
+def _group_sizes(cur):
+    """{(formation_id, groupe): students}."""
+    cur.execute("""
+        SELECT formation_id, groupe, COUNT(*)
+        FROM etudiants
+        GROUP BY formation_id, groupe
+    """)
+    return {(form_id, groupe): count for form_id, groupe, count in cur.fetchall()}
+
+
+def _fill_rooms(rows, group_sizes, module_retakers):
+    """Seat the groups of each examens row in its room, in exam order.
+
+    rows: (module_id, room_id, date_heure, capacity, formation_id, groupes, ...).
+    A large group can be split over several rooms (Salle TD fallback), so the
+    students that remain for each (module, group) are seated room by room. A
+    room shared by a sitting of common modules has one row per module in the
+    same slot: its capacity counts once, each row taking what the previous
+    ones left. Yield (row, seats left to the row, seats taken).
+    """
+    remaining = {}
+    seats_left = {}  # (room_id, date_heure) -> seats not taken yet
+    for row in rows:
+        module_id, room_id, date_heure, capacity, form_id, groupes = row[:6]
+        free = seats_left.get((room_id, date_heure), capacity)
+        seated = 0
+        for g in (groupes or "").split(","):
+            if not g.strip():
+                continue
+            g = int(g)
+            key = (module_id, form_id, g)
+            size = module_retakers.get(module_id, 0) if g == 0 else group_sizes.get((form_id, g), 0)
+            left = remaining.get(key, size)
+            take = min(left, free - seated)
+            remaining[key] = left - take
+            seated += take
+        seats_left[(room_id, date_heure)] = free - seated
+        yield row, free, seated
+
+
+def refresh_conflict_facts(conn, cur, commit=True):
+    """Recompute every conflict fact table from the current schedule.
+
+    commit=False leaves the transaction open, for a caller that writes the
+    schedule and its version in the same one (scripts/optimize.py).
+    """
+    print("Computing conflict facts...")
+
+    # Headcount and department of each formation
+    cur.execute("""
+        SELECT f.id, s.dept_id, COUNT(e.id)
+        FROM formations f
+        JOIN specialites s ON f.specialite_id = s.id
+        LEFT JOIN etudiants e ON e.formation_id = f.id
+        GROUP BY f.id, s.dept_id
+    """)
+    formation_dept = {}
+    headcount = {}
+    for form_id, dept_id, count in cur.fetchall():
+        formation_dept[form_id] = dept_id
+        headcount[form_id] = count
+
+    # Retakes: (student, formation, module) for the modules taken outside
+    # the student's formation (scripts/enrollment.py)
+    cur.execute("""
+        SELECT i.etudiant_id, e.formation_id, i.module_id
+        FROM inscriptions i
+        JOIN etudiants e ON i.etudiant_id = e.id
+        JOIN modules m ON i.module_id = m.id
+        WHERE m.formation_id <> e.formation_id
+    """)
+    retakes = cur.fetchall()
+    module_retakers = Counter(module_id for _, _, module_id in retakes)
+
+    # Exams per (formation, day)
+    cur.execute("""
+        SELECT m.formation_id, DATE(ex.date_heure), COUNT(DISTINCT ex.module_id)
+        FROM examens ex
+        JOIN modules m ON ex.module_id = m.id
+        GROUP BY m.formation_id, DATE(ex.date_heure)
+    """)
+    formation_days = defaultdict(dict)  # formation_id -> {day: exams}
+    for form_id, day, exam_count in cur.fetchall():
+        formation_days[form_id][day] = exam_count
+
+    # A retaker sits their formation's exams and their retakes: count them one by one
+    module_days = {}
+    if retakes:
+        cur.execute("SELECT DISTINCT module_id, DATE(date_heure) FROM examens")
+        module_days = dict(cur.fetchall())
+    retaker_days = defaultdict(Counter)  # (student_id, formation_id) -> {day: retakes}
+    for student_id, form_id, module_id in retakes:
+        days = retaker_days[student_id, form_id]
+        if module_id in module_days:
+            days[module_days[module_id]] += 1
+    retakers = Counter(form_id for _, form_id in retaker_days)
+
+    # Student-day conflicts: a formation with several exams on the same day
+    # puts all of its students (retakers apart) in conflict on that day
+    cells = {}  # (formation_id, day) -> [most exams of a student, students]
+    conflicting = Counter()  # formation_id -> students in conflict on some day
+    for form_id, days in formation_days.items():
+        for day, exam_count in days.items():
+            if exam_count > MAX_EXAMS_PER_DAY_STUDENT:
+                cells[form_id, day] = [exam_count, headcount.get(form_id, 0) - retakers[form_id]]
+                conflicting[form_id] = cells[form_id, day][1]
+    for (student_id, form_id), days in retaker_days.items():
+        own = formation_days.get(form_id, {})
+        in_conflict = False
+        for day in set(days) | set(own):
+            exam_count = own.get(day, 0) + days[day]
+            if exam_count > MAX_EXAMS_PER_DAY_STUDENT:
+                cell = cells.setdefault((form_id, day), [0, 0])
+                cell[0] = max(cell[0], exam_count)
+                cell[1] += 1
+                in_conflict = True
+        conflicting[form_id] += in_conflict
+
+    student_rows = [
+        (formation_dept[form_id], form_id, day, exam_count, students)
+        for (form_id, day), (exam_count, students) in cells.items()
+        if students > 0
+    ]
+
+    formation_rows = [
+        (form_id, formation_dept[form_id], count, conflicting[form_id])
+        for form_id, count in headcount.items()
+        if count > 0
+    ]
+
+    # Professor-day conflicts
+    cur.execute("""
+        SELECT s.prof_id, p.dept_id, DATE(ex.date_heure), COUNT(*)
+        FROM surveillances s
+        JOIN examens ex ON s.examen_id = ex.id
+        JOIN professeurs p ON s.prof_id = p.id
+        GROUP BY s.prof_id, p.dept_id, DATE(ex.date_heure)
+        HAVING COUNT(*) > %s
+    """, (MAX_EXAMS_PER_DAY_PROF,))
+    prof_rows = [
+        (prof_id, dept_id, day, count) for prof_id, dept_id, day, count in cur.fetchall()
+    ]
+
+    # Capacity conflicts: seats of a module's rooms vs its enrollment, a
+    # room shared by a sitting split between its modules as in the cube
+    group_sizes = _group_sizes(cur)
+    cur.execute("""
+        SELECT ex.module_id, ex.lieu_examen_id, ex.date_heure, l.capacite,
+               ex.formation_id, ex.groupes
+        FROM examens ex
+        JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+        ORDER BY ex.id
+    """)
+    module_capacity = Counter()  # module_id -> seats its rooms leave it
+    module_formation = {}
+    for row, free, _ in _fill_rooms(cur.fetchall(), group_sizes, module_retakers):
+        module_capacity[row[0]] += free
+        module_formation[row[0]] = row[4]
+    capacity_rows = []
+    for module_id, capacity in module_capacity.items():
+        form_id = module_formation[module_id]
+        enrolled = headcount.get(form_id, 0) + module_retakers[module_id]
+        if enrolled > capacity:
+            capacity_rows.append(
+                (module_id, form_id, formation_dept[form_id], enrolled, int(capacity))
+            )
+
+    cur.execute("DELETE FROM conflits_etudiants")
+    cur.execute("DELETE FROM conflits_formations")
+    cur.execute("DELETE FROM conflits_professeurs")
+    cur.execute("DELETE FROM conflits_capacite")
+
+    if student_rows:
+        cur.executemany(
+            "INSERT INTO conflits_etudiants (dept_id, formation_id, jour, nb_examens, nb_etudiants) VALUES (%s, %s, %s, %s, %s)",
+            student_rows,
+        )
+    if formation_rows:
+        cur.executemany(
+            "INSERT INTO conflits_formations (formation_id, dept_id, total_etudiants, etudiants_en_conflit) VALUES (%s, %s, %s, %s)",
+            formation_rows,
+        )
+    if prof_rows:
+        cur.executemany(
+            "INSERT INTO conflits_professeurs (prof_id, dept_id, jour, nb_surveillances) VALUES (%s, %s, %s, %s)",
+            prof_rows,
+        )
+    if capacity_rows:
+        cur.executemany(
+            "INSERT INTO conflits_capacite (module_id, formation_id, dept_id, inscrits, capacite) VALUES (%s, %s, %s, %s, %s)",
+            capacity_rows,
+        )
+    if commit:
+        conn.commit()
+
+    summary = {
+        "student_conflicts": sum(row[4] for row in student_rows),
+        "prof_conflicts": len(prof_rows),
+        "room_conflicts": len(capacity_rows),
+    }
+    print(
+        f"Conflict facts: {summary['student_conflicts']} student-day, "
+        f"{summary['prof_conflicts']} professor-day, "
+        f"{summary['room_conflicts']} capacity"
+    )
+    return summary
+
+
+def refresh_occupancy_cube(conn, cur, commit=True):
+    """Rebuild the room occupancy cube from the current schedule (commit: as in
+    refresh_conflict_facts)."""
+    print("Building occupancy cube...")
+
+    # Group sizes, to know how many seats each exam room actually uses
+    group_sizes = _group_sizes(cur)
+    # Group 0 of a module: the students retaking it
+    cur.execute("""
+        SELECT i.module_id, COUNT(*)
+        FROM inscriptions i
+        JOIN etudiants e ON i.etudiant_id = e.id
+        JOIN modules m ON i.module_id = m.id
+        WHERE m.formation_id <> e.formation_id
+        GROUP BY i.module_id
+    """)
+    module_retakers = dict(cur.fetchall())
+
+    cur.execute("""
+        SELECT ex.module_id, ex.lieu_examen_id, ex.date_heure, l.capacite,
+               ex.formation_id, ex.groupes, l.type,
+               DATE(ex.date_heure), TIME(ex.date_heure), s.dept_id, m.nom
+        FROM examens ex
+        JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+        JOIN modules m ON ex.module_id = m.id
+        JOIN formations f ON m.formation_id = f.id
+        JOIN specialites s ON f.specialite_id = s.id
+        ORDER BY ex.id
+    """)
+
+    cells = defaultdict(lambda: [0, 0, set()])  # (room, type, day, time, dept) -> [used, wasted, modules]
+    # A room shared by a sitting of common modules has one row per module:
+    # its wasted seats count once, in the first row's cell
+    room_cells = {}  # (room, day, time) -> [first cell key, capacity, seats used]
+    for row, _, seated in _fill_rooms(cur.fetchall(), group_sizes, module_retakers):
+        _, room_id, _, capacity, _, _, room_type, day, time_, dept_id, module = row
+        cell = (room_id, room_type, day, time_, dept_id)
+        cells[cell][0] += seated
+        cells[cell][2].add(module)
+        room_cells.setdefault((room_id, day, time_), [cell, capacity, 0])[2] += seated
+    for cell, capacity, seated in room_cells.values():
+        cells[cell][1] += max(capacity - seated, 0)
+
+    rows = [
+        key + (used, wasted, ", ".join(sorted(modules)))
+        for key, (used, wasted, modules) in cells.items()
+    ]
+
+    cur.execute("DELETE FROM occupation_salles")
+    if rows:
+        cur.executemany(
+            "INSERT INTO occupation_salles (lieu_examen_id, type, jour, heure, dept_id, places_utilisees, places_perdues, modules) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+    if commit:
+        conn.commit()
+
+    print(f"Occupancy cube: {len(rows)} cells")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    conn = create_connection()
+    cur = conn.cursor()
+    refresh_conflict_facts(conn, cur)
+    refresh_occupancy_cube(conn, cur)
+    conn.close()
@@ -0,0 +1,349 @@
+"""
+Read-only Schedule API
+
+A small JSON/HTTP server (standard library only) for the read spike when a
+schedule is published. Requests never reach the database: every response
+is precomputed from an in-memory snapshot of the current schedule version,
+with its gzip encoding and a strong ETag per encoding ("<version>-<hash>",
+"<version>-<hash>-gz"). A background
+thread polls versions_planning and swaps in a new snapshot when the
+optimizer publishes a new version.
+
+Routes (GET):
+    /api/version
+    /api/formations                      /api/formations/<id>
+    /api/formations/<id>/groupes/<g>
+    /api/professeurs                     /api/professeurs/<id>
+    /api/salles                          /api/salles/<id>
+    /api/etudiants/<id>                  /api/etudiants?q=<id or name prefix>
+
+Usage:
+    python -m scripts.api [--host 127.0.0.1] [--port 8502]
+    python -m scripts.api --synthetic 13000    # in-memory stand-in data, no database
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import closing
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from scripts.helpers import create_connection
+from scripts.snapshot import (
+    FormationSchedule,
+    ProfessorSchedule,
+    RoomSchedule,
+    load_formation_schedules,
+    load_professor_schedules,
+    load_room_schedules,
+)
+from scripts.students import StudentIndex, build_student_index, normalize_name
+
+REFRESH_SECONDS = 10
+GZIP_MIN_BYTES = 512
+CACHE_CONTROL = "public, max-age=30"
+# Student search responses kept per snapshot (distinct normalized queries)
+SEARCH_CACHE_SIZE = 4096
+
+
+class Response:
+    """A precomputed JSON response.
+
+    The gzip body is another representation of the same resource: it has its
+    own strong ETag (suffix -gz), so a cache never pairs one body's validator
+    with the other.
+    """
+
+    __slots__ = ("body", "gzipped", "etag", "gzip_etag")
+
+    def __init__(self, version_id, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        self.gzipped = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_BYTES else None
+        digest = hashlib.sha1(self.body).hexdigest()[:16]
+        self.etag = f'"{version_id}-{digest}"'
+        self.gzip_etag = f'"{version_id}-{digest}-gz"'
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip: gzip (or *) with q > 0."""
+    qvalues = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qvalues[coding.strip().lower()] = q
+    q = qvalues.get("gzip", qvalues.get("x-gzip", qvalues.get("*", 0.0)))
+    return q > 0
+
+
+def _search_key(q):
+    """Normalized student search: queries with the same results share a key."""
+    q = q.strip()
+    return str(int(q)) if q.isdigit() else normalize_name(q)
+
+
+def _prof_exam(row):
+    date, heure, module, salle, formation = row
+    return {"date": date, "heure": heure, "module": module, "salle": salle, "formation": formation}
+
+
+def _room_exam(row):
+    date, heure, module, formation, groupes = row
+    return {"date": date, "heure": heure, "module": module, "formation": formation,
+            "groupes": [int(g) for g in groupes.split(",")] if groupes else []}
+
+
+def schedule_payloads(formations, professors, rooms):
+    """Yield (path, payload) for every precomputed resource of a version.
+
+    formations: {id: FormationSchedule}, professors: {id: ProfessorSchedule},
+    rooms: {id: RoomSchedule}, as loaded for the PDF export, so the API, the
+    static export and the PDFs show the same rows. Also used by the static export.
+    """
+    summaries = []
+    for fid, schedule in sorted(formations.items()):
+        groups = []
+        for groupe, effectif in schedule.groups:
+            group = {"groupe": groupe, "effectif": effectif,
+                     "examens": schedule.group_exams(groupe)}
+            groups.append(group)
+            yield f"/api/formations/{fid}/groupes/{groupe}", {
+                "formation_id": fid, "formation": schedule.name, **group}
+        yield f"/api/formations/{fid}", {"id": fid, "nom": schedule.name, "groupes": groups}
+        summaries.append({"id": fid, "nom": schedule.name, "groupes": len(groups)})
+    yield "/api/formations", summaries
+
+    summaries = []
+    for prof in professors.values():
+        exams = [_prof_exam(row) for row in prof.rows]
+        yield f"/api/professeurs/{prof.prof_id}", {
+            "id": prof.prof_id, "nom": prof.name, "departement": prof.dept_name,
+            "examens": exams,
+        }
+        summaries.append({"id": prof.prof_id, "nom": prof.name,
+                          "departement": prof.dept_name, "sessions": len(exams)})
+    yield "/api/professeurs", summaries
+
+    summaries = []
+    for room in rooms.values():
+        exams = [_room_exam(row) for row in room.rows]
+        yield f"/api/salles/{room.room_id}", {
+            "id": room.room_id, "nom": room.name, "type": room.type,
+            "capacite": room.capacity, "examens": exams,
+        }
+        summaries.append({"id": room.room_id, "nom": room.name, "type": room.type,
+                          "capacite": room.capacity, "examens": len(exams)})
+    yield "/api/salles", summaries
+
+
+class ApiSnapshot:
+    """All responses of one schedule version."""
+
+    def __init__(self, version_id, students, formations, professors, rooms):
+        self.version_id = version_id
+        self.students = students
+        self.responses = {
+            path: Response(version_id, payload)
+            for path, payload in schedule_payloads(formations, professors, rooms)
+        }
+        self.responses["/api/version"] = Response(version_id, {
+            "version": version_id,
+            "formations": len(formations),
+            "etudiants": len(students.students),
+            "professeurs": len(professors),
+            "salles": len(rooms),
+        })
+        # Search responses by normalized query, dropped with the snapshot
+        self._search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search_response)
+
+    def _search_response(self, key):
+        return Response(self.version_id, self.students.lookup(key))
+
+    def get(self, path, query):
+        """Return the Response for a request, or None if not found."""
+        response = self.responses.get(path)
+        if response is not None:
+            return response
+        if path == "/api/etudiants":
+            return self._search(_search_key(query.get("q", [""])[0]))
+        if path.startswith("/api/etudiants/"):
+            student_id = path.rsplit("/", 1)[1]
+            if not student_id.isdigit():
+                return None
+            payload = self.students.schedule(int(student_id))
+            if payload is None:
+                return None
+            # Student responses are built on first request, then kept
+            response = self.responses[path] = Response(self.version_id, payload)
+            return response
+        return None
+
+
+def load_snapshot(cur, version_id):
+    """Build the ApiSnapshot of a schedule version from the database."""
+    return ApiSnapshot(
+        version_id,
+        build_student_index(cur, version_id),
+        load_formation_schedules(cur),
+        load_professor_schedules(cur),
+        load_room_schedules(cur),
+    )
+
+
+def synthetic_schedule(num_students=13000, seed=42):
+    """(StudentIndex, formations, professors, rooms) of generated data, standing in
+    for the database."""
+    rng = random.Random(seed)
+    noms = ["Benali", "Haddad", "Zerrouki", "Amrani", "Mansouri", "Bouzid", "Kaci", "Saidi"]
+    prenoms = ["Amine", "Sara", "Yacine", "Lina", "Karim", "Nour", "Rayan", "Ines"]
+    num_formations = max(1, num_students // 65)
+    groups_per_formation = 2
+
+    index = StudentIndex(version_id=0)
+    formations = {}
+    rooms = {r: RoomSchedule(r, f"Salle {r}", "Salle_TD", 30) for r in range(1, 101)}
+    professors = {p: ProfessorSchedule(p, f"{rng.choice(prenoms)} {rng.choice(noms)} {p}", 1,
+                                       "Departement 1") for p in range(1, num_formations * 3 + 1)}
+    for fid in range(1, num_formations + 1):
+        name = f"Specialite {fid} L{fid % 3 + 1} S1"
+        index.formations[fid] = name
+        formation = formations[fid] = FormationSchedule(fid, name)
+        formation.modules = [f"Module {fid}.{m}" for m in range(6)]
+        for m in range(6):
+            date = f"{10 + m:02d}/06/2026"
+            heure = ["08:30", "10:45", "13:00", "15:15"][fid % 4]
+            for groupe in range(1, groups_per_formation + 1):
+                room = rooms[rng.randint(1, 100)]
+                exam = {"date": date, "heure": heure, "module": f"Module {fid}.{m}",
+                        "salle": room.name}
+                index.exams.setdefault((fid, groupe), []).append(exam)
+                formation.exams.append((exam["module"], str(groupe), room.name, date, heure))
+                room.rows.append((date, heure, exam["module"], name, str(groupe)))
+                professors[rng.randint(1, len(professors))].rows.append(
+                    (date, heure, exam["module"], room.name, name))
+
+    for sid in range(1, num_students + 1):
+        fid = rng.randint(1, num_formations)
+        index.students[sid] = (rng.choice(noms), rng.choice(prenoms), fid,
+                               rng.randint(1, groups_per_formation))
+    index.index_names()
+    headcounts = Counter((fid, groupe) for _, _, fid, groupe in index.students.values())
+    for (fid, groupe), effectif in sorted(headcounts.items()):
+        formations[fid].groups.append((groupe, effectif))
+    return index, formations, professors, rooms
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        response = self.server.snapshot.get(path, parse_qs(url.query))
+
+        if response is None:
+            body = json.dumps({"erreur": "introuvable"}).encode()
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        # The representation decides the validator: 304s match the body sent
+        use_gzip = response.gzipped is not None and accepts_gzip(self.headers.get("Accept-Encoding", ""))
+        etag = response.gzip_etag if use_gzip else response.etag
+        if_none_match = self.headers.get("If-None-Match", "")
+        if etag in (tag.strip() for tag in if_none_match.split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", CACHE_CONTROL)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = response.gzipped if use_gzip else response.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", CACHE_CONTROL)
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per request would dominate the spike
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, snapshot):
+        super().__init__(address, ApiHandler)
+        self.snapshot = snapshot
+
+
+def refresh_loop(server, interval=REFRESH_SECONDS):
+    """Swap in a new snapshot whenever a new schedule version is published."""
+    while True:
+        time.sleep(interval)
+        try:
+            # Closed even when the load fails: no connection leaked per poll
+            with closing(create_connection()) as conn:
+                cur = conn.cursor()
+                cur.execute("SELECT MAX(id) FROM versions_planning")
+                version_id = cur.fetchone()[0]
+                if version_id != server.snapshot.version_id:
+                    start = time.time()
+                    server.snapshot = load_snapshot(cur, version_id)
+                    print(f"Loaded version {version_id} in {time.time() - start:.2f}s")
+        except Exception as e:
+            print(f"Refresh failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only schedule API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--synthetic", type=int, default=None, metavar="STUDENTS",
+                        help="serve generated data instead of the database")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.synthetic:
+        snapshot = ApiSnapshot(0, *synthetic_schedule(args.synthetic))
+    else:
+        conn = create_connection()
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(id) FROM versions_planning")
+        snapshot = load_snapshot(cur, cur.fetchone()[0])
+        conn.close()
+    print(f"Snapshot of version {snapshot.version_id}: {len(snapshot.responses):,} "
+          f"responses in {time.time() - start:.2f}s")
+
+    server = ApiServer((args.host, args.port), snapshot)
+    if not args.synthetic:
+        threading.Thread(target=refresh_loop, args=(server,), daemon=True).start()
+    print(f"Serving on http://{args.host}:{args.port}/api/version")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
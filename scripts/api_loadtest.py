@@ -0,0 +1,149 @@
+"""
+Load Test for the Schedule API
+
+Replays a publication-morning mix of requests (mostly student lookups, some
+formation/group pages, a few professor and room pages) from several client
+processes over keep-alive connections, and reports requests per second and
+latency percentiles. A share of requests revalidates with If-None-Match, as
+browsers do on reload.
+
+Without --url, a server is started on synthetic in-memory data (the stand-in
+database of scripts.api --synthetic) and stopped at the end.
+
+Usage:
+    python -m scripts.api_loadtest [--clients 8] [--duration 10]
+    python -m scripts.api_loadtest --url http://127.0.0.1:8502
+"""
+
+import argparse
+import http.client
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+from urllib.parse import urlsplit
+
+REVALIDATE_SHARE = 0.3
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(conn, path, headers=None):
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, response.getheader("ETag"), body
+
+
+def build_paths(host, port, count=5000, seed=1):
+    """A weighted, shuffled list of request paths discovered from the API."""
+    conn = http.client.HTTPConnection(host, port)
+    version = json.loads(_get(conn, "/api/version")[2])
+    formations = json.loads(_get(conn, "/api/formations")[2])
+    professors = json.loads(_get(conn, "/api/professeurs")[2])
+    rooms = json.loads(_get(conn, "/api/salles")[2])
+    conn.close()
+
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        r = rng.random()
+        if r < 0.6:
+            paths.append(f"/api/etudiants/{rng.randint(1, version['etudiants'])}")
+        elif r < 0.7:
+            paths.append(f"/api/etudiants?q={rng.choice(['ben', 'ha', 'sa', 'ka'])}")
+        elif r < 0.85:
+            f = rng.choice(formations)
+            paths.append(f"/api/formations/{f['id']}/groupes/{rng.randint(1, max(1, f['groupes']))}")
+        elif r < 0.9:
+            paths.append(f"/api/formations/{rng.choice(formations)['id']}")
+        elif r < 0.97:
+            paths.append(f"/api/professeurs/{rng.choice(professors)['id']}")
+        else:
+            paths.append(f"/api/salles/{rng.choice(rooms)['id']}")
+    return paths
+
+
+def _client(args):
+    host, port, paths, duration, seed = args
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port)
+    etags = {}
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        headers = {"Accept-Encoding": "gzip"}
+        if path in etags and rng.random() < REVALIDATE_SHARE:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        status, etag, _ = _get(conn, path, headers)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+        if etag:
+            etags[path] = etag
+    conn.close()
+    return latencies, statuses
+
+
+def run(host, port, clients, duration):
+    paths = build_paths(host, port)
+    tasks = [(host, port, paths, duration, seed) for seed in range(clients)]
+    with Pool(clients) as pool:
+        results = pool.map(_client, tasks)
+
+    latencies = sorted(l for lat, _ in results for l in lat)
+    statuses = {}
+    for _, s in results:
+        for status, count in s.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+
+    print(f"{len(latencies):,} requests in {duration}s with {clients} clients: "
+          f"{len(latencies) / duration:,.0f} req/s")
+    print(f"latency p50 {pct(0.50):.2f} ms | p95 {pct(0.95):.2f} ms | p99 {pct(0.99):.2f} ms")
+    print("status: " + ", ".join(f"{k}: {v:,}" for k, v in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the schedule API")
+    parser.add_argument("--url", default=None, help="running API (default: start a synthetic one)")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--duration", type=int, default=10)
+    parser.add_argument("--students", type=int, default=13000, help="synthetic data size")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "scripts.api", "--port", str(port),
+             "--synthetic", str(args.students)],
+            stdout=subprocess.DEVNULL,
+        )
+        for _ in range(100):  # wait for the snapshot to be built
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+
+    try:
+        run(host, port, args.clients, args.duration)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,266 @@
+"""
+Query Benchmark Harness
+
+Benchmarks the queries the frontend pages issue (the constants of
+scripts/queries.py and of the loaders the pages call), on one long-lived
+connection (connection setup is not what we measure):
+- warmup executions first, then N timed repetitions (execute + fetch)
+- p50 / p95 / p99 / mean latency
+- rows examined (Handler_read_* session counters) and rows returned
+- the EXPLAIN plan of each query
+
+Each run is stored (executions_benchmark, resultats_benchmark) so the
+Dashboard can chart trends and flag regressions against previous runs.
+
+Usage:
+    python -m scripts.benchmark [--warmup 3] [--repeat 20] [--no-store]
+"""
+
+import argparse
+import json
+import time
+
+from scripts import queries, runs, snapshot, students
+from scripts.helpers import create_connection
+from scripts.kpi import LATEST_KPIS_SQL
+
+WARMUP = 3
+REPEAT = 20
+
+# A query is a regression when its p95 exceeds the median p95 of the
+# previous runs by this ratio and by at least REGRESSION_MIN_MS
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_MS = 1.0
+REGRESSION_WINDOW = 5
+
+# The ids the parameterized queries are sampled on
+SAMPLE_DEPARTMENT = "SELECT MIN(id) FROM departements"
+SAMPLE_SPECIALTY = "SELECT MIN(id) FROM specialites"
+SAMPLE_FORMATION = "SELECT MIN(formation_id) FROM examens"
+SAMPLE_PROFESSOR = "SELECT MIN(prof_id) FROM surveillances"
+
+# (page, name, sql, sql returning the sample parameter or None). The SQL is
+# the constant the page (scripts/queries.py) or its loader executes, never a
+# copy; a query shared by several pages is listed once
+QUERY_CATALOG = [
+    ("Accueil", "Nombre d'etudiants", queries.COUNT_STUDENTS, None),
+    ("Accueil", "Nombre de modules", queries.COUNT_MODULES, None),
+    ("Accueil", "Nombre de professeurs", queries.COUNT_PROFESSORS, None),
+    ("Accueil", "Nombre d'examens", queries.COUNT_EXAMS, None),
+    ("Dashboard", "KPI snapshot", LATEST_KPIS_SQL, None),
+    ("Emplois du Temps", "Version du planning", queries.SCHEDULE_VERSION, None),
+    ("Emplois du Temps", "Liste des departements", queries.DEPARTMENTS, None),
+    ("Emplois du Temps", "Liste des specialites", queries.SPECIALTIES, None),
+    ("Emplois du Temps", "Specialites d'un departement", queries.SPECIALTIES_OF_DEPT,
+     SAMPLE_DEPARTMENT),
+    ("Emplois du Temps", "Liste des formations", queries.FORMATIONS, None),
+    ("Emplois du Temps", "Formations d'un departement", queries.FORMATIONS_OF_DEPT,
+     SAMPLE_DEPARTMENT),
+    ("Emplois du Temps", "Formations d'une specialite", queries.FORMATIONS_OF_SPECIALTY,
+     SAMPLE_SPECIALTY),
+    ("Emplois du Temps", "Examens d'une formation",
+     snapshot.FORMATION_EXAMS_SQL.format(where="WHERE f.id IN (%s)"), SAMPLE_FORMATION),
+    ("Emplois du Temps", "Groupes d'une formation",
+     snapshot.FORMATION_GROUPS_SQL.format(where="WHERE formation_id IN (%s)"), SAMPLE_FORMATION),
+    ("Emplois du Temps", "Resume des formations", queries.FORMATION_SUMMARY, None),
+    ("Professeurs", "Liste des professeurs", queries.PROFESSORS, None),
+    ("Professeurs", "Professeurs d'un departement", queries.PROFESSORS_OF_DEPT,
+     SAMPLE_DEPARTMENT),
+    ("Professeurs", "Planning d'un professeur", queries.PROFESSOR_SCHEDULE, SAMPLE_PROFESSOR),
+    ("Professeurs", "Depassements 3 par jour", queries.PROFESSOR_OVERLOADED_DAYS,
+     SAMPLE_PROFESSOR),
+    ("Professeurs", "Sessions par jour", queries.PROFESSOR_DAILY_SESSIONS, SAMPLE_PROFESSOR),
+    ("Professeurs", "Resume par departement", queries.PROFESSOR_SUMMARY, None),
+    ("Professeurs", "Distribution des sessions", queries.SESSION_DISTRIBUTION, None),
+    ("Salles", "Cube d'occupation", queries.OCCUPANCY_CUBE, None),
+    ("Salles", "Liste des salles", queries.ROOMS, None),
+    ("Salles", "Creneaux par jour", queries.SLOTS_PER_DAY, queries.SCHEDULE_VERSION),
+    ("Conflits", "Conflits etudiants", queries.STUDENT_CONFLICTS, None),
+    ("Conflits", "Conflits professeurs", queries.PROFESSOR_CONFLICTS, None),
+    ("Conflits", "Conflits capacite", queries.CAPACITY_CONFLICTS, None),
+    ("Conflits", "Detail des conflits etudiants", queries.STUDENT_CONFLICT_DETAIL, None),
+    ("Conflits", "Taux de conflit par departement", queries.DEPT_CONFLICT_RATES, None),
+    ("Conflits", "Conflits par formation", queries.FORMATION_CONFLICTS, None),
+    ("Conflits", "Surcharge des professeurs", queries.PROFESSOR_OVERLOADS, None),
+    ("Conflits", "Charge des professeurs", queries.SESSION_BRACKETS, None),
+    ("Optimisation", "Modules planifies", queries.SCHEDULED_MODULES, None),
+    ("Optimisation", "Examens le vendredi", queries.FRIDAY_EXAMS, None),
+    ("Optimisation", "Ecart des sessions", queries.SESSION_SPREAD, None),
+    ("Optimisation", "Priorite departement", queries.DEPT_PRIORITY, None),
+    ("Optimisation", "Examens par jour", queries.EXAMS_PER_DAY, None),
+    ("Optimisation", "Examens par creneau", queries.EXAMS_PER_SLOT, None),
+    ("Optimisation", "Historique des executions", runs.RUNS_SQL, f"SELECT {runs.RUNS_LIMIT}"),
+    ("Etudiants", "Noms des formations", students.FORMATION_NAMES_SQL, None),
+    ("Etudiants", "Examens (index)", students.GROUP_EXAMS_SQL, None),
+    ("Etudiants", "Redoublants", students.RETAKERS_SQL, None),
+    ("Etudiants", "Effectifs des groupes", students.GROUP_SIZES_SQL, None),
+    ("Etudiants", "Salles des examens", students.EXAM_ROOMS_SQL, None),
+    ("Etudiants", "Index des etudiants", students.STUDENTS_SQL, None),
+]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _rows_read(cur):
+    cur.execute("SHOW SESSION STATUS LIKE 'Handler_read%'")
+    return sum(int(value) for _, value in cur.fetchall())
+
+
+def rows_examined(cur, sql, params):
+    """Rows read by the storage engine for one execution of a query."""
+    before = _rows_read(cur)
+    cur.execute(sql, params)
+    cur.fetchall()
+    after = _rows_read(cur)
+    # SHOW STATUS reads a few rows itself: subtract an empty measurement
+    overhead = _rows_read(cur) - after
+    return max(0, after - before - overhead)
+
+
+def explain(cur, sql, params):
+    """The EXPLAIN plan as a list of {column: value} rows."""
+    cur.execute("EXPLAIN " + sql, params)
+    columns = [desc[0] for desc in cur.description]
+    return [
+        {column: (value if isinstance(value, (int, float, type(None))) else str(value))
+         for column, value in zip(columns, row)}
+        for row in cur.fetchall()
+    ]
+
+
+def benchmark_query(cur, sql, params=None, warmup=WARMUP, repeat=REPEAT):
+    """Time one query. Return a dict of latency percentiles, row counts and plan."""
+    for _ in range(warmup):
+        cur.execute(sql, params)
+        cur.fetchall()
+
+    timings = []
+    returned = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        returned = len(cur.fetchall())
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    return {
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+        "moyenne_ms": sum(timings) / len(timings),
+        "lignes_examinees": rows_examined(cur, sql, params),
+        "lignes_retournees": returned,
+        "plan": explain(cur, sql, params),
+    }
+
+
+def run_benchmark(conn, warmup=WARMUP, repeat=REPEAT, store=True):
+    """Benchmark every catalog query. Return [(page, name, result)] and the run id."""
+    cur = conn.cursor()
+    results = []
+    for page, name, sql, param_sql in QUERY_CATALOG:
+        params = None
+        if param_sql:
+            cur.execute(param_sql)
+            value = cur.fetchone()[0]
+            if value is None:
+                continue  # nothing to sample (empty schedule)
+            params = (value,)
+        results.append((page, name, benchmark_query(cur, sql, params, warmup, repeat)))
+
+    run_id = None
+    if store:
+        cur.execute("SELECT MAX(id) FROM versions_planning")
+        version_id = cur.fetchone()[0]
+        cur.execute(
+            "INSERT INTO executions_benchmark (version_id, repetitions) VALUES (%s, %s)",
+            (version_id, repeat),
+        )
+        run_id = cur.lastrowid
+        cur.executemany(
+            """
+            INSERT INTO resultats_benchmark
+                (execution_id, page, requete, p50_ms, p95_ms, p99_ms, moyenne_ms,
+                 lignes_examinees, lignes_retournees, plan)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            [
+                (run_id, page, name, r["p50_ms"], r["p95_ms"], r["p99_ms"], r["moyenne_ms"],
+                 r["lignes_examinees"], r["lignes_retournees"], json.dumps(r["plan"]))
+                for page, name, r in results
+            ],
+        )
+        conn.commit()
+    return results, run_id
+
+
+def load_history(cur, runs=30):
+    """Rows (execution_id, lance_le, page, requete, p50, p95, p99, examinees) of the last runs."""
+    cur.execute("""
+        SELECT r.execution_id, e.lance_le, r.page, r.requete,
+               r.p50_ms, r.p95_ms, r.p99_ms, r.lignes_examinees
+        FROM resultats_benchmark r
+        JOIN executions_benchmark e ON r.execution_id = e.id
+        WHERE r.execution_id > (SELECT COALESCE(MAX(id), 0) - %s FROM executions_benchmark)
+        ORDER BY r.execution_id, r.page, r.requete
+    """, (runs,))
+    return cur.fetchall()
+
+
+def flag_regressions(history, window=REGRESSION_WINDOW):
+    """{requete: (p95 of the last run, median p95 of the previous runs)} for regressions.
+
+    history: rows as returned by load_history.
+    """
+    by_query = {}
+    for run_id, _, _, name, _, p95, _, _ in history:
+        by_query.setdefault(name, []).append((run_id, float(p95)))
+    flagged = {}
+    for name, runs in by_query.items():
+        runs.sort()
+        if len(runs) < 2:
+            continue
+        last = runs[-1][1]
+        previous = sorted(p95 for _, p95 in runs[-1 - window:-1])
+        baseline = previous[len(previous) // 2]
+        if last > baseline * REGRESSION_RATIO and last - baseline >= REGRESSION_MIN_MS:
+            flagged[name] = (last, baseline)
+    return flagged
+
+
+def load_plan(cur, run_id, name):
+    cur.execute(
+        "SELECT plan FROM resultats_benchmark WHERE execution_id = %s AND requete = %s",
+        (run_id, name),
+    )
+    row = cur.fetchone()
+    return json.loads(row[0]) if row else []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the frontend queries")
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--no-store", action="store_true", help="do not record the run")
+    args = parser.parse_args()
+
+    conn = create_connection()
+    results, run_id = run_benchmark(conn, args.warmup, args.repeat, store=not args.no_store)
+
+    print(f"{'Page':<18} {'Requete':<34} {'p50':>8} {'p95':>8} {'p99':>8} {'examinees':>10} {'lignes':>8}")
+    for page, name, r in results:
+        print(f"{page:<18} {name:<34} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+              f"{r['lignes_examinees']:10,} {r['lignes_retournees']:8,}")
+
+    if run_id is not None:
+        flagged = flag_regressions(load_history(conn.cursor()))
+        for name, (last, baseline) in flagged.items():
+            print(f"REGRESSION: {name}: p95 {last:.2f} ms (previous runs: {baseline:.2f} ms)")
+        print(f"Stored as run {run_id}")
+    conn.close()
@@ -0,0 +1,298 @@
+"""
+Department Decomposition
+
+With formation-based enrollment the conflict graph is a set of disjoint
+cliques (one per formation), and department priority keeps proctoring mostly
+inside a department. This solver mode splits the problem along the connected
+components of the conflict graph, grouped by department (a component that
+spans departments merges them into one subproblem), and solves the
+subproblems in worker processes:
+
+1. rooms are partitioned between subproblems in proportion to their demand,
+   per room type; the rounding remainder is a shared spill pool
+2. each subproblem colors its days (with its own soft-objective scorer and
+   local improvement) and seats its groups in its own rooms
+3. reconciliation seats the groups left over, slot by slot, in the spill
+   pool and in the rooms other subproblems left free in that slot
+4. each subproblem assigns its own professors under the global session caps
+5. reconciliation gives the sessions left over to professors of other
+   departments (least loaded first, max 3 per day)
+
+Usage:
+    python -m scripts.optimize --mode departements [--workers N]
+"""
+
+import copy
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.objectives import Scorer, improve_days
+from scripts.solver import (
+    SlotRooms, assign_proctors, assign_rooms, build_conflicts, is_formation_based,
+    module_groups, pack_sittings, place_groups, proctors_needed, schedule_days,
+    session_caps, sessions_needed,
+)
+
+MODE = "departements"
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def connected_components(module_ids, conflicts):
+    """Module lists of the connected components of the conflict graph."""
+    parent = {m: m for m in module_ids}
+    for module_id, others in conflicts.items():
+        root = _find(parent, module_id)
+        for other in others:
+            other_root = _find(parent, other)
+            if other_root != root:
+                parent[other_root] = root
+    components = defaultdict(list)
+    for module_id in module_ids:
+        components[_find(parent, module_id)].append(module_id)
+    return list(components.values())
+
+
+def conflict_components(problem):
+    """Connected components of the conflict graph (one per formation without retakes).
+
+    The modules of a sitting (common-module synchronization) are linked too.
+    """
+    if is_formation_based(problem):
+        return [list(modules) for modules in problem.modules_by_formation.values()]
+    links = build_conflicts(problem)
+    for members in problem.sittings.values():
+        links[members[0]].update(members[1:])
+    return connected_components(problem.module_ids, links)
+
+
+def department_parts(problem, components):
+    """[(dept_ids, module_ids)]: components grouped by department.
+
+    Departments linked by a component (students shared across departments)
+    end up in the same part.
+    """
+    parent = {}
+    for component in components:
+        depts = {problem.modules[m]["dept_id"] for m in component}
+        for dept_id in depts:
+            parent.setdefault(dept_id, dept_id)
+        first = _find(parent, next(iter(depts)))
+        for dept_id in depts:
+            root = _find(parent, dept_id)
+            if root != first:
+                parent[root] = first
+
+    parts = defaultdict(lambda: (set(), []))
+    for component in components:
+        root = _find(parent, problem.modules[component[0]]["dept_id"])
+        depts, modules = parts[root]
+        depts.update(problem.modules[m]["dept_id"] for m in component)
+        modules.extend(component)
+    return [(frozenset(depts), sorted(modules)) for depts, modules in parts.values()]
+
+
+def partition_rooms(problem, parts):
+    """Room list per part, proportional to its demand per type, and the spill pool."""
+    demand = []
+    for _, module_ids in parts:
+        large = small = 0
+        for module_id in module_ids:
+            for _, size in module_groups(problem, module_id):
+                if size > 20:
+                    large += 1
+                else:
+                    small += 1
+        demand.append({"Amphi": large, "Salle_TD": small})
+
+    owned = [[] for _ in parts]
+    spill = []
+    for room_type in ("Amphi", "Salle_TD"):
+        rooms = [loc for loc in problem.locations if loc[2] == room_type]
+        total = sum(d[room_type] for d in demand)
+        start = 0
+        for i, d in enumerate(demand):
+            count = len(rooms) * d[room_type] // total if total else 0
+            owned[i].extend(rooms[start:start + count])
+            start += count
+        spill.extend(rooms[start:])
+    return owned, spill
+
+
+def subproblem(problem, depts, module_ids, locations):
+    """Copy of the problem restricted to some modules, departments and rooms."""
+    part = copy.copy(problem)
+    part.module_ids = module_ids
+    part.modules = {m: problem.modules[m] for m in module_ids}
+    formations = {problem.modules[m]["formation_id"] for m in module_ids}
+    part.modules_by_formation = defaultdict(list, {
+        f: problem.modules_by_formation[f] for f in formations
+    })
+    part.formation_groups = {
+        f: g for f, g in problem.formation_groups.items() if f in formations
+    }
+    part.formation_headcount = {
+        f: h for f, h in problem.formation_headcount.items() if f in formations
+    }
+    part.professors = {p: d for p, d in problem.professors.items() if d["dept_id"] in depts}
+    part.prof_ids = [p for p in problem.prof_ids if p in part.professors]
+    part.locations = locations
+    # Sittings shrink to what the part's own rooms can hold
+    sittings = {members for m, members in problem.sittings.items() if m in part.modules}
+    part.sittings = pack_sittings(part, sittings)
+    return part
+
+
+def _solve_part(part, num_days, slots_per_day):
+    """Worker: days and rooms of one subproblem."""
+    # Spacing and clustering only involve a formation or a department: scored per part
+    scorer = Scorer(part)
+    rooms = SlotRooms(part)  # the part's own rooms: what does not fit goes to reconciliation
+    module_day, module_slot, days_needed = schedule_days(
+        part, num_days, slots_per_day, scorer, rooms
+    )
+    conflicts = None if is_formation_based(part) else build_conflicts(part)
+    improve_days(part, module_day, module_slot, scorer, conflicts, rooms)
+    unplaced = {}
+    module_rooms = assign_rooms(part, module_day, module_slot, unplaced)
+    return module_day, module_slot, module_rooms, unplaced, days_needed
+
+
+def _proctor_part(part, module_day, module_slot, module_rooms, caps):
+    """Worker: proctors of one subproblem from its own professors."""
+    return assign_proctors(part, module_day, module_slot, module_rooms, caps, scorer=Scorer(part))
+
+
+def reconcile_rooms(problem, module_day, module_slot, module_rooms, unplaced):
+    """Seat leftover groups in the rooms still free in their slot. Return groups seated."""
+    used = defaultdict(set)
+    for module_id, rooms in module_rooms.items():
+        used[(module_day[module_id], module_slot[module_id])].update(r[0] for r in rooms)
+
+    by_slot = defaultdict(list)
+    for module_id in unplaced:
+        by_slot[(module_day[module_id], module_slot[module_id])].append(module_id)
+
+    seated = 0
+    for key, module_ids in by_slot.items():
+        free = [loc for loc in problem.locations if loc[0] not in used[key]]
+        free_amphis = [loc for loc in free if loc[2] == "Amphi"]
+        free_salles = [loc for loc in free if loc[2] == "Salle_TD"]
+        for module_id in module_ids:
+            groups = sorted(unplaced[module_id], key=lambda x: x[1], reverse=True)
+            rooms, left = place_groups(groups, free_amphis, free_salles)
+            module_rooms[module_id].extend(rooms)
+            seated += len(groups) - len(left)
+    return seated
+
+
+def reconcile_proctors(problem, module_day, module_slot, module_rooms, exam_proctors,
+                       prof_sessions, caps):
+    """Fill the sessions left over with any professor under the caps and free
+    in the slot. Return sessions added."""
+    sessions_per_prof, extra_sessions = caps
+    prof_day_count = defaultdict(lambda: defaultdict(int))
+    busy = set()  # (prof_id, day, slot)
+    for module_id, proctors in exam_proctors.items():
+        for prof_id in proctors:
+            prof_day_count[prof_id][module_day[module_id]] += 1
+            busy.add((prof_id, module_day[module_id], module_slot[module_id]))
+
+    added = 0
+    module_needs = proctors_needed(module_rooms, problem.sittings)
+    for module_id in problem.module_ids:
+        needed = module_needs[module_id]
+        assigned = exam_proctors.setdefault(module_id, [])
+        if len(assigned) >= needed:
+            continue
+        day, slot = module_day[module_id], module_slot[module_id]
+        candidates = [
+            p for p in problem.prof_ids
+            if prof_day_count[p][day] < 3
+            and prof_sessions[p] < sessions_per_prof + (1 if p in extra_sessions else 0)
+            and (p, day, slot) not in busy
+            and p not in assigned
+        ]
+        candidates.sort(key=lambda p: prof_sessions[p])
+        for prof_id in candidates[:needed - len(assigned)]:
+            assigned.append(prof_id)
+            prof_sessions[prof_id] += 1
+            prof_day_count[prof_id][day] += 1
+            busy.add((prof_id, day, slot))
+            added += 1
+    return added
+
+
+def solve_by_department(problem, num_days, slots_per_day, workers=None, timer=None):
+    """Phases 1-4 by department subproblems in parallel, then reconciliation.
+
+    problem.sittings is replaced by the sittings re-packed in each part.
+
+    Return (module_day, module_slot, module_rooms, exam_proctors, prof_sessions, stats).
+    """
+    components = conflict_components(problem)
+    parts = department_parts(problem, components)
+    owned, _ = partition_rooms(problem, parts)  # the spill pool is left for reconciliation
+    subproblems = [
+        subproblem(problem, depts, module_ids, rooms)
+        for (depts, module_ids), rooms in zip(parts, owned)
+    ]
+    # The sittings the parts hold are the ones the schedule uses from here on
+    problem.sittings = {m: s for part in subproblems for m, s in part.sittings.items()}
+    if timer:
+        timer.lap("graphe")
+
+    module_day, module_slot, module_rooms, unplaced = {}, {}, {}, {}
+    days_needed = 0
+    workers = min(workers or os.cpu_count() or 1, len(subproblems)) or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for day, slot, rooms, left, needed in pool.map(
+                _solve_part, subproblems, [num_days] * len(subproblems),
+                [slots_per_day] * len(subproblems)):
+            module_day.update(day)
+            module_slot.update(slot)
+            module_rooms.update(rooms)
+            unplaced.update(left)
+            days_needed = max(days_needed, needed)
+        if timer:
+            timer.lap("salles")
+
+        groups_reconciled = reconcile_rooms(problem, module_day, module_slot, module_rooms, unplaced)
+        if timer:
+            timer.lap("reconciliation_salles")
+
+        # Session caps of the whole schedule, so departments stay balanced with each other
+        caps = session_caps(sessions_needed(module_rooms, problem.sittings), problem.prof_ids)
+        exam_proctors = {}
+        prof_sessions = defaultdict(int)
+        part_rooms = [{m: module_rooms[m] for m in part.module_ids} for part in subproblems]
+        for proctors, sessions in pool.map(
+                _proctor_part, subproblems, [module_day] * len(subproblems),
+                [module_slot] * len(subproblems), part_rooms,
+                [caps] * len(subproblems)):
+            exam_proctors.update(proctors)
+            for prof_id, count in sessions.items():
+                prof_sessions[prof_id] += count
+        if timer:
+            timer.lap("surveillants")
+
+    sessions_reconciled = reconcile_proctors(
+        problem, module_day, module_slot, module_rooms, exam_proctors, prof_sessions, caps
+    )
+    if timer:
+        timer.lap("reconciliation_surveillants")
+
+    stats = {
+        "sous_problemes": len(subproblems),
+        "composantes": len(components),
+        "jours_necessaires": days_needed,
+        "groupes_reconcilies": groups_reconciled,
+        "surveillances_reconciliees": sessions_reconciled,
+    }
+    return module_day, module_slot, module_rooms, exam_proctors, prof_sessions, stats
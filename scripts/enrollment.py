@@ -0,0 +1,232 @@
+"""
+Explicit Enrollment (Retakes)
+
+Students take every module of their formation implicitly; the optional
+inscriptions table adds the modules they retake from other formations.
+Only the students with retakes ("retakers") need per-student data, so they
+are kept as NumPy arrays:
+
+- module sets: CSR rows over module columns (own formation + retakes)
+- headcounts: formation headcount + retakers per module (np.bincount)
+- conflicts: module pairs shared by retakers, enumerated per row length
+  and counted with np.unique, instead of a Python loop per student
+- student-day violations: each retaker's exam days OR-ed into one packed
+  64-bit day mask; violations = exams - popcount(mask)
+
+The table is filled in bulk (batched INSERTs or LOAD DATA LOCAL INFILE)
+from a CSV export or from synthetic retakes; emptying it returns the
+optimizer to the formation-based fast path.
+
+Usage:
+    python -m scripts.enrollment                          # retake statistics
+    python -m scripts.enrollment generate [--rate 0.3] [--max-modules 3] [--load-data]
+    python -m scripts.enrollment import retakes.csv [--load-data]
+    python -m scripts.enrollment clear
+"""
+
+import time
+
+import numpy as np
+
+from scripts.helpers import create_connection
+
+
+def _popcount(values):
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(values).astype(np.int64)
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), -1).sum(axis=1)
+
+
+class Enrollment:
+    """Module sets of the students with retakes, over the model's module columns."""
+
+    def __init__(self, model):
+        self.module_ids = model.module_ids
+        num_modules = max(len(self.module_ids), 1)
+        enroll_student = model.enroll_student
+        enroll_module = model.enroll_module
+
+        # Module column and student row of each inscription (unknown ids dropped)
+        mcol = np.searchsorted(self.module_ids, enroll_module)
+        student_order = np.argsort(model.student_ids, kind="stable")
+        spos = np.searchsorted(model.student_ids, enroll_student, sorter=student_order)
+        known = (mcol < len(self.module_ids)) & (spos < len(student_order))
+        mcol, spos = mcol[known], student_order[spos[known]]
+        known = ((self.module_ids[mcol] == enroll_module[known])
+                 & (model.student_ids[spos] == enroll_student[known])
+                 # a module of the student's own formation is not a retake
+                 & (model.module_formation[mcol] != model.student_formation[spos]))
+        keys = np.unique(spos[known].astype(np.int64) * num_modules + mcol[known])
+        self.retake_cols = (keys % num_modules).astype(np.int32)
+
+        # Retakers: one row each, with their formation and group
+        self.students, retake_rows = np.unique(keys // num_modules, return_inverse=True)
+        self.student_ids = model.student_ids[self.students]
+        self.student_formation = model.student_formation[self.students]
+        self.student_group = model.student_group[self.students]
+
+        # Own formation modules of each retaker: a range of the modules sorted by formation
+        by_formation = np.argsort(model.module_formation, kind="stable")
+        sorted_formation = model.module_formation[by_formation]
+        first = np.searchsorted(sorted_formation, self.student_formation, side="left")
+        own_count = np.searchsorted(sorted_formation, self.student_formation, side="right") - first
+        own_rows = np.repeat(np.arange(len(self.students)), own_count)
+        offsets = (np.arange(len(own_rows))
+                   - np.repeat(np.cumsum(own_count) - own_count, own_count)
+                   + np.repeat(first, own_count))
+        own_cols = by_formation[offsets].astype(np.int32)
+
+        rows = np.concatenate([own_rows, retake_rows]).astype(np.int64)
+        cols = np.concatenate([own_cols, self.retake_cols])
+        order = np.lexsort((cols, rows))
+        self.cols = cols[order]
+        self.indptr = np.searchsorted(rows[order], np.arange(len(self.students) + 1))
+
+    def __len__(self):
+        """Number of retake inscriptions (0: enrollment is purely formation-based)."""
+        return len(self.retake_cols)
+
+    def retakers_per_module(self):
+        """{module_id: students retaking it}."""
+        counts = np.bincount(self.retake_cols, minlength=len(self.module_ids))
+        nonzero = np.flatnonzero(counts)
+        return dict(zip(self.module_ids[nonzero].tolist(), counts[nonzero].tolist()))
+
+    def retakers_per_formation(self):
+        """{formation_id: its students with retakes}."""
+        formations, counts = np.unique(self.student_formation, return_counts=True)
+        return dict(zip(formations.tolist(), counts.tolist()))
+
+    def conflict_pairs(self):
+        """Module pairs shared by retakers: (module_a, module_b, students) arrays, a < b."""
+        num_modules = len(self.module_ids)
+        lengths = np.diff(self.indptr)
+        keys = []
+        # Rows of the same length form a (rows, k) matrix: all its pairs at once
+        for k in np.unique(lengths):
+            if k < 2:
+                continue
+            starts = self.indptr[:-1][lengths == k]
+            row_cols = self.cols[starts[:, None] + np.arange(k)].astype(np.int64)
+            i, j = np.triu_indices(k, 1)
+            keys.append((row_cols[:, i] * num_modules + row_cols[:, j]).ravel())
+        if not keys:
+            empty = np.empty(0, dtype=self.module_ids.dtype)
+            return empty, empty, np.empty(0, dtype=np.int64)
+        pairs, counts = np.unique(np.concatenate(keys), return_counts=True)
+        return self.module_ids[pairs // num_modules], self.module_ids[pairs % num_modules], counts
+
+    def student_day_violations(self, module_day):
+        """Retaker-days with more than one exam, from {module_id: day}."""
+        if not len(self.students):
+            return 0
+        days = np.array([module_day[m] for m in self.module_ids.tolist()], dtype=np.uint64)
+        row_days = days[self.cols]
+        if row_days.max() >= 64:  # more days than mask bits: count distinct (student, day)
+            rows = np.repeat(np.arange(len(self.students)), np.diff(self.indptr))
+            keys = rows * (int(row_days.max()) + 1) + row_days.astype(np.int64)
+            return int(len(row_days) - len(np.unique(keys)))
+        day_bits = np.left_shift(np.uint64(1), row_days)
+        masks = np.bitwise_or.reduceat(day_bits, self.indptr[:-1])
+        return int((np.diff(self.indptr) - _popcount(masks)).sum())
+
+
+def generate_retakes(cur, rate, seed, max_modules=3):
+    """Synthetic retakes: (etudiant_id, module_id) rows.
+
+    A student past the first semester retakes, with probability `rate`,
+    1 to `max_modules` modules of an earlier semester of their specialite.
+    Deterministic for a given seed.
+    """
+    cur.execute("SELECT id, specialite_id, cycle, semestre FROM formations")
+    formations = {f: (spec, cycle, sem) for f, spec, cycle, sem in cur.fetchall()}
+    cur.execute("SELECT id, formation_id FROM modules ORDER BY id")
+    earlier = {}  # (specialite, cycle, semestre) -> module ids
+    for module_id, formation_id in cur.fetchall():
+        earlier.setdefault(formations[formation_id], []).append(module_id)
+
+    rng = np.random.default_rng(seed)
+    cur.execute("SELECT id, formation_id FROM etudiants ORDER BY id")
+    for student_id, formation_id in cur.fetchall():
+        spec, cycle, sem = formations[formation_id]
+        if sem == 1 or rng.random() >= rate:
+            continue
+        pool = [m for s in range(1, sem) for m in earlier.get((spec, cycle, s), [])]
+        if not pool:
+            continue
+        count = min(int(rng.integers(1, max_modules + 1)), len(pool))
+        for module_id in rng.choice(pool, size=count, replace=False).tolist():
+            yield student_id, module_id
+
+
+def read_csv(path):
+    """(etudiant_id, module_id) rows of a CSV file (header optional)."""
+    import csv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if row and row[0].strip().isdigit():
+                yield int(row[0]), int(row[1])
+
+
+def load_inscriptions(conn, rows, load_data=False):
+    """Replace the inscriptions table with the given rows, in bulk."""
+    from scripts.populate_db import bulk_insert
+
+    cur = conn.cursor()
+    cur.execute("SET SESSION unique_checks = 0")
+    try:
+        cur.execute("TRUNCATE TABLE inscriptions")
+        count = bulk_insert(cur, "inscriptions", ("etudiant_id", "module_id"), rows, load_data)
+        conn.commit()
+    finally:
+        cur.execute("SET SESSION unique_checks = 1")
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from scripts.loader import load_model
+
+    parser = argparse.ArgumentParser(description="Optional retake enrollment")
+    sub = parser.add_subparsers(dest="command")
+    gen = sub.add_parser("generate", help="replace inscriptions with synthetic retakes")
+    gen.add_argument("--rate", type=float, default=0.3, help="share of students with retakes")
+    gen.add_argument("--max-modules", type=int, default=3, help="retakes per student, at most")
+    gen.add_argument("--seed", type=int, default=42)
+    imp = sub.add_parser("import", help="replace inscriptions with a CSV (etudiant_id,module_id)")
+    imp.add_argument("path")
+    for p in (gen, imp):
+        p.add_argument("--load-data", action="store_true",
+                       help="load through LOAD DATA LOCAL INFILE instead of batched INSERTs")
+    sub.add_parser("clear", help="empty inscriptions: back to formation-based enrollment")
+    args = parser.parse_args()
+
+    load_data = getattr(args, "load_data", False)
+    conn = create_connection(allow_local_infile=load_data)
+    if args.command == "generate":
+        rows = list(generate_retakes(conn.cursor(), args.rate, args.seed, args.max_modules))
+        load_inscriptions(conn, rows, load_data)
+    elif args.command == "import":
+        load_inscriptions(conn, read_csv(args.path), load_data)
+    elif args.command == "clear":
+        load_inscriptions(conn, [])
+
+    start = time.time()
+    model = load_model(conn)
+    loaded = time.time() - start
+    conn.close()
+
+    start = time.time()
+    enrollment = Enrollment(model)
+    built = time.time() - start
+    start = time.time()
+    a, _, shared = enrollment.conflict_pairs()
+    paired = time.time() - start
+
+    print(f"{len(model.enroll_student):,} inscriptions, {len(enrollment):,} retakes "
+          f"by {len(enrollment.students):,} students")
+    print(f"{len(a):,} module pairs shared by retakers ({int(shared.sum()):,} student-pairs)")
+    print(f"Loaded in {loaded:.2f}s, built in {built * 1000:.1f} ms, "
+          f"pairs in {paired * 1000:.1f} ms")
@@ -0,0 +1,174 @@
+"""
+Bulk Timetable Export
+
+Exports formation timetables or professor plannings as a ZIP of PDFs:
+- one bulk fetch of all schedules (snapshot), grouped in memory
+- PDFs already in the PDF store for the schedule version are reused, the
+  others are rendered in a process pool
+- the ZIP is produced as a stream of chunks, never held whole in memory
+
+Usage:
+    python -m scripts.export formations EDT_Toutes_Formations.zip [--workers 8]
+    python -m scripts.export professors Plannings.zip [--dept 3]
+"""
+
+import argparse
+import time
+import zipfile
+
+from scripts import pdf_cache
+from scripts.helpers import create_connection
+from scripts.pdf import (
+    generate_pdf,
+    generate_prof_pdf,
+    formation_pdf_filename,
+    prof_pdf_filename,
+    render_parallel,
+)
+from scripts.snapshot import load_formation_schedules, load_professor_schedules
+
+CHUNK_SIZE = 1 << 20  # flush the ZIP stream every ~1 MB
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that buffers ZIP output."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def stream_zip(entries, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of a ZIP archive built from (filename, data) entries.
+
+    Entries are consumed lazily; at most one entry plus chunk_size bytes of
+    archive are in memory at any time.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, data in entries:
+            archive.writestr(filename, data)
+            if len(sink.buffer) >= chunk_size:
+                yield sink.take()
+    yield sink.take()
+
+
+def _render_formation(task):
+    filename, name, modules, rows, groups = task
+    return filename, generate_pdf(name, modules, rows, groups)
+
+
+def _render_professor(task):
+    filename, name, dept_name, rows = task
+    return filename, generate_prof_pdf(name, dept_name, rows)
+
+
+def _cached_then_rendered(kind, version_id, tasks, render, workers):
+    """Yield (filename, pdf) from the PDF store, rendering only the misses."""
+    missing = []
+    for entity_id, task in tasks:
+        data = pdf_cache.get(version_id, kind, entity_id)
+        if data is None:
+            missing.append((entity_id, task))
+        else:
+            yield task[0], data
+    rendered = render_parallel(render, [task for _, task in missing], workers)
+    for (entity_id, _), (filename, data) in zip(missing, rendered):
+        pdf_cache.put(version_id, kind, entity_id, data)
+        yield filename, data
+
+
+def formation_pdf_entries(cur, formation_ids=None, version_id=None, workers=None):
+    """Yield (filename, pdf bytes) for every formation with planned exams."""
+    schedules = load_formation_schedules(cur, formation_ids)
+    tasks = [
+        (s.formation_id, (formation_pdf_filename(s.name), s.name, s.modules, s.pivot(), s.groups))
+        for s in schedules.values()
+        if s.exams
+    ]
+    return _cached_then_rendered(pdf_cache.FORMATION, version_id, tasks, _render_formation, workers)
+
+
+def professor_pdf_entries(cur, prof_ids=None, version_id=None, workers=None, by_department=True):
+    """Yield (filename, pdf bytes) for every professor with surveillances.
+
+    With by_department, files are placed in one folder per department.
+    """
+    schedules = load_professor_schedules(cur, prof_ids)
+    tasks = []
+    for s in schedules.values():
+        if not s.rows:
+            continue
+        filename = prof_pdf_filename(s.name, s.prof_id)
+        if by_department:
+            filename = f"{s.dept_name.replace(' ', '_')}/{filename}"
+        tasks.append((s.prof_id, (filename, s.name, s.dept_name, s.rows)))
+    return _cached_then_rendered(pdf_cache.PROFESSOR, version_id, tasks, _render_professor, workers)
+
+
+def _current_version(cur):
+    cur.execute("SELECT MAX(id) FROM versions_planning")
+    return cur.fetchone()[0]
+
+
+def write_zip(entries, out):
+    """Stream entries as a ZIP into a binary file object, return its size."""
+    size = 0
+    for chunk in stream_zip(entries):
+        out.write(chunk)
+        size += len(chunk)
+    return size
+
+
+def export_formations_zip(cur, out, formation_ids=None, workers=None):
+    """Write the ZIP of formation PDFs to a binary file object."""
+    version_id = _current_version(cur)
+    return write_zip(formation_pdf_entries(cur, formation_ids, version_id, workers), out)
+
+
+def export_professors_zip(cur, out, prof_ids=None, workers=None, by_department=True):
+    """Write the ZIP of professor PDFs to a binary file object."""
+    version_id = _current_version(cur)
+    return write_zip(
+        professor_pdf_entries(cur, prof_ids, version_id, workers, by_department), out
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export timetables as a ZIP of PDFs")
+    parser.add_argument("kind", choices=["formations", "professors"])
+    parser.add_argument("output", help="ZIP file to write")
+    parser.add_argument("--dept", type=int, default=None, help="professors of one department")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.time()
+    conn = create_connection()
+    cur = conn.cursor()
+    with open(args.output, "wb") as f:
+        if args.kind == "formations":
+            size = export_formations_zip(cur, f, workers=args.workers)
+        else:
+            prof_ids = None
+            if args.dept is not None:
+                cur.execute("SELECT id FROM professeurs WHERE dept_id = %s", (args.dept,))
+                prof_ids = [row[0] for row in cur.fetchall()]
+            size = export_professors_zip(cur, f, prof_ids, workers=args.workers)
+    conn.close()
+    print(f"Wrote {args.output} ({size / 1e6:.1f} MB) in {time.time() - start:.2f}s")
@@ -0,0 +1,271 @@
+"""
+Feasibility Pre-check
+
+Lower bounds of the schedule computed on the loaded problem in a few
+milliseconds, before any phase runs, so a shortage of days, rooms or
+professors is explained up front instead of surfacing as warnings after a
+full run:
+
+- days: a clique of the conflict graph (the largest formation, the module
+  set of one retaker, or with retakes a greedy clique across formations)
+  needs that many days; with fewer, every student of a formation or
+  retaker clique loses (clique - days) exam days. With retakes the graph
+  can need more days than its cliques: a greedy coloring above the days
+  makes the finding binding
+- seats per slot: each exam (a sitting of synchronized common modules is
+  one) needs at least the seats of its students and the fewest rooms that
+  hold them; the preferred amphis and salles TD (SlotRooms demand) show
+  which room type runs short first
+- proctors: each proctor watches at most the seats of one proctor's share
+  of a room (20 students), against professors x days x 3
+- departments: each department's proctoring demand against its own
+  professors at an equal share of sessions; the excess goes to other
+  departments (an estimate, not a bound: the share grows with the sessions)
+
+check_feasibility returns the bounds and one finding per constraint
+(OK, SERRE: binding, IMPOSSIBLE: a hard constraint cannot hold);
+gap_report compares a finished run with the bounds.
+
+Usage:
+    python -m scripts.feasibility
+"""
+
+import math
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from scripts.solver import SlotRooms, build_conflicts, proctors_for_room
+
+OK = "OK"
+BINDING = "SERRE"
+INFEASIBLE = "IMPOSSIBLE"
+
+# Demand above this share of the supply is reported as binding
+BINDING_RATIO = 0.9
+MAX_SESSIONS_PER_DAY = 3
+
+
+def _status(demand, supply):
+    if demand > supply:
+        return INFEASIBLE
+    return BINDING if demand > BINDING_RATIO * supply else OK
+
+
+def _finding(constraint, status, demand, supply, detail):
+    return {"contrainte": constraint, "statut": status, "demande": demand,
+            "offre": supply, "detail": detail}
+
+
+def greedy_clique(conflicts):
+    """Size of a large clique: from each module, add the candidate of largest
+    degree, keeping the candidates that conflict with the whole clique."""
+    best = 0
+    for module_id, neighbours in conflicts.items():
+        if len(neighbours) < best:
+            continue
+        size = 1
+        candidates = set(neighbours)
+        while candidates:
+            pick = max(candidates, key=lambda m: len(conflicts[m]))
+            candidates &= conflicts[pick]
+            size += 1
+        best = max(best, size)
+    return best
+
+
+def greedy_colors(conflicts):
+    """Days a greedy coloring (largest degree first) needs: an upper bound."""
+    colors = {}
+    for module_id in sorted(conflicts, key=lambda m: len(conflicts[m]), reverse=True):
+        used = {colors[m] for m in conflicts[module_id] if m in colors}
+        colors[module_id] = next(c for c in range(len(used) + 1) if c not in used)
+    return max(colors.values()) + 1 if colors else 0
+
+
+def _day_bounds(problem, num_days):
+    """(largest clique, student-day violations lower bound)."""
+    retakes = problem.retakes
+    retakers = retakes.retakers_per_formation() if retakes else {}
+    clique = violations = 0
+    for formation_id, headcount in problem.formation_headcount.items():
+        size = len(problem.modules_by_formation[formation_id])
+        if headcount:
+            clique = max(clique, size)
+        # Retakers take these modules too, and are counted one by one below
+        violations += max(0, size - num_days) * (headcount - retakers.get(formation_id, 0))
+    if retakes:
+        row_sizes = np.diff(retakes.indptr)
+        clique = max(clique, int(row_sizes.max()))
+        violations += int(np.maximum(row_sizes - num_days, 0).sum())
+    return clique, violations
+
+
+def check_feasibility(problem, num_days, slots_per_day):
+    """Lower bounds and findings of a problem over num_days x slots_per_day.
+
+    Return {"bornes": {bound: value}, "constats": [finding, ...]}.
+    """
+    total_slots = num_days * slots_per_day
+    findings = []
+    bounds = {}
+
+    # Days: a clique of k modules needs k days
+    clique, violations = _day_bounds(problem, num_days)
+    colors = None
+    if problem.retakes:
+        # Retakers join formations: cliques cross them, and the coloring may need more
+        conflicts = build_conflicts(problem)
+        clique = max(clique, greedy_clique(conflicts))
+        colors = greedy_colors(conflicts)
+        # Same-day modules of a clique share students: one excess exam each at least
+        violations = max(violations, clique - num_days)
+    bounds["jours"] = clique
+    bounds["conflits_etudiants"] = violations
+    status = _status(clique, num_days)
+    detail = f"largest clique of conflicting modules: {clique} exams, {num_days} days"
+    if colors is not None and colors > num_days:
+        if status == OK:
+            status = BINDING
+        detail += f"; a greedy coloring needs {colors} days"
+    if violations:
+        detail += f"; at least {violations} student-day violations"
+    findings.append(_finding("Jours d'examen", status, clique, num_days, detail))
+
+    # Seats: students per exam, and the fewest rooms that hold them (largest rooms first).
+    # A sitting of synchronized common modules is one exam, under its lead module
+    rooms = SlotRooms(problem)
+    exams = [m for m in problem.module_ids if problem.sittings.get(m, (m,))[0] == m]
+    capacities = np.sort(np.array([cap for _, cap, _ in problem.locations], dtype=np.int64))[::-1]
+    cumulative = np.cumsum(capacities)
+    headcount = np.array([sum(size for _, size in rooms.groups[m]) for m in exams],
+                         dtype=np.int64)
+    seat_supply = int(cumulative[-1]) if len(cumulative) else 0
+    fewest_rooms = np.where(headcount > 0, np.searchsorted(cumulative, headcount) + 1, 0)
+
+    unseatable = [m for m in rooms.unseatable if m in exams]
+    seat_demand = int(headcount.sum())
+    bounds["etudiants_sans_place"] = max(
+        seat_demand - seat_supply * total_slots,
+        int(np.maximum(headcount - seat_supply, 0).sum()),
+        0,
+    )
+    detail = (f"{math.ceil(seat_demand / total_slots)} seats per slot at best, "
+              f"{seat_supply} per slot")
+    status = _status(seat_demand, seat_supply * total_slots)
+    if unseatable:
+        status = INFEASIBLE
+        detail += f"; {len(unseatable)} modules cannot be seated even alone (e.g. {unseatable[0]})"
+    findings.append(_finding("Places par creneau", status, seat_demand,
+                             seat_supply * total_slots, detail))
+
+    room_demand = int(np.minimum(fewest_rooms, len(capacities)).sum())
+    room_supply = len(capacities) * total_slots
+    findings.append(_finding(
+        "Salles par creneau", _status(room_demand, room_supply), room_demand, room_supply,
+        f"{math.ceil(room_demand / total_slots)} rooms per slot at best, "
+        f"{len(capacities)} per slot",
+    ))
+
+    # Preferred room types: running short only means substitution
+    for index, room_type in enumerate(("Amphi", "Salle_TD")):
+        demand = sum(rooms.demand[m][index] for m in exams)
+        supply = rooms.capacity[index] * total_slots
+        status = _status(demand, supply)
+        detail = (f"{math.ceil(demand / total_slots)} per slot preferred, "
+                  f"{rooms.capacity[index]} per slot")
+        if status == INFEASIBLE:
+            status = BINDING
+            detail += "; the excess is seated in the other room type"
+        findings.append(_finding(f"{room_type} preferes", status, demand, supply, detail))
+
+    # Proctors: at most one proctor's share of a room per session
+    seats_per_proctor = max(
+        (cap / proctors_for_room(rtype) for _, cap, rtype in problem.locations), default=1
+    )
+    module_sessions = {
+        m: math.ceil(h / seats_per_proctor)
+        for m, h in zip(exams, headcount.tolist())
+    }
+    sessions = sum(module_sessions.values())
+    session_supply = len(problem.prof_ids) * num_days * MAX_SESSIONS_PER_DAY
+    bounds["surveillances"] = sessions
+    findings.append(_finding(
+        "Surveillances", _status(sessions, session_supply), sessions, session_supply,
+        f"{len(problem.prof_ids)} professors x {num_days} days x {MAX_SESSIONS_PER_DAY}; "
+        f"{math.ceil(sessions / max(len(problem.prof_ids), 1))} sessions per professor at least",
+    ))
+
+    # Departments: demand beyond the department's own professors goes to others
+    dept_demand = defaultdict(int)
+    for module_id, count in module_sessions.items():
+        dept_demand[problem.modules[module_id]["dept_id"]] += count
+    dept_profs = defaultdict(int)
+    for prof in problem.professors.values():
+        dept_profs[prof["dept_id"]] += 1
+    per_prof = min(math.ceil(sessions / max(len(problem.prof_ids), 1)),
+                   num_days * MAX_SESSIONS_PER_DAY)
+    cross = 0
+    short = []
+    for dept_id, demand in sorted(dept_demand.items()):
+        supply = dept_profs[dept_id] * per_prof  # equal sessions for every professor
+        if demand > supply:
+            cross += demand - supply
+            short.append(f"department {dept_id} ({demand} > {supply})")
+    bounds["surveillances_hors_departement"] = cross
+    findings.append(_finding(
+        "Surveillants par departement", BINDING if short else OK, sum(dept_demand.values()),
+        sum(dept_profs[d] * per_prof for d in dept_demand),
+        f"departments short of their own professors: {', '.join(short)}; "
+        f"about {cross} sessions by other departments" if short
+        else "every department covers its exams with its own professors",
+    ))
+    return {"bornes": bounds, "constats": findings}
+
+
+def infeasible(report):
+    """The findings where a hard constraint cannot hold."""
+    return [f for f in report["constats"] if f["statut"] == INFEASIBLE]
+
+
+def format_report(report):
+    lines = [f"{'Contrainte':<30} {'Statut':<11} {'Demande':>9} {'Offre':>9}"]
+    for f in report["constats"]:
+        lines.append(f"{f['contrainte']:<30} {f['statut']:<11} {f['demande']:>9} {f['offre']:>9}")
+        if f["statut"] != OK:
+            lines.append(f"    {f['detail']}")
+    return "\n".join(lines)
+
+
+def gap_report(bounds, achieved):
+    """{bound: (lower bound, achieved, gap)} for the bounds the run reports."""
+    return {
+        name: (bound, achieved[name], achieved[name] - bound)
+        for name, bound in bounds.items() if name in achieved
+    }
+
+
+def format_gaps(gaps):
+    lines = [f"{'Borne':<30} {'Minimum':>9} {'Obtenu':>9} {'Ecart':>7}"]
+    for name, (bound, value, gap) in gaps.items():
+        lines.append(f"{name:<30} {bound:>9} {value:>9} {gap:>7}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from scripts.helpers import create_connection
+    from scripts.loader import load_model
+    from scripts.optimize import SLOTS_PER_DAY, get_exam_days
+    from scripts.solver import Problem
+
+    conn = create_connection()
+    problem = Problem(load_model(conn))
+    conn.close()
+
+    start = time.time()
+    report = check_feasibility(problem, len(get_exam_days()), SLOTS_PER_DAY)
+    elapsed = time.time() - start
+    print(format_report(report))
+    print(f"Lower bounds: {report['bornes']}")
+    print(f"Checked in {elapsed * 1000:.1f} ms")
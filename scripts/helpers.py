@@ -4,10 +4,12 @@ from dotenv import load_dotenv
 
 import mysql.connector
 
+from scripts import tracing
+
 load_dotenv()
 
 
-def create_connection():
+def create_connection(**options):
     try:
         conn = mysql.connector.connect(
             host=os.getenv("DB_HOST"),
@@ -15,8 +17,10 @@ def create_connection():
             user=os.getenv("DB_USER"),
             password=os.getenv("DB_PASS"),
             database=os.getenv("DB_NAME"),
+            **options,
         )
-        return conn
+        # Traced only while a trace is active in this thread (scripts.tracing)
+        return tracing.wrap(conn)
     except mysql.connector.Error as e:
         print(f"Error connecting to MariaDB Platform: {e}")
         sys.exit(1)
@@ -0,0 +1,359 @@
+"""
+iCalendar Feeds
+
+One .ics feed per formation, per group and per professor, for students and
+professors to subscribe to instead of copying exam times by hand:
+
+    formations/<formation_id>.ics
+    groupes/<formation_id>-G<groupe>.ics
+    professeurs/<prof_id>.ics
+    etudiants/<student_id>.ics      students with retakes: their group's
+                                    exams and their retakes
+
+Feeds are generated from streamed bulk queries (examens and surveillances,
+joined with lieu_examens) ordered by owner, so only one formation's or
+professor's events are in memory at a time; the feed of a student with
+retakes adds them in the room seat_retakers gives (scripts/students.py). They are built
+once per schedule version into a cache directory, in a detached process
+started after each optimization (start_background_build), and served from
+there:
+
+    <root>/<version>/<feed>.ics
+
+Until a version is cached, get_feed renders only the feed it is asked for.
+
+Usage:
+    python -m scripts.ics                    # build the current version's feeds
+    python -m scripts.ics --version 12       # build version 12's feeds
+    python -m scripts.ics feeds.zip          # ... and write them as a ZIP
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+
+from scripts.export import stream_zip
+from scripts.helpers import create_connection
+from scripts.students import seat_retakers
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), "..")
+CACHE_ROOT = os.getenv("ICS_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache", "ics"))
+KEEP_VERSIONS = 2
+FETCH_SIZE = 5000
+EXAM_DURATION = timedelta(hours=2)  # slots start every 2h30
+
+FORMATION = "formations"
+GROUP = "groupes"
+PROFESSOR = "professeurs"
+STUDENT = "etudiants"
+
+
+def _escape(text):
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line):
+    """Fold a content line at 75 octets (RFC 5545 3.1)."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74  # continuation lines start with a space
+        while cut and (data[cut] & 0xC0) == 0x80:  # do not split a UTF-8 sequence
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    parts.append(data.decode())
+    return "\r\n ".join(parts)
+
+
+def _stamp(dt):
+    return dt.strftime("%Y%m%dT%H%M%S")  # floating local time, like the timetables
+
+
+def _utc_stamp(dt):
+    return dt.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _event(uid, start, summary, location, description, dtstamp):
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:{uid}",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART:{_stamp(start)}",
+        f"DTEND:{_stamp(start + EXAM_DURATION)}",
+        f"SUMMARY:{_escape(summary)}",
+        f"LOCATION:{_escape(location)}",
+        f"DESCRIPTION:{_escape(description)}",
+        "END:VEVENT",
+    ]
+    return "".join(_fold(line) + "\r\n" for line in lines)
+
+
+def calendar(name, events):
+    """Bytes of a VCALENDAR with the given VEVENT blocks."""
+    head = (
+        "BEGIN:VCALENDAR\r\n"
+        "VERSION:2.0\r\n"
+        "PRODID:-//asura-edt//Examens//FR\r\n"
+        "CALSCALE:GREGORIAN\r\n"
+        "METHOD:PUBLISH\r\n"
+        f"{_fold('X-WR-CALNAME:' + _escape(name))}\r\n"
+    )
+    return (head + "".join(events) + "END:VCALENDAR\r\n").encode()
+
+
+def _stream(cur, query, params=()):
+    cur.execute(query, params)
+    while True:
+        rows = cur.fetchmany(FETCH_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def formation_feeds(cur, dtstamp, formation_id=None):
+    """Yield (path, ics bytes) for every formation and every group (or one formation's)."""
+    where, params = ("WHERE ex.formation_id = %s", (formation_id,)) if formation_id else ("", ())
+    rows = _stream(cur, f"""
+        SELECT ex.formation_id, CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre),
+               ex.id, ex.date_heure, ex.groupes, m.nom, l.nom
+        FROM examens ex
+        JOIN modules m ON ex.module_id = m.id
+        JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+        JOIN formations f ON ex.formation_id = f.id
+        JOIN specialites sp ON f.specialite_id = sp.id
+        {where}
+        ORDER BY ex.formation_id, ex.date_heure, ex.id
+    """, params)
+    for formation_id, exams in groupby(rows, key=lambda row: row[0]):
+        events = []
+        group_events = {}
+        name = None
+        for _, name, exam_id, start, groupes, module, salle in exams:
+            groups = [int(g) for g in groupes.split(",")] if groupes else []
+            label = ", ".join(f"G{g}" if g else "Rattrapage" for g in groups)
+            event = _event(f"examen-{exam_id}@asura-edt", start, f"Examen {module}", salle,
+                           f"{name} - {label}", dtstamp)
+            events.append(event)
+            for g in groups:
+                if g:  # group 0: the retakers, in their own feeds
+                    group_events.setdefault(g, []).append(event)
+        yield f"{FORMATION}/{formation_id}.ics", calendar(f"Examens {name}", events)
+        for g, evs in sorted(group_events.items()):
+            yield f"{GROUP}/{formation_id}-G{g}.ics", calendar(f"Examens {name} G{g}", evs)
+
+
+def professor_feeds(cur, dtstamp, prof_id=None):
+    """Yield (path, ics bytes) for every professor with surveillances (or one)."""
+    where, params = ("WHERE s.prof_id = %s", (prof_id,)) if prof_id else ("", ())
+    rows = _stream(cur, f"""
+        SELECT s.prof_id, p.nom, ex.id, ex.date_heure, m.nom, l.nom,
+               CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre)
+        FROM surveillances s
+        JOIN professeurs p ON s.prof_id = p.id
+        JOIN examens ex ON s.examen_id = ex.id
+        JOIN modules m ON ex.module_id = m.id
+        JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+        JOIN formations f ON ex.formation_id = f.id
+        JOIN specialites sp ON f.specialite_id = sp.id
+        {where}
+        ORDER BY s.prof_id, ex.date_heure, ex.id
+    """, params)
+    for prof_id, surveillances in groupby(rows, key=lambda row: row[0]):
+        events = []
+        name = None
+        for _, name, exam_id, start, module, salle, formation in surveillances:
+            events.append(_event(f"surveillance-{exam_id}-{prof_id}@asura-edt", start,
+                                 f"Surveillance {module}", salle, formation, dtstamp))
+        yield f"{PROFESSOR}/{prof_id}.ics", calendar(f"Surveillances {name}", events)
+
+
+def student_feeds(cur, dtstamp, student_id=None):
+    """Yield (path, ics bytes) for every student with retakes (or one)."""
+    seats = seat_retakers(cur)
+    if student_id:
+        seats = {student_id: seats[student_id]} if student_id in seats else {}
+    if not seats:
+        return
+    group_exams = {}  # (formation_id, groupe) -> [(start, exam_id, event)]
+    exams = {}  # exam_id -> (start, module, salle, formation name)
+    rows = _stream(cur, """
+        SELECT ex.formation_id, CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre),
+               ex.id, ex.date_heure, ex.groupes, m.nom, l.nom
+        FROM examens ex
+        JOIN modules m ON ex.module_id = m.id
+        JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+        JOIN formations f ON ex.formation_id = f.id
+        JOIN specialites sp ON f.specialite_id = sp.id
+    """)
+    for formation_id, name, exam_id, start, groupes, module, salle in rows:
+        exams[exam_id] = (start, module, salle, name)
+        for g in (int(g) for g in groupes.split(",")) if groupes else ():
+            if g:
+                event = _event(f"examen-{exam_id}@asura-edt", start, f"Examen {module}", salle,
+                               f"{name} - G{g}", dtstamp)
+                group_exams.setdefault((formation_id, g), []).append((start, exam_id, event))
+
+    where, params = ("WHERE id = %s", (student_id,)) if student_id else ("", ())
+    rows = _stream(cur, f"SELECT id, nom, prenom, formation_id, groupe FROM etudiants {where} ORDER BY id",
+                   params)
+    for student_id, nom, prenom, formation_id, groupe in rows:
+        if student_id not in seats:
+            continue
+        events = list(group_exams.get((formation_id, groupe), []))
+        for exam_id in seats[student_id]:
+            start, module, salle, name = exams[exam_id]
+            events.append((start, exam_id, _event(
+                f"examen-{exam_id}@asura-edt", start, f"Examen {module}", salle,
+                f"{name} - Rattrapage", dtstamp)))
+        events.sort(key=lambda e: e[:2])
+        yield (f"{STUDENT}/{student_id}.ics",
+               calendar(f"Examens {nom} {prenom}", [event for _, _, event in events]))
+
+
+def all_feeds(cur, dtstamp):
+    yield from formation_feeds(cur, dtstamp)
+    yield from professor_feeds(cur, dtstamp)
+    yield from student_feeds(cur, dtstamp)
+
+
+def feed_name(kind, entity_id, groupe=None):
+    """Relative path of a feed, e.g. feed_name(GROUP, 12, 3) -> 'groupes/12-G3.ics'."""
+    if kind == GROUP:
+        return f"{GROUP}/{entity_id}-G{groupe}.ics"
+    return f"{kind}/{entity_id}.ics"
+
+
+def _dtstamp(cur, version_id):
+    cur.execute("SELECT cree_le FROM versions_planning WHERE id = %s", (version_id,))
+    row = cur.fetchone()
+    # DTSTAMP is the publication time, so a version's feeds are reproducible
+    return _utc_stamp(row[0] if row else datetime.now())
+
+
+def build_feeds(cur, version_id, root=CACHE_ROOT):
+    """Write every feed of a version into the cache (once). Return its directory,
+    or None if a newer version replaced it in the database."""
+    version_dir = os.path.join(root, str(version_id))
+    if os.path.isdir(version_dir):
+        return version_dir
+
+    start = time.time()
+    # The database only holds the latest schedule (a background build may run late)
+    cur.execute("SELECT MAX(id) FROM versions_planning")
+    current = cur.fetchone()[0]
+    if current != version_id:
+        print(f"Version {version_id} is no longer current ({current}): no feeds built")
+        return None
+    dtstamp = _dtstamp(cur, version_id)
+
+    # Build beside the final directory, then rename: readers never see half a version
+    tmp_dir = f"{version_dir}.{os.getpid()}.tmp"
+    count = 0
+    for path, data in all_feeds(cur, dtstamp):
+        full = os.path.join(tmp_dir, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write(data)
+        count += 1
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        os.rename(tmp_dir, version_dir)
+    except OSError:  # built concurrently by another process
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _evict(root)
+    print(f"Built {count} feeds for version {version_id} in {time.time() - start:.2f}s")
+    return version_dir
+
+
+def _evict(root, keep_versions=KEEP_VERSIONS):
+    versions = sorted((int(v) for v in os.listdir(root) if v.isdigit()), reverse=True)
+    for version in versions[keep_versions:]:
+        shutil.rmtree(os.path.join(root, str(version)), ignore_errors=True)
+
+
+def start_background_build(version_id):
+    """Build a version's feeds in a detached process."""
+    return subprocess.Popen(
+        [sys.executable, "-m", "scripts.ics", "--version", str(version_id)],
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def render_feed(cur, version_id, kind, entity_id, groupe=None):
+    """Bytes of one feed rendered from the database (None if it has no events)."""
+    dtstamp = _dtstamp(cur, version_id)
+    if kind in (FORMATION, GROUP):
+        feeds = formation_feeds(cur, dtstamp, entity_id)
+    elif kind == PROFESSOR:
+        feeds = professor_feeds(cur, dtstamp, entity_id)
+    else:
+        feeds = student_feeds(cur, dtstamp, entity_id)
+    name = feed_name(kind, entity_id, groupe)
+    return next((data for path, data in feeds if path == name), None)
+
+
+def get_feed(cur, version_id, kind, entity_id, groupe=None, root=CACHE_ROOT):
+    """Bytes of one feed of a version (None if it has no events).
+
+    Read from the cache; while the version is still being built in the
+    background, only this feed is rendered.
+    """
+    if version_id is None:
+        return None
+    version_dir = os.path.join(root, str(version_id))
+    if not os.path.isdir(version_dir):
+        return render_feed(cur, version_id, kind, entity_id, groupe)
+    try:
+        with open(os.path.join(version_dir, feed_name(kind, entity_id, groupe)), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def cached_entries(version_dir):
+    """Yield (path, bytes) for the feeds of a cached version, one at a time."""
+    for kind in (FORMATION, GROUP, PROFESSOR, STUDENT):
+        kind_dir = os.path.join(version_dir, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for name in sorted(os.listdir(kind_dir)):
+            with open(os.path.join(kind_dir, name), "rb") as f:
+                yield f"{kind}/{name}", f.read()
+
+
+def export_feeds_zip(cur, out, root=CACHE_ROOT):
+    """Write the ZIP of all feeds of the current version to a binary file object."""
+    cur.execute("SELECT MAX(id) FROM versions_planning")
+    version_id = cur.fetchone()[0]
+    size = 0
+    for chunk in stream_zip(cached_entries(build_feeds(cur, version_id, root))):
+        out.write(chunk)
+        size += len(chunk)
+    return size
+
+
+if __name__ == "__main__":
+    conn = create_connection()
+    cur = conn.cursor()
+    if len(sys.argv) > 2 and sys.argv[1] == "--version":
+        print(build_feeds(cur, int(sys.argv[2])))
+    elif len(sys.argv) > 1:
+        with open(sys.argv[1], "wb") as f:
+            size = export_feeds_zip(cur, f)
+        print(f"Wrote {sys.argv[1]} ({size / 1e6:.1f} MB)")
+    else:
+        cur.execute("SELECT MAX(id) FROM versions_planning")
+        print(build_feeds(cur, cur.fetchone()[0]))
+    conn.close()
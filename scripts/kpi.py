@@ -0,0 +1,138 @@
+"""
+Dashboard KPI Snapshot
+
+The Dashboard's indicators (counts, professor load, room usage, per
+department statistics) are computed by the optimizer in one pass over its
+in-memory model and assignment, and stored as one JSON document per
+schedule version in kpi_planning. The Dashboard renders from a single read.
+"""
+
+import json
+from collections import Counter
+
+import numpy as np
+
+from scripts.loader import ROOM_TYPES
+
+# Shared with the query benchmark (scripts/benchmark.py)
+LATEST_KPIS_SQL = "SELECT version_id, donnees FROM kpi_planning ORDER BY version_id DESC LIMIT 1"
+
+
+def compute_kpis(model, dept_names, exam_days, slots_per_day,
+                 module_day, module_rooms, exam_proctors, module_slot=None,
+                 module_retakers=None):
+    """Return the KPI snapshot of a schedule as a JSON-serializable dict.
+
+    module_rooms: {module_id: [(room_id, room_type, formation_id, "1,2")]}
+    exam_proctors: {module_id: [prof_id, ...]}
+    module_slot (optional): a room shared by several modules in one slot
+    (synchronized common modules) counts once in the room usage and seats
+    module_retakers (optional): {module_id: students retaking it}, seated as
+    group 0 of the module's formation
+    """
+    formation_dept = dict(zip(model.module_formation.tolist(), model.module_dept.tolist()))
+    room_capacity = dict(zip(model.room_ids.tolist(), model.room_capacity.tolist()))
+    prof_dept = dict(zip(model.prof_ids.tolist(), model.prof_dept.tolist()))
+    group_sizes = model.formation_group_sizes()
+
+    # Students per formation, then per department
+    formations, headcounts = np.unique(model.student_formation, return_counts=True)
+    dept_students = Counter()
+    for formation_id, count in zip(formations.tolist(), headcounts.tolist()):
+        if formation_id in formation_dept:
+            dept_students[formation_dept[formation_id]] += count
+
+    dept_modules = Counter(model.module_dept.tolist())
+    dept_exams = Counter()
+    prof_sessions = Counter()
+    days_used = set()
+    day_exams = Counter()
+    type_uses = Counter()
+    seats_used = seats_total = 0
+    seats_left = {}  # (room_id, day, slot) -> seats not taken yet
+
+    for module_id, rooms in module_rooms.items():
+        if not rooms:
+            continue
+        day = module_day[module_id]
+        days_used.add(day)
+        day_exams[day] += len(rooms)
+        dept_exams[formation_dept.get(rooms[0][2])] += len(rooms)
+        # Proctors are written only for modules that got a room
+        prof_sessions.update(exam_proctors.get(module_id, []))
+
+        # Seats: a group split over several rooms fills them in order
+        remaining = dict(group_sizes.get(rooms[0][2], {}))
+        if module_retakers and module_id in module_retakers:
+            remaining[0] = module_retakers[module_id]
+        slot = module_slot[module_id] if module_slot else module_id
+        for room_id, room_type, formation_id, group_str in rooms:
+            if (room_id, day, slot) not in seats_left:
+                seats_left[(room_id, day, slot)] = room_capacity[room_id]
+                type_uses[room_type] += 1
+                seats_total += room_capacity[room_id]
+            # A shared room's members take the seats the previous ones left
+            groups = [int(g) for g in group_str.split(",")]
+            used = min(seats_left[(room_id, day, slot)], sum(remaining.get(g, 0) for g in groups))
+            seats_left[(room_id, day, slot)] -= used
+            left = used
+            for g in groups:
+                take = min(left, remaining.get(g, 0))
+                remaining[g] = remaining.get(g, 0) - take
+                left -= take
+            seats_used += used
+
+    room_uses = sum(type_uses.values())
+    total_slots = max(len(days_used), 1) * slots_per_day * len(room_capacity)
+    sessions = list(prof_sessions.values())
+    room_types = Counter(ROOM_TYPES[t] for t in model.room_type.tolist())
+
+    dept_profs = Counter(prof_dept.values())
+    dept_sessions = Counter()
+    for prof_id, count in prof_sessions.items():
+        dept_sessions[prof_dept[prof_id]] += count
+
+    return {
+        "etudiants": int(len(model.student_ids)),
+        "formations": len(set(formation_dept) | set(formations.tolist())),
+        "modules_planifies": sum(1 for rooms in module_rooms.values() if rooms),
+        "surveillances": sum(sessions),
+        "jours_examen": len(days_used),
+        "sessions": {
+            "min": min(sessions) if sessions else 0,
+            "moy": sum(sessions) / len(sessions) if sessions else 0,
+            "max": max(sessions) if sessions else 0,
+            "distribution": sorted(Counter(sessions).items()),
+        },
+        "professeurs_par_dept": sorted(
+            ([dept_names[d], dept_profs[d], dept_sessions[d]] for d in dept_names),
+            key=lambda row: row[2], reverse=True,
+        ),
+        "salles": {
+            "taux_occupation": room_uses / total_slots * 100 if total_slots else 0,
+            "taux_remplissage": seats_used / seats_total * 100 if seats_total else 0,
+            "par_type": [[t, room_types[t], type_uses[t]] for t in sorted(room_types)],
+            "par_jour": [[exam_days[d].strftime("%d/%m"), day_exams[d]] for d in sorted(day_exams)],
+        },
+        "departements": sorted(
+            ([dept_names[d], dept_students[d], dept_modules[d], dept_exams[d], dept_profs[d]]
+             for d in dept_names),
+            key=lambda row: row[1], reverse=True,
+        ),
+    }
+
+
+def store_kpis(cur, version_id, kpis):
+    cur.execute(
+        "INSERT INTO kpi_planning (version_id, donnees) VALUES (%s, %s)",
+        (version_id, json.dumps(kpis)),
+    )
+
+
+def load_kpis(cur):
+    """Return (version_id, kpis) of the latest schedule version, or (None, None)."""
+    cur.execute(LATEST_KPIS_SQL)
+    row = cur.fetchone()
+    if row is None:
+        return None, None
+    return row[0], json.loads(row[1])
@@ -0,0 +1,182 @@
+"""
+Streaming Data Loader
+
+Loads everything the optimizer needs into typed NumPy arrays. Rows are read
+with an unbuffered cursor in fetchmany() batches and copied straight into the
+arrays, so peak memory is the arrays themselves plus one batch of tuples,
+whatever the number of students (1M students ~ 9 MB).
+
+Usage:
+    python -m scripts.loader   # load the current database and report timings
+"""
+
+import time
+import numpy as np
+from scripts.hardcoded import common_modules
+from scripts.helpers import create_connection
+
+BATCH_SIZE = 50_000
+
+# lieu_examens.type -> room_type code
+ROOM_TYPES = ("Salle_TD", "Amphi")
+SALLE_TD, AMPHI = 0, 1
+
+# formations.cycle -> cycle code
+CYCLES = ("Licence", "Master")
+
+
+class ScheduleModel:
+    """Column arrays of the scheduling problem (one entry per row)."""
+
+    __slots__ = (
+        "module_ids", "module_formation", "module_dept", "module_common", "module_cycle",
+        "student_ids", "student_formation", "student_group",
+        "prof_ids", "prof_dept",
+        "room_ids", "room_capacity", "room_type",
+        "enroll_student", "enroll_module",
+    )
+
+    def __init__(self, **arrays):
+        for name in self.__slots__:
+            setattr(self, name, arrays[name])
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    def formation_group_sizes(self):
+        """Return {formation_id: {groupe: student count}}."""
+        # Pack (formation, group) into one int64 key and count with np.unique
+        keys = self.student_formation.astype(np.int64) << 8 | self.student_group
+        uniq, counts = np.unique(keys, return_counts=True)
+        sizes = {}
+        for key, count in zip(uniq.tolist(), counts.tolist()):
+            sizes.setdefault(key >> 8, {})[key & 0xFF] = count
+        return sizes
+
+    def formation_headcounts(self):
+        """Return {formation_id: student count}."""
+        uniq, counts = np.unique(self.student_formation, return_counts=True)
+        return dict(zip(uniq.tolist(), counts.tolist()))
+
+
+def stream_columns(conn, query, dtypes, count_query=None, params=None):
+    """Stream a query into one NumPy array per column.
+
+    count_query (optional) pre-sizes the arrays; they grow if more rows arrive.
+    """
+    capacity = BATCH_SIZE
+    if count_query:
+        cur = conn.cursor()
+        cur.execute(count_query)
+        capacity = max(cur.fetchone()[0], 1)
+        cur.close()
+
+    columns = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+    size = 0
+
+    cur = conn.cursor(buffered=False)
+    cur.execute(query, params)
+    while True:
+        rows = cur.fetchmany(BATCH_SIZE)
+        if not rows:
+            break
+        n = len(rows)
+        if size + n > capacity:
+            capacity = max(capacity * 2, size + n)
+            columns = [np.resize(col, capacity) for col in columns]
+        for col, values in zip(columns, zip(*rows)):
+            col[size:size + n] = values
+        size += n
+    cur.close()
+
+    return [col[:size] for col in columns]
+
+
+def load_model(conn):
+    """Load modules, students, professors, rooms and retakes into a ScheduleModel."""
+    # module_common: index in hardcoded.common_modules (-1: not a common module)
+    names = ", ".join(["%s"] * len(common_modules))
+    module_ids, module_formation, module_dept, module_common, module_cycle = stream_columns(
+        conn,
+        f"""
+        SELECT m.id, m.formation_id, s.dept_id,
+               FIELD(m.nom, {names}) - 1, f.cycle = 'Master'
+        FROM modules m
+        JOIN formations f ON m.formation_id = f.id
+        JOIN specialites s ON f.specialite_id = s.id
+        ORDER BY m.id
+        """,
+        (np.int32, np.int32, np.int32, np.int8, np.uint8),
+        count_query="SELECT COUNT(*) FROM modules",
+        params=tuple(common_modules),
+    )
+
+    student_ids, student_formation, student_group = stream_columns(
+        conn,
+        "SELECT id, formation_id, groupe FROM etudiants",
+        (np.int32, np.int32, np.uint8),
+        count_query="SELECT COUNT(*) FROM etudiants",
+    )
+
+    prof_ids, prof_dept = stream_columns(
+        conn,
+        "SELECT id, dept_id FROM professeurs ORDER BY id",
+        (np.int32, np.int32),
+        count_query="SELECT COUNT(*) FROM professeurs",
+    )
+
+    # Optional retakes (scripts/enrollment.py); empty for formation-based enrollment
+    enroll_student, enroll_module = stream_columns(
+        conn,
+        "SELECT etudiant_id, module_id FROM inscriptions",
+        (np.int32, np.int32),
+        count_query="SELECT COUNT(*) FROM inscriptions",
+    )
+
+    # Few rooms: map the ENUM to codes in Python, largest rooms first
+    cur = conn.cursor()
+    cur.execute("SELECT id, capacite, type FROM lieu_examens ORDER BY capacite DESC")
+    rooms = cur.fetchall()
+    cur.close()
+    room_ids = np.array([r[0] for r in rooms], dtype=np.int32)
+    room_capacity = np.array([r[1] for r in rooms], dtype=np.int32)
+    room_type = np.array([ROOM_TYPES.index(r[2]) for r in rooms], dtype=np.uint8)
+
+    return ScheduleModel(
+        module_ids=module_ids,
+        module_formation=module_formation,
+        module_dept=module_dept,
+        module_common=module_common,
+        module_cycle=module_cycle,
+        student_ids=student_ids,
+        student_formation=student_formation,
+        student_group=student_group,
+        prof_ids=prof_ids,
+        prof_dept=prof_dept,
+        room_ids=room_ids,
+        room_capacity=room_capacity,
+        room_type=room_type,
+        enroll_student=enroll_student,
+        enroll_module=enroll_module,
+    )
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    conn = create_connection()
+    tracemalloc.start()
+    start = time.time()
+    model = load_model(conn)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    conn.close()
+
+    print(
+        f"Loaded {len(model.module_ids)} modules, {len(model.student_ids)} students, "
+        f"{len(model.prof_ids)} professors, {len(model.room_ids)} rooms"
+    )
+    print(f"Load time: {elapsed:.2f}s")
+    print(f"Model size: {model.nbytes / 1e6:.1f} MB, peak allocations: {peak / 1e6:.1f} MB")
@@ -0,0 +1,209 @@
+"""
+Soft Objectives
+
+Hard constraints (1 exam per student per day, 3 sessions per professor per
+day, room capacity) decide feasibility; among feasible schedules the soft
+objectives below rank them. The Scorer keeps their running totals per
+formation, department and professor, so placing, moving or swapping a
+module is scored in O(1) and a proctor in O(1), without re-scoring the
+whole schedule:
+
+- espacement: students with exams on consecutive exam days (no rest day in
+  between), per pair of adjacent exams: a formation's students for two of
+  its modules, the retakers they share for modules of two formations
+- regroupement: spread of each department's exam days (sum of squared
+  distances to the department's mean day), so departments stay clustered
+- compacite: days on which each professor proctors at least once
+
+Phase 2 (day coloring) breaks load ties with the scorer, improve_days
+swaps modules between days while the score drops, and Phase 4 prefers,
+among equally loaded professors, those already proctoring in another slot
+of that day.
+"""
+
+import time
+from collections import defaultdict
+
+from scripts.solver import SlotRooms, is_formation_based
+
+# Weight of each objective in the total score
+WEIGHTS = {"espacement": 1.0, "regroupement": 0.1, "compacite": 1.0}
+# Time budget of the local improvement pass
+IMPROVE_TIME_S = 2.0
+
+
+class Scorer:
+    """Weighted soft score of a partial schedule, updated move by move."""
+
+    def __init__(self, problem, weights=None):
+        self.weights = dict(WEIGHTS, **(weights or {}))
+        self.formation = {m: data["formation_id"] for m, data in problem.modules.items()}
+        self.headcount = {
+            m: problem.formation_headcount.get(f, 0) for m, f in self.formation.items()
+        }
+        # Retakers: students shared by modules of different formations,
+        # module_id -> {other module_id: students}
+        self.shared = defaultdict(dict)
+        if problem.retakes:
+            for a, b, students in zip(*(c.tolist() for c in problem.retakes.conflict_pairs())):
+                if self.formation[a] != self.formation[b]:
+                    self.shared[a][b] = self.shared[b][a] = students
+        self.dept = {m: data["dept_id"] for m, data in problem.modules.items()}
+
+        self.day = {}  # placed modules: module_id -> day
+        self.formation_days = defaultdict(lambda: defaultdict(int))  # formation -> day -> exams
+        self.dept_stats = defaultdict(lambda: [0, 0, 0])  # dept -> [exams, sum days, sum days²]
+        self.prof_days = defaultdict(lambda: defaultdict(int))  # prof -> day -> sessions
+        self.terms = {name: 0.0 for name in WEIGHTS}
+
+    @staticmethod
+    def _spread(n, s, q):
+        return q - s * s / n if n else 0.0
+
+    def _change(self, module_id, day, sign):
+        """Add (sign=1) or remove (sign=-1) a module on a day; return the weighted change."""
+        days = self.formation_days[self.formation[module_id]]
+        if sign < 0:
+            days[day] -= 1
+        # Adjacent exams sharing students (a formation, or retakers across
+        # formations) each cost those students a rest day. A pair is counted
+        # once, by whichever of its two modules comes second, so moves cancel
+        spacing = self.headcount[module_id] * (days.get(day - 1, 0) + days.get(day + 1, 0))
+        for other, students in self.shared[module_id].items():
+            if abs(self.day.get(other, day) - day) == 1:
+                spacing += students
+        spacing *= sign
+        if sign > 0:
+            days[day] += 1
+
+        stats = self.dept_stats[self.dept[module_id]]
+        before = self._spread(*stats)
+        stats[0] += sign
+        stats[1] += sign * day
+        stats[2] += sign * day * day
+        clustering = self._spread(*stats) - before
+
+        self.terms["espacement"] += spacing
+        self.terms["regroupement"] += clustering
+        return self.weights["espacement"] * spacing + self.weights["regroupement"] * clustering
+
+    def place(self, module_id, day):
+        self.day[module_id] = day
+        return self._change(module_id, day, 1)
+
+    def remove(self, module_id):
+        return self._change(module_id, self.day.pop(module_id), -1)
+
+    def cost(self, module_id, day):
+        """Score change of placing an unplaced module on a day."""
+        change = self.place(module_id, day)
+        self.remove(module_id)
+        return change
+
+    def move(self, module_id, day):
+        """Move a placed module to another day; return the score change."""
+        return self.remove(module_id) + self.place(module_id, day)
+
+    def swap_delta(self, a, b):
+        """Score change of exchanging the days of two placed modules."""
+        day_a, day_b = self.day[a], self.day[b]
+        change = self.move(a, day_b) + self.move(b, day_a)
+        self.move(a, day_a)
+        self.move(b, day_b)
+        return change
+
+    def proctor_cost(self, prof_id, day):
+        """1 if this session opens a new proctoring day for the professor, else 0."""
+        return 0 if self.prof_days[prof_id].get(day) else 1
+
+    def add_proctor(self, prof_id, day):
+        self.terms["compacite"] += self.proctor_cost(prof_id, day)
+        self.prof_days[prof_id][day] += 1
+
+    def total(self):
+        return sum(self.weights[name] * value for name, value in self.terms.items())
+
+    def breakdown(self):
+        """{objective: unweighted total} and the weighted "total"."""
+        return {**{name: round(value, 1) for name, value in self.terms.items()},
+                "total": round(self.total(), 1)}
+
+
+def improve_days(problem, module_day, module_slot, scorer, conflicts=None, rooms=None,
+                 time_limit=IMPROVE_TIME_S, max_passes=3):
+    """Local improvement: swap the (day, slot) of two modules while the score drops.
+
+    Only modules seated in their preferred rooms with the same room demand
+    (SlotRooms) are swapped, so every slot keeps its exam count and rooms
+    left, and a swap must keep both modules
+    free of student conflicts (formation days, or the conflict graph when
+    there are retakes or sittings). Synchronized modules (Problem.sittings)
+    stay in their sitting's slot. Updates module_day, module_slot and the
+    scorer in place. Return the number of swaps made.
+    """
+    formation_based = is_formation_based(problem)
+
+    def free(module_id, day, other):
+        if formation_based:
+            return not scorer.formation_days[scorer.formation[module_id]].get(day)
+        return all(module_day[m] != day for m in conflicts[module_id] if m != other)
+
+    # Swap candidates: same room demand, indexed by day. A module seated by
+    # substitution (SlotRooms level 1) stays put: its rooms depend on its slot
+    rooms = rooms or SlotRooms(problem)
+    signature = rooms.demand
+    by_signature = defaultdict(lambda: defaultdict(list))
+    for module_id in problem.module_ids:
+        if module_id in problem.sittings:
+            continue
+        if rooms.used.get(module_id, signature[module_id]) == signature[module_id]:
+            by_signature[signature[module_id]][module_day[module_id]].append(module_id)
+
+    deadline = time.perf_counter() + time_limit
+    swaps = 0
+    for _ in range(max_passes):
+        improved = 0
+        for a in problem.module_ids:
+            if time.perf_counter() > deadline:
+                return swaps
+            day_a = module_day[a]
+            if a not in by_signature[signature[a]][day_a]:
+                continue
+            best, best_delta = None, -1e-9
+            for day_b, candidates in by_signature[signature[a]].items():
+                if day_b == day_a or not free(a, day_b, None):
+                    continue
+                for b in candidates:
+                    if scorer.formation[b] == scorer.formation[a] or not free(b, day_a, a):
+                        continue
+                    delta = scorer.swap_delta(a, b)
+                    if delta < best_delta:
+                        best, best_delta = b, delta
+            if best is None:
+                continue
+            b, day_b = best, module_day[best]
+            scorer.move(a, day_b)
+            scorer.move(b, day_a)
+            module_day[a], module_day[b] = day_b, day_a
+            module_slot[a], module_slot[b] = module_slot[b], module_slot[a]
+            days = by_signature[signature[a]]
+            days[day_a].remove(a)
+            days[day_b].remove(b)
+            days[day_b].append(a)
+            days[day_a].append(b)
+            swaps += 1
+            improved += 1
+        if not improved:
+            break
+    return swaps
+
+
+def score_schedule(problem, module_day, exam_proctors=None, weights=None):
+    """Scorer of a finished schedule (e.g. merged from department subproblems)."""
+    scorer = Scorer(problem, weights)
+    for module_id in problem.module_ids:
+        scorer.place(module_id, module_day[module_id])
+    for module_id, proctors in (exam_proctors or {}).items():
+        for prof_id in proctors:
+            scorer.add_proctor(prof_id, module_day[module_id])
+    return scorer
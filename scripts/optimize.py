@@ -11,16 +11,35 @@ Constraints:
 - 4 slots per day = 48 total slots
 """
 
+import argparse
+import os
 import time
 from datetime import datetime, timedelta
-from collections import defaultdict
 from scripts.helpers import create_connection
+from scripts.loader import load_model
+from scripts.pdf_cache import start_background_prerender
+from scripts.ics import start_background_build
+from scripts.analytics import refresh_conflict_facts, refresh_occupancy_cube
+from scripts.kpi import compute_kpis, store_kpis
+from scripts.runs import PeakMemory, PhaseTimer, store_run
+from scripts.solver import (
+    SYNC_SCOPES, Problem, SlotRooms, assign_proctors, assign_rooms, assign_slots,
+    assign_slots_by_formation, build_conflicts, common_sittings, count_student_violations,
+    is_formation_based, sessions_needed, sitting_graph, unseated_students,
+)
+from scripts.decompose import MODE as DEPARTMENT_MODE, solve_by_department
+from scripts.feasibility import (
+    check_feasibility, format_gaps, format_report, gap_report, infeasible,
+)
+from scripts.objectives import Scorer, improve_days, score_schedule
+from scripts import tracing
 
 # Schedule configuration
 NUM_CALENDAR_DAYS = 21  # 3 weeks
 SLOTS_PER_DAY = 4
 SLOT_TIMES = ["08:00:00", "10:30:00", "13:00:00", "15:30:00"]
 BASE_DATE = datetime(2026, 1, 12)  # Monday
+SOLVER_MODE = "glouton"  # recorded in the run history
 
 
 def get_exam_days():
@@ -35,348 +54,189 @@ def get_exam_days():
     return days  # 18 exam days in 21 calendar days (3 Fridays excluded)
 
 
-def optimize_schedule():
+def optimize_schedule(mode=SOLVER_MODE, workers=None, force=False, sync=None):
+    """Generate, write and verify a schedule; return its metrics.
+
+    A hard constraint that cannot hold on the loaded data (scripts/feasibility.py)
+    stops the run before any phase with a ValueError explaining it, unless
+    force is set (the best schedule possible is then written anyway).
+    sync (optional, one of SYNC_SCOPES) examines the common modules of a
+    department or cycle together, in shared rooms (common_sittings).
+    """
     start_time = time.time()
+    timer = PhaseTimer()
+    memory = PeakMemory()
+
+    # SQL_TRACE=1 reports this run's queries (a traced page keeps its own trace)
+    own_trace = None
+    if os.getenv("SQL_TRACE") and tracing.current() is None:
+        own_trace = tracing.start("optimize")
+    tracing.phase("Loading")
 
     conn = create_connection()
     cur = conn.cursor()
 
     print("Loading data from database...")
 
-    # Load all modules with their department info
-    cur.execute("""
-        SELECT m.id, m.formation_id, d.id as dept_id
-        FROM modules m
-        JOIN formations f ON m.formation_id = f.id
-        JOIN specialites s ON f.specialite_id = s.id
-        JOIN departements d ON s.dept_id = d.id
-    """)
-    modules = {
-        row[0]: {"formation_id": row[1], "dept_id": row[2]} for row in cur.fetchall()
-    }
-    module_ids = list(modules.keys())
-
-    # Build student-module relationships from formations
-    # Students take all modules of their formation
-    cur.execute("SELECT id, formation_id FROM modules")
-    modules_by_formation = defaultdict(list)
-    for mod_id, form_id in cur.fetchall():
-        modules_by_formation[form_id].append(mod_id)
-
-    cur.execute("SELECT id, formation_id FROM etudiants")
-    module_students = defaultdict(set)
-    student_modules = defaultdict(set)
-    for student_id, formation_id in cur.fetchall():
-        for module_id in modules_by_formation[formation_id]:
-            module_students[module_id].add(student_id)
-            student_modules[student_id].add(module_id)
-
-    # Load student groups (student_id -> (formation_id, groupe))
-    cur.execute("SELECT id, formation_id, groupe FROM etudiants")
-    student_info = {row[0]: {"formation_id": row[1], "groupe": row[2]} for row in cur.fetchall()}
-
-    # Load professors with their departments
-    cur.execute("SELECT id, dept_id FROM professeurs")
-    professors = {row[0]: {"dept_id": row[1]} for row in cur.fetchall()}
-    prof_ids = list(professors.keys())
-
-    # Load exam locations
-    cur.execute("SELECT id, capacite, type FROM lieu_examens ORDER BY capacite DESC")
-    locations = [(row[0], row[1], row[2]) for row in cur.fetchall()]
+    cur.execute("SELECT id, nom FROM departements")
+    dept_names = dict(cur.fetchall())
+
+    # Stream every table into typed NumPy arrays (bounded memory)
+    model = load_model(conn)
+
+    problem = Problem(model)
+    modules = problem.modules
+    module_ids = problem.module_ids
+    num_students = len(model.student_ids)
+    professors = problem.professors
+    prof_ids = problem.prof_ids
+    locations = problem.locations
 
     exam_days = get_exam_days()
     NUM_DAYS = len(exam_days)
     TOTAL_SLOTS = NUM_DAYS * SLOTS_PER_DAY
 
     print(
-        f"Loaded {len(modules)} modules, {len(student_modules)} students, "
+        f"Loaded {len(modules)} modules, {num_students} students, "
         f"{len(professors)} professors, {len(locations)} rooms"
     )
+    if problem.retakes:
+        print(
+            f"Retakes: {len(problem.retakes)} inscriptions by "
+            f"{len(problem.retakes.students)} students"
+        )
     print(f"Exam period: {NUM_DAYS} days, {
           SLOTS_PER_DAY} slots/day = {TOTAL_SLOTS} total slots")
-
-    # ========== PHASE 1: Build conflict graph ==========
-    print("\nBuilding conflict graph...")
-
-    # Two modules conflict if they share at least one student
-    # For day-level conflicts (students can't have 2 exams same day)
-    conflicts = defaultdict(set)
-    for student_id, mods in student_modules.items():
-        mods_list = list(mods)
-        for i in range(len(mods_list)):
-            for j in range(i + 1, len(mods_list)):
-                conflicts[mods_list[i]].add(mods_list[j])
-                conflicts[mods_list[j]].add(mods_list[i])
-
-    # ========== PHASE 2: Slot assignment using constraint propagation ==========
-    print("Assigning exams to slots...")
-
-    # First, calculate minimum days needed (chromatic number estimate)
-    sorted_modules = sorted(module_ids, key=lambda m: len(conflicts[m]), reverse=True)
-    temp_colors = {}
-    for module_id in sorted_modules:
-        used = {temp_colors[m] for m in conflicts[module_id] if m in temp_colors}
-        c = 0
-        while c in used:
-            c += 1
-        temp_colors[module_id] = c
-    num_colors_needed = max(temp_colors.values()) + 1 if temp_colors else 0
-    print(f"Chromatic number: {
-          num_colors_needed} days needed for zero conflicts")
-
-    # We need to assign modules to (day, slot) pairs
-    # Constraint: modules sharing students must be on DIFFERENT DAYS
-    # This is graph coloring where colors = days (not slots)
-
-    module_day = {}  # module_id -> day index (0 to NUM_DAYS-1)
-    module_slot = {}  # module_id -> slot index (0 to SLOTS_PER_DAY-1)
-
-    # Track slots used per day for load balancing
-    day_slot_counts = defaultdict(lambda: defaultdict(int))
-
-    for module_id in sorted_modules:
-        # Find days that don't conflict with already-assigned modules
-        used_days = {module_day[m] for m in conflicts[module_id] if m in module_day}
-
-        # Try to find a valid day (prefer days with fewer exams for balance)
-        best_day = None
-        best_slot = None
-        min_load = float("inf")
-
-        for day in range(NUM_DAYS):
-            if day in used_days:
-                continue
-            # Find the least loaded slot on this day
-            for slot in range(SLOTS_PER_DAY):
-                load = day_slot_counts[day][slot]
-                if load < min_load:
-                    min_load = load
-                    best_day = day
-                    best_slot = slot
-
-        if best_day is None:
-            # No conflict-free day available - find day with minimum conflict
-            # This means some students will have >1 exam per day (constraint violation)
-            conflict_counts = defaultdict(int)
-            for day in range(NUM_DAYS):
-                for m in conflicts[module_id]:
-                    if m in module_day and module_day[m] == day:
-                        conflict_counts[day] += 1
-
-            best_day = min(range(NUM_DAYS), key=lambda d: conflict_counts[d])
-            best_slot = min(
-                range(SLOTS_PER_DAY), key=lambda s: day_slot_counts[best_day][s]
-            )
-
-        module_day[module_id] = best_day
-        module_slot[module_id] = best_slot
-        day_slot_counts[best_day][best_slot] += 1
-
-    # Count violations
-    student_violations = 0
-    for student_id, mods in student_modules.items():
-        day_counts = defaultdict(int)
-        for m in mods:
-            day_counts[module_day[m]] += 1
-        for day, count in day_counts.items():
-            if count > 1:
-                student_violations += count - 1
-
-    print(f"Exams distributed across {NUM_DAYS} days, {TOTAL_SLOTS} slots")
-    if student_violations > 0:
+    if sync:
+        problem.sittings = common_sittings(
+            problem, sync, build_conflicts(problem) if problem.retakes else None
+        )
+        leads = {members[0] for members in problem.sittings.values()}
         print(
-            f"WARNING: {
-              student_violations} student-day violations (need {num_colors_needed} days, have {NUM_DAYS})"
+            f"Common modules by {sync}: {len(problem.sittings)} modules "
+            f"in {len(leads)} shared sittings"
         )
 
-    # ========== PHASE 3: Room assignment (by formation and group) ==========
-    print("Assigning rooms to exams (by group)...")
-
-    # For each module, determine which groups are enrolled and their sizes
-    def get_module_groups(module_id):
-        """Get groups enrolled in a module with their sizes."""
-        groups = defaultdict(int)  # (formation_id, groupe) -> count
-        for student_id in module_students[module_id]:
-            if student_id in student_info:
-                info = student_info[student_id]
-                key = (info["formation_id"], info["groupe"])
-                groups[key] += 1
-        return groups
-
-    # Group by (day, slot)
-    slot_modules = defaultdict(list)
-    for module_id in module_ids:
-        day = module_day[module_id]
-        slot = module_slot[module_id]
-        slot_modules[(day, slot)].append(module_id)
-
-    # module_rooms[module_id] = [(room_id, room_type, formation_id, "group_str"), ...]
-    module_rooms = {}
-
-    # Separate rooms by type for easier assignment
-    amphitheaters = [(r[0], r[1], r[2]) for r in locations if r[2] == "Amphi"]
-    salles_td = [(r[0], r[1], r[2]) for r in locations if r[2] == "Salle_TD"]
-
-    for (day, slot), mods in slot_modules.items():
-        # Track available rooms for this slot
-        available_amphis = list(amphitheaters)
-        available_salles = list(salles_td)
-
-        for module_id in mods:
-            groups = get_module_groups(module_id)
-            assigned_rooms = []
-
-            # Sort groups by size (largest first)
-            sorted_groups = sorted(groups.items(), key=lambda x: x[1], reverse=True)
-
-            # Collect groups that need assignment: ((formation_id, groupe), size)
-            pending_groups = list(sorted_groups)
-
-            # Assign groups to rooms
-            while pending_groups:
-                group_key, size = pending_groups.pop(0)
-                formation_id, groupe_num = group_key
-
-                if size > 20:
-                    # Large group needs Amphi (60 capacity)
-                    if available_amphis:
-                        room_id, cap, rtype = available_amphis.pop(0)
-                        remaining_cap = cap - size
-                        groups_in_room = [groupe_num]
-
-                        # Try to add more groups from SAME formation to fill amphi
-                        i = 0
-                        while i < len(pending_groups) and remaining_cap >= 10:
-                            pg_key, pg_size = pending_groups[i]
-                            if pg_key[0] == formation_id and pg_size <= remaining_cap:
-                                groups_in_room.append(pg_key[1])
-                                remaining_cap -= pg_size
-                                pending_groups.pop(i)
-                            else:
-                                i += 1
-
-                        group_str = ",".join(str(g) for g in sorted(groups_in_room))
-                        assigned_rooms.append((room_id, rtype, formation_id, group_str))
-                    elif available_salles:
-                        # Fallback: use multiple salles for large group
-                        needed = size
-                        group_str = str(groupe_num)
-                        while needed > 0 and available_salles:
-                            room_id, cap, rtype = available_salles.pop(0)
-                            assigned_rooms.append((room_id, rtype, formation_id, group_str))
-                            needed -= cap
-                else:
-                    # Small group can use Salle_TD (20 capacity)
-                    if available_salles:
-                        room_id, cap, rtype = available_salles.pop(0)
-                        remaining_cap = cap - size
-                        groups_in_room = [groupe_num]
-
-                        # Try to combine with another small group from SAME formation
-                        i = 0
-                        while i < len(pending_groups) and remaining_cap >= 5:
-                            pg_key, pg_size = pending_groups[i]
-                            if pg_key[0] == formation_id and pg_size <= remaining_cap:
-                                groups_in_room.append(pg_key[1])
-                                remaining_cap -= pg_size
-                                pending_groups.pop(i)
-                            else:
-                                i += 1
-
-                        group_str = ",".join(str(g) for g in sorted(groups_in_room))
-                        assigned_rooms.append((room_id, rtype, formation_id, group_str))
-                    elif available_amphis:
-                        # Fallback: use amphi for small group
-                        room_id, cap, rtype = available_amphis.pop(0)
-                        assigned_rooms.append((room_id, rtype, formation_id, str(groupe_num)))
-
-            module_rooms[module_id] = assigned_rooms
-
-    # ========== PHASE 4: Professor assignment ==========
-    print("Assigning proctors to exams...")
-
-    # Calculate proctors needed per room type
-    # Salle_TD (20 seats): 1 proctor
-    # Amphi (60 seats): 3 proctors (1 per 20 students)
-    def proctors_for_room(room_type):
-        return 3 if room_type == "Amphi" else 1
-
-    # Calculate total proctoring sessions needed
-    total_sessions = sum(
-        sum(proctors_for_room(rtype) for _, rtype, _, _ in rooms)
-        for rooms in module_rooms.values()
-    )
-    sessions_per_prof = total_sessions // len(prof_ids)
-    extra_sessions = total_sessions % len(prof_ids)
+    timer.lap("chargement")
+
+    # Lower bounds on the loaded data: stop before solving when no schedule can be valid
+    feasibility = check_feasibility(problem, NUM_DAYS, SLOTS_PER_DAY)
+    print("\nFeasibility pre-check:")
+    print(format_report(feasibility))
+    blocking = infeasible(feasibility)
+    if blocking and not force:
+        conn.close()
+        memory.stop()
+        if own_trace is not None:
+            tracing.stop()
+        raise ValueError("No valid schedule exists: " + "; ".join(
+            f"{f['contrainte']}: {f['detail']}" for f in blocking
+        ))
+
+    timer.lap("faisabilite")
+
+    if mode == DEPARTMENT_MODE:
+        # ========== PHASES 1-4: by department, in parallel ==========
+        print("\nSolving department subproblems in parallel...")
+        module_day, module_slot, module_rooms, exam_proctors, prof_sessions, stats = (
+            solve_by_department(problem, NUM_DAYS, SLOTS_PER_DAY, workers, timer)
+        )
+        num_colors_needed = stats["jours_necessaires"]
+        print(
+            f"{stats['composantes']} conflict components in {stats['sous_problemes']} "
+            f"subproblems, {num_colors_needed} days needed for zero conflicts"
+        )
+        print(
+            f"Reconciled {stats['groupes_reconcilies']} groups in shared rooms, "
+            f"{stats['surveillances_reconciliees']} sessions across departments"
+        )
+        student_violations = count_student_violations(problem, module_day)
+        if student_violations > 0:
+            print(f"WARNING: {student_violations} student-day violations")
+        total_sessions = sessions_needed(module_rooms, problem.sittings)
+        print(f"Total proctoring sessions: {total_sessions}")
+    else:
+        # Soft objectives (spacing, clustering, compactness) break ties in every phase
+        scorer = Scorer(problem)
+        # Rooms left per slot: a module only goes where its rooms fit
+        rooms = SlotRooms(problem)
+        conflicts = None
+        if is_formation_based(problem):
+            # ========== PHASES 1-2: formation cliques, no conflict graph ==========
+            print("\nFormation-based enrollment: spreading each formation over distinct days...")
+            module_day, module_slot, num_colors_needed = assign_slots_by_formation(
+                problem, NUM_DAYS, SLOTS_PER_DAY, scorer, rooms
+            )
+            print(f"Largest formation: {num_colors_needed} days needed for zero conflicts")
+        else:
+            # ========== PHASE 1: Build conflict graph ==========
+            print("\nBuilding conflict graph...")
+            conflicts = build_conflicts(problem)
+
+            timer.lap("graphe")
+
+            # ========== PHASE 2: Slot assignment using constraint propagation ==========
+            print("Assigning exams to slots...")
+            # Each sitting of common modules is one node of the coloring
+            nodes, graph = sitting_graph(problem, conflicts)
+            module_day, module_slot, num_colors_needed = assign_slots(
+                nodes, graph, NUM_DAYS, SLOTS_PER_DAY, scorer, rooms, problem.sittings
+            )
+            print(f"Chromatic number: {num_colors_needed} days needed for zero conflicts")
+
+        student_violations = count_student_violations(problem, module_day)
+        print(f"Exams distributed across {NUM_DAYS} days, {TOTAL_SLOTS} slots")
+        if student_violations > 0:
+            print(
+                f"WARNING: {student_violations} student-day violations "
+                f"(need {num_colors_needed} days, have {NUM_DAYS})"
+            )
+        overbooked = rooms.overbooked()
+        if overbooked:
+            print(f"WARNING: {overbooked} slots need more rooms of a type than exist")
+        else:
+            print("Every slot has the rooms its exams need")
 
-    print(f"Total proctoring sessions: {total_sessions}")
-    print(f"Sessions per professor: {
-          sessions_per_prof} (+1 for {extra_sessions} profs)")
+        timer.lap("creneaux")
 
-    # Build department to professors mapping
-    dept_profs = defaultdict(list)
-    for prof_id, prof_data in professors.items():
-        dept_profs[prof_data["dept_id"]].append(prof_id)
+        # ========== PHASE 2b: Local improvement of the soft objectives ==========
+        before = scorer.total()
+        swaps = improve_days(problem, module_day, module_slot, scorer, conflicts, rooms)
+        print(f"Local improvement: {swaps} swaps, soft score {before:.0f} -> {scorer.total():.0f}")
+        # Swaps may move conflicts: report those of the schedule written
+        student_violations = count_student_violations(problem, module_day)
 
-    # Track professor assignments
-    prof_sessions = defaultdict(int)  # prof_id -> count
-    prof_day_count = defaultdict(lambda: defaultdict(int))  # prof_id -> day -> count
+        timer.lap("amelioration")
 
-    exam_proctors = {}  # module_id -> list of prof_ids
+        # ========== PHASE 3: Room assignment (by formation and group) ==========
+        print("Assigning rooms to exams (by group)...")
+        module_rooms = assign_rooms(problem, module_day, module_slot)
 
-    # Sort modules: prioritize by department to help with department priority constraint
-    # Group modules by department
-    dept_modules = defaultdict(list)
-    for module_id, data in modules.items():
-        dept_modules[data["dept_id"]].append(module_id)
+        timer.lap("salles")
 
-    # Process each module
-    for module_id in module_ids:
-        day = module_day[module_id]
-        # Calculate total proctors needed based on room types
-        num_proctors_needed = sum(
-            proctors_for_room(rtype) for _, rtype, _, _ in module_rooms[module_id]
+        # ========== PHASE 4: Professor assignment ==========
+        print("Assigning proctors to exams...")
+        exam_proctors, prof_sessions = assign_proctors(
+            problem, module_day, module_slot, module_rooms, scorer=scorer
         )
-        dept_id = modules[module_id]["dept_id"]
 
-        assigned_proctors = []
+        total_sessions = sessions_needed(module_rooms, problem.sittings)
+        print(f"Total proctoring sessions: {total_sessions}")
+        print(
+            f"Sessions per professor: {total_sessions // len(prof_ids)} "
+            f"(+1 for {total_sessions % len(prof_ids)} profs)"
+        )
 
-        # Get eligible professors (not at max for the day, not at max sessions)
-        def is_eligible(prof_id):
-            max_sessions = sessions_per_prof + (1 if prof_id <= extra_sessions else 0)
-            return (
-                prof_day_count[prof_id][day] < 3
-                and prof_sessions[prof_id] < max_sessions
-                and prof_id not in assigned_proctors
-            )
+        timer.lap("surveillants")
 
-        # First, try same-department professors
-        same_dept_profs = [p for p in dept_profs[dept_id] if is_eligible(p)]
-        # Sort by current load (least loaded first)
-        same_dept_profs.sort(key=lambda p: prof_sessions[p])
-
-        for prof_id in same_dept_profs:
-            if len(assigned_proctors) >= num_proctors_needed:
-                break
-            assigned_proctors.append(prof_id)
-            prof_sessions[prof_id] += 1
-            prof_day_count[prof_id][day] += 1
-
-        # If still need more, use other department professors
-        if len(assigned_proctors) < num_proctors_needed:
-            other_profs = [
-                p for p in prof_ids if p not in dept_profs[dept_id] and is_eligible(p)
-            ]
-            other_profs.sort(key=lambda p: prof_sessions[p])
-
-            for prof_id in other_profs:
-                if len(assigned_proctors) >= num_proctors_needed:
-                    break
-                assigned_proctors.append(prof_id)
-                prof_sessions[prof_id] += 1
-                prof_day_count[prof_id][day] += 1
-
-        exam_proctors[module_id] = assigned_proctors
+    if mode == DEPARTMENT_MODE:
+        scorer = score_schedule(problem, module_day, exam_proctors)
+    soft_score = scorer.breakdown()
+    print(
+        f"Soft objectives: {soft_score['espacement']:.0f} student rest days lost, "
+        f"department spread {soft_score['regroupement']:.0f}, "
+        f"{soft_score['compacite']:.0f} professor-days (score {soft_score['total']:.0f})"
+    )
 
     # ========== PHASE 5: Balance professor loads ==========
     print("Balancing professor workloads...")
@@ -388,16 +248,39 @@ def optimize_schedule():
         f"Avg: {sum(session_counts)/len(session_counts):.1f}"
     )
 
+    # Gap of this run to the pre-check's lower bounds
+    all_sessions = [prof_sessions.get(p, 0) for p in prof_ids]  # idle professors count
+    achieved = {
+        "jours": num_colors_needed,
+        "conflits_etudiants": student_violations,
+        "etudiants_sans_place": unseated_students(problem, module_rooms),
+        "surveillances": sessions_needed(module_rooms, problem.sittings),
+        "ecart_sessions": max(all_sessions) - min(all_sessions),
+        "surveillances_hors_departement": sum(
+            1 for module_id, proctors in exam_proctors.items() for p in proctors
+            if professors[p]["dept_id"] != modules[module_id]["dept_id"]
+        ),
+    }
+    gaps = gap_report(feasibility["bornes"], achieved)
+    print("Gap to the lower bounds:")
+    print(format_gaps(gaps))
+
+    timer.lap("equilibrage")
+
     # ========== PHASE 6: Write to database ==========
     print("\nWriting schedule to database...")
+    tracing.phase("Phase 6: write")
 
-    # Clear existing data
+    # Clear existing data. Nothing is committed until the new version row, its
+    # fact tables, cube and KPIs are written: readers (and the caches keyed by
+    # version id) see the previous version whole, then the new one whole
     cur.execute("DELETE FROM surveillances")
     cur.execute("DELETE FROM examens")
-    conn.commit()
 
     exam_count = 0
     surveillance_count = 0
+    # Rooms a sitting already wrote: proctored by its lowest module id (module_ids order)
+    shared_rooms = set()
 
     for module_id in module_ids:
         day_idx = module_day[module_id]
@@ -412,12 +295,16 @@ def optimize_schedule():
 
         # Create an exam entry for each room with formation and group assignment
         exam_ids = []
+        lead = problem.sittings.get(module_id, (None,))[0]
         for room_id, room_type, formation_id, group_str in rooms:
             cur.execute(
                 "INSERT INTO examens (module_id, lieu_examen_id, date_heure, formation_id, groupes) VALUES (%s, %s, %s, %s, %s)",
                 (module_id, room_id, datetime_str, formation_id, group_str),
             )
-            exam_ids.append(cur.lastrowid)
+            if (lead, room_id) not in shared_rooms:
+                exam_ids.append(cur.lastrowid)
+            if lead is not None:
+                shared_rooms.add((lead, room_id))
             exam_count += 1
 
         # Assign proctors to rooms (one proctor per room)
@@ -430,6 +317,30 @@ def optimize_schedule():
                 )
                 surveillance_count += 1
 
+    timer.lap("ecriture")
+
+    tracing.phase("Verification")
+
+    # Student, professor and capacity constraints are checked once here and
+    # stored as compact fact tables that the frontend pages read directly
+    facts = refresh_conflict_facts(conn, cur, commit=False)
+    refresh_occupancy_cube(conn, cur, commit=False)
+
+    # Every write creates a new schedule version; derived tables and caches
+    # (occupancy cube, PDF store, ...) are keyed by it
+    cur.execute(
+        "INSERT INTO versions_planning (nb_jours, creneaux_par_jour) VALUES (%s, %s)",
+        (NUM_DAYS, SLOTS_PER_DAY),
+    )
+    version_id = cur.lastrowid
+
+    # Dashboard KPIs, from the in-memory assignment (no re-read of the schedule)
+    kpis = compute_kpis(
+        model, dept_names, exam_days, SLOTS_PER_DAY,
+        module_day, module_rooms, exam_proctors, module_slot, problem.module_retakers,
+    )
+    store_kpis(cur, version_id, kpis)
+
     conn.commit()
 
     elapsed = time.time() - start_time
@@ -444,39 +355,18 @@ def optimize_schedule():
 
     # Verify constraints
     print("\nVerifying constraints...")
-
-    # Check student constraint (max 1 exam per day)
-    # Students take all modules of their formation, so check via formation_id
-    cur.execute("""
-        SELECT e.id as etudiant_id, DATE(ex.date_heure) as exam_date,
-               COUNT(DISTINCT ex.module_id) as exam_count
-        FROM etudiants e
-        JOIN modules m ON e.formation_id = m.formation_id
-        JOIN examens ex ON m.id = ex.module_id
-        GROUP BY e.id, DATE(ex.date_heure)
-        HAVING COUNT(DISTINCT ex.module_id) > 1
-        LIMIT 5
-    """)
-    violations = cur.fetchall()
-    if violations:
-        print(f"WARNING: {len(violations)} student-day violations found")
+    if facts["student_conflicts"]:
+        print(f"WARNING: {facts['student_conflicts']} student-day violations found")
     else:
         print("OK: No student has more than 1 exam per day")
-
-    # Check professor constraint (max 3 exams per day)
-    cur.execute("""
-        SELECT s.prof_id, DATE(ex.date_heure) as exam_date, COUNT(*) as exam_count
-        FROM surveillances s
-        JOIN examens ex ON s.examen_id = ex.id
-        GROUP BY s.prof_id, DATE(ex.date_heure)
-        HAVING COUNT(*) > 3
-        LIMIT 5
-    """)
-    violations = cur.fetchall()
-    if violations:
-        print(f"WARNING: {len(violations)} professor-day violations found")
+    if facts["prof_conflicts"]:
+        print(f"WARNING: {facts['prof_conflicts']} professor-day violations found")
     else:
         print("OK: No professor has more than 3 exams per day")
+    if facts["room_conflicts"]:
+        print(f"WARNING: {facts['room_conflicts']} modules exceed their room capacity")
+    else:
+        print("OK: All rooms can seat their students")
 
     # Check session distribution
     cur.execute("""
@@ -491,18 +381,66 @@ def optimize_schedule():
             f"Professor sessions - Min: {min(sessions)}, Max: {max(sessions)}, "
             f"Range: {max(sessions) - min(sessions)}"
         )
+    timer.lap("verification")
+
+    peak_mb = memory.stop()
+
+    # Run history: parameters, phase timings, peak memory and quality metrics
+    params = {
+        "nb_jours": NUM_DAYS,
+        "creneaux_par_jour": SLOTS_PER_DAY,
+        "modules": len(module_ids),
+        "etudiants": num_students,
+        "professeurs": len(prof_ids),
+        "salles": len(locations),
+        "reinscriptions": len(problem.retakes),
+        "sessions_communes": sync,
+    }
+    run_id = store_run(cur, version_id, mode, params, timer.durations,
+                       peak_mb, facts, kpis)
+    conn.commit()
 
     conn.close()
 
+    if own_trace is not None:
+        tracing.stop()
+        print("\n" + tracing.format_summary(own_trace.summary()))
+        if os.getenv("SQL_TRACE_FILE"):
+            own_trace.dump(os.getenv("SQL_TRACE_FILE"))
+
+    # Fill the PDF store and the calendar feeds of the new version without
+    # blocking the caller
+    start_background_prerender(version_id)
+    start_background_build(version_id)
+
     return {
         "elapsed_time": elapsed,
+        "version_id": version_id,
         "num_exams": exam_count,
         "num_days": NUM_DAYS,
         "num_slots": TOTAL_SLOTS,
         "num_surveillances": surveillance_count,
         "student_violations": student_violations,
+        "run_id": run_id,
+        "phase_times": timer.durations,
+        "soft_score": soft_score,
+        "feasibility": feasibility,
+        "gaps": gaps,
     }
 
 
 if __name__ == "__main__":
-    optimize_schedule()
+    parser = argparse.ArgumentParser(description="Generate the exam schedule")
+    parser.add_argument("--mode", choices=[SOLVER_MODE, DEPARTMENT_MODE], default=SOLVER_MODE,
+                        help="glouton: one pass over all modules; departements: "
+                             "department subproblems in parallel (scripts/decompose.py)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for --mode departements")
+    parser.add_argument("--force", action="store_true",
+                        help="solve even when the feasibility pre-check finds no valid "
+                             "schedule can exist")
+    parser.add_argument("--sync", choices=SYNC_SCOPES, default=None,
+                        help="examine same-name common modules of a department or cycle "
+                             "together, in shared rooms")
+    args = parser.parse_args()
+    optimize_schedule(args.mode, args.workers, args.force, args.sync)
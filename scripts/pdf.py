@@ -0,0 +1,293 @@
+"""
+PDF rendering of exam timetables (FPDF).
+
+Kept free of Streamlit and database code so the renderers can run in worker
+processes during bulk exports.
+
+Text goes through the core Helvetica font, transliterated to ASCII. Set
+PDF_FONT_PATH (and optionally PDF_FONT_BOLD_PATH) to a TrueType font to embed
+it instead and keep accents. Embedding costs a font parse per style and
+document (fpdf2 subsets the parsed font in place, so it cannot be shared
+between documents), which is why it is opt-in.
+
+Usage (micro-benchmark):
+    python -m scripts.pdf [--pages 200]
+"""
+
+import argparse
+import os
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from fpdf import FPDF
+
+FONT_PATH = os.getenv("PDF_FONT_PATH")
+FONT_BOLD_PATH = os.getenv("PDF_FONT_BOLD_PATH")
+FONT_FAMILY = "Timetable" if FONT_PATH else "Helvetica"
+# Each embedded style is one more font parse: the footer stays upright then
+FOOTER_STYLE = "" if FONT_PATH else "I"
+
+# Characters NFKD does not decompose to ASCII
+_TRANSLITERATION = str.maketrans({
+    'œ': 'oe', 'Œ': 'OE', 'æ': 'ae', 'Æ': 'AE', 'ß': 'ss', 'ø': 'o', 'Ø': 'O',
+    '’': "'", '‘': "'", '“': '"', '”': '"', '«': '"', '»': '"',
+    '–': '-', '—': '-',
+    '…': '...', '•': '*',
+})
+
+
+@lru_cache(maxsize=8192)
+def _transliterate(text):
+    text = text.translate(_TRANSLITERATION)
+    if text.isascii():
+        return text
+    # Strip accents: é -> e + combining acute, then drop what is not ASCII
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+def sanitize_text(text):
+    """Remove or replace non-ASCII characters for PDF compatibility."""
+    if text is None:
+        return ""
+    text = str(text)
+    if text.isascii():
+        return text
+    return _transliterate(text)
+
+
+def _keep_text(text):
+    return "" if text is None else str(text)
+
+
+# With an embedded Unicode font there is nothing to transliterate
+pdf_text = _keep_text if FONT_PATH else sanitize_text
+
+
+class _TimetablePDF(FPDF):
+    """Shared title header, page footer and font setup."""
+
+    def __init__(self, title, orientation='P'):
+        super().__init__(orientation=orientation)
+        if FONT_PATH:
+            self.add_font(FONT_FAMILY, "", FONT_PATH)
+            self.add_font(FONT_FAMILY, "B", FONT_BOLD_PATH or FONT_PATH)
+        self.title_text = pdf_text(title)
+
+    def header(self):
+        self.set_font(FONT_FAMILY, "B", 14)
+        self.cell(0, 10, self.title_text, ln=True, align="C")
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font(FONT_FAMILY, FOOTER_STYLE, 8)
+        self.cell(0, 10, f"Page {self.page_no()}", align="C")
+
+
+class PDFSchedule(_TimetablePDF):
+    """Custom PDF class for exam schedules."""
+
+    def __init__(self, title):
+        super().__init__(title, orientation='L')  # Landscape for wide tables
+
+
+class PDFProfSchedule(_TimetablePDF):
+    """Custom PDF for professor schedules."""
+
+
+def _draw_table(pdf, widths, height, columns, aligns):
+    """Draw a table given as one list of texts per column."""
+    for row in zip(*columns):
+        for width, text, align in zip(widths, row, aligns):
+            pdf.cell(width, height, text, border=1, align=align)
+        pdf.ln()
+
+
+def formation_pdf_filename(formation_name):
+    return f"EDT_{formation_name.replace(' ', '_')}.pdf"
+
+
+@lru_cache(maxsize=1024)
+def _formation_layout(modules):
+    """Module column width and header labels for a tuple of module names."""
+    available_width = 277 - 20  # A4 landscape width minus margins and Groupe column
+    module_col_width = min(45, available_width / max(len(modules), 1))
+    headers = []
+    for module in modules:
+        module_short = pdf_text(module)
+        if len(module_short) > 20:
+            module_short = module_short[:18] + ".."
+        headers.append(module_short)
+    return module_col_width, headers
+
+
+@lru_cache(maxsize=8192)
+def _slot_text(cell):
+    """'Salle\\ndate heure' -> 'Salle | date heure' (room name cut to fit)."""
+    cell_text = pdf_text(cell)
+    if "\n" in cell_text:
+        salle, _, slot = cell_text.partition("\n")
+        cell_text = f"{salle[:15]} | {slot}"
+    return cell_text
+
+
+def generate_pdf(formation_name, modules, rows, groups=None):
+    """Generate PDF for a formation's schedule with groups as rows.
+
+    rows: [["G1", cell, ...], ...] as built by FormationSchedule.pivot()
+    groups: [(groupe, effectif), ...]
+    """
+    pdf = PDFSchedule(f"Emploi du Temps - {formation_name}")
+    pdf.add_page()
+
+    # Show group counts if available
+    if groups:
+        pdf.set_font(FONT_FAMILY, size=9)
+        group_text = " | ".join(f"G{groupe}: {effectif} etud." for groupe, effectif in groups)
+        pdf.cell(0, 6, pdf_text(group_text), ln=True)
+        pdf.ln(3)
+
+    if not rows:
+        pdf.set_font(FONT_FAMILY, size=10)
+        pdf.cell(0, 10, "Aucun examen planifie.", ln=True)
+        return bytes(pdf.output())
+
+    groupe_col_width = 20
+    module_col_width, headers = _formation_layout(tuple(modules))
+    widths = [groupe_col_width] + [module_col_width] * len(headers)
+    aligns = ["C"] * len(widths)
+
+    # Table header
+    pdf.set_fill_color(200, 200, 200)
+    pdf.set_font(FONT_FAMILY, "B", 8)
+    for width, header in zip(widths, ["Groupe"] + headers):
+        pdf.cell(width, 10, header, border=1, fill=True, align="C")
+    pdf.ln()
+
+    # Table content, column by column
+    columns = list(zip(*rows))
+    columns = [[str(g) for g in columns[0]]] + [
+        [_slot_text(str(cell)) for cell in column] for column in columns[1:]
+    ]
+    pdf.set_font(FONT_FAMILY, size=7)
+    _draw_table(pdf, widths, 12, columns, aligns)
+
+    return bytes(pdf.output())
+
+
+def prof_pdf_filename(prof_name, prof_id=None):
+    # Names are not unique: bulk exports add the id
+    suffix = f"_{prof_id}" if prof_id is not None else ""
+    return f"Planning_{prof_name.replace(' ', '_')}{suffix}.pdf"
+
+
+PROF_COL_WIDTHS = [25, 20, 70, 35, 40]
+PROF_HEADERS = ["Date", "Heure", "Module", "Salle", "Formation"]
+PROF_ALIGNS = ["L", "C", "L", "L", "L"]
+
+
+@lru_cache(maxsize=8192)
+def _module_text(module):
+    module = pdf_text(module)
+    return module[:35] + "..." if len(module) > 35 else module
+
+
+@lru_cache(maxsize=8192)
+def _formation_text(formation):
+    return pdf_text(formation)[:20] if formation else "-"
+
+
+def generate_prof_pdf(prof_name, dept_name, rows):
+    """Generate PDF for a professor's schedule.
+
+    rows: [(date, heure, module, salle, formation), ...]
+    """
+    pdf = PDFProfSchedule(f"Planning de Surveillance - {prof_name}")
+    pdf.add_page()
+
+    pdf.set_font(FONT_FAMILY, size=10)
+    pdf.cell(0, 8, pdf_text(f"Departement: {dept_name}"), ln=True)
+    pdf.cell(0, 8, f"Nombre de sessions: {len(rows)}", ln=True)
+    pdf.ln(5)
+
+    # Table header
+    pdf.set_fill_color(200, 200, 200)
+    pdf.set_font(FONT_FAMILY, "B", 9)
+    for width, header in zip(PROF_COL_WIDTHS, PROF_HEADERS):
+        pdf.cell(width, 8, header, border=1, fill=True, align="C")
+    pdf.ln()
+
+    if rows:
+        dates, heures, modules, salles, formations = zip(*rows)
+        columns = [
+            [pdf_text(d) for d in dates],
+            [pdf_text(h) for h in heures],
+            [_module_text(m) for m in modules],
+            [pdf_text(s) for s in salles],
+            [_formation_text(f) for f in formations],
+        ]
+        pdf.set_font(FONT_FAMILY, size=8)
+        _draw_table(pdf, PROF_COL_WIDTHS, 7, columns, PROF_ALIGNS)
+
+    return bytes(pdf.output())
+
+
+def render_parallel(render, tasks, workers=None):
+    """Yield render(task) for each task, in order, using a process pool."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield render(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        yield from pool.map(render, tasks, chunksize=chunksize)
+
+
+def _benchmark(pages):
+    """Time sanitizing and per-page rendering on synthetic timetables."""
+    modules = [f"Modelisation et Theorie des Graphes {i}" for i in range(6)]
+    groups = [(g, 30) for g in range(1, 9)]
+    rows = [
+        [f"G{g}"] + [f"Amphi Ibn Khaldoun {m}\n{10 + m:02d}/06 08:30" for m in range(6)]
+        for g, _ in groups
+    ]
+    prof_rows = [
+        ("10/06/2026", "08:30", modules[i % 6], "Salle TD 12", "Informatique L3 S5")
+        for i in range(12)
+    ]
+    names = ["Réseaux", "Électronique", "Cœur", "Probabilités – Statistiques", "Algebre"]
+    # Distinct strings, far more than the memo holds: each call transliterates
+    words = [f"{name} {i}" for i in range(20000) for name in names]
+    _transliterate.cache_clear()
+    start = time.perf_counter()
+    for word in words:
+        sanitize_text(word)
+    elapsed = time.perf_counter() - start
+    print(f"sanitize_text:     {elapsed / len(words) * 1e9:8.0f} ns/call (distinct strings)")
+
+    # The same few strings, as in a timetable: memo hits
+    words = names * 20000
+    start = time.perf_counter()
+    for word in words:
+        sanitize_text(word)
+    elapsed = time.perf_counter() - start
+    print(f"sanitize_text:     {elapsed / len(words) * 1e9:8.0f} ns/call (repeated strings)")
+
+    for label, render in (
+        ("formation page", lambda: generate_pdf("Informatique L3 S5", modules, rows, groups)),
+        ("professor page", lambda: generate_prof_pdf("Amine Benali", "Informatique", prof_rows)),
+    ):
+        render()  # warm caches
+        start = time.perf_counter()
+        for _ in range(pages):
+            render()
+        elapsed = time.perf_counter() - start
+        print(f"{label}:    {elapsed / pages * 1e3:8.2f} ms/page ({pages} pages, font {FONT_FAMILY})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF rendering micro-benchmark")
+    parser.add_argument("--pages", type=int, default=200)
+    _benchmark(parser.parse_args().pages)
@@ -0,0 +1,209 @@
+"""
+PDF Artifact Store
+
+Rendered timetables are kept on local disk so downloads never re-run FPDF:
+
+    <root>/objects/<sha256>.pdf            PDF bytes, content-addressed
+    <root>/refs/<version>/<kind>-<id>      sha256 of the PDF for an entity
+
+kind is "formation" or "professor". A PDF that does not change between two
+schedule versions is stored once. Blobs are evicted least-recently-used
+(reads refresh their mtime) once the store exceeds PDF_CACHE_MAX_MB.
+
+After each optimization run the optimizer starts a background process that
+pre-renders every formation and professor PDF of the new version:
+
+    python -m scripts.pdf_cache <version_id>
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+from scripts.helpers import create_connection
+from scripts.pdf import generate_pdf, generate_prof_pdf, render_parallel
+from scripts.snapshot import load_formation_schedules, load_professor_schedules
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), "..")
+CACHE_ROOT = os.getenv("PDF_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache", "pdf"))
+MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_MB", "512")) * 1024 * 1024
+KEEP_VERSIONS = 2
+
+FORMATION = "formation"
+PROFESSOR = "professor"
+
+
+def _object_path(digest, root=CACHE_ROOT):
+    return os.path.join(root, "objects", f"{digest}.pdf")
+
+
+def _ref_path(version_id, kind, entity_id, root=CACHE_ROOT):
+    return os.path.join(root, "refs", str(version_id), f"{kind}-{entity_id}")
+
+
+def _write_atomic(path, data, mode="wb"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, mode) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def get(version_id, kind, entity_id, root=CACHE_ROOT):
+    """Return the cached PDF bytes, or None on a miss."""
+    if version_id is None:
+        return None
+    try:
+        with open(_ref_path(version_id, kind, entity_id, root)) as f:
+            digest = f.read().strip()
+        path = _object_path(digest, root)
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # LRU: mark as recently used
+        return data
+    except FileNotFoundError:
+        return None
+
+
+def put(version_id, kind, entity_id, data, root=CACHE_ROOT):
+    """Store PDF bytes for an entity of a schedule version."""
+    if version_id is None:
+        return
+    _write_ref(version_id, kind, entity_id, _store_object(data, root), root)
+
+
+def _store_object(data, root=CACHE_ROOT):
+    """Store PDF bytes under their sha256; return it."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(digest, root)
+    if os.path.exists(path):
+        os.utime(path)
+    else:
+        _write_atomic(path, data)
+    return digest
+
+
+def _write_ref(version_id, kind, entity_id, digest, root=CACHE_ROOT):
+    _write_atomic(_ref_path(version_id, kind, entity_id, root), digest, mode="w")
+
+
+def get_or_render(version_id, kind, entity_id, render, root=CACHE_ROOT):
+    """Return the cached PDF, rendering and storing it on a miss."""
+    data = get(version_id, kind, entity_id, root)
+    if data is None:
+        data = render()
+        put(version_id, kind, entity_id, data, root)
+    return data
+
+
+def evict(max_bytes=MAX_BYTES, keep_versions=KEEP_VERSIONS, root=CACHE_ROOT):
+    """Drop refs of old versions, then least-recently-used blobs over max_bytes."""
+    refs_dir = os.path.join(root, "refs")
+    if os.path.isdir(refs_dir):
+        versions = sorted((int(v) for v in os.listdir(refs_dir) if v.isdigit()), reverse=True)
+        for version in versions[keep_versions:]:
+            shutil.rmtree(os.path.join(refs_dir, str(version)), ignore_errors=True)
+
+    objects_dir = os.path.join(root, "objects")
+    if not os.path.isdir(objects_dir):
+        return 0
+    blobs = []
+    total = 0
+    for entry in os.scandir(objects_dir):
+        if entry.name.endswith(".pdf"):
+            stat = entry.stat()
+            blobs.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    removed = 0
+    for _, size, path in sorted(blobs):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+        removed += 1
+    return removed
+
+
+def _render_formation(task):
+    form_id, name, modules, rows, groups = task
+    return FORMATION, form_id, generate_pdf(name, modules, rows, groups)
+
+
+def _render_professor(task):
+    prof_id, name, dept_name, rows = task
+    return PROFESSOR, prof_id, generate_prof_pdf(name, dept_name, rows)
+
+
+def _current_version(cur):
+    cur.execute("SELECT MAX(id) FROM versions_planning")
+    return cur.fetchone()[0]
+
+
+def prerender(version_id, workers=None, root=CACHE_ROOT):
+    """Render every formation and professor PDF of a version into the store.
+
+    The database only holds the latest schedule: if a newer version is
+    written before or during the render, nothing is stored (its own
+    pre-render fills the store). Return the number of PDFs stored.
+    """
+    start = time.time()
+    conn = create_connection()
+    cur = conn.cursor()
+    # The schedules are read in the same transaction as the version check
+    current = _current_version(cur)
+    if current != version_id:
+        conn.close()
+        print(f"Version {version_id} is no longer current ({current}): nothing pre-rendered")
+        return 0
+    formation_tasks = [
+        (s.formation_id, s.name, s.modules, s.pivot(), s.groups)
+        for s in load_formation_schedules(cur).values()
+        if s.exams
+    ]
+    professor_tasks = [
+        (s.prof_id, s.name, s.dept_name, s.rows)
+        for s in load_professor_schedules(cur).values()
+        if s.rows
+    ]
+    conn.close()
+
+    # Blobs are content-addressed and harmless: the refs wait for the check below
+    refs = []
+    for render, tasks in ((_render_formation, formation_tasks), (_render_professor, professor_tasks)):
+        for kind, entity_id, data in render_parallel(render, tasks, workers):
+            refs.append((kind, entity_id, _store_object(data, root)))
+
+    # A run may have rewritten the schedule while it was being read
+    conn = create_connection()
+    current = _current_version(conn.cursor())
+    conn.close()
+    if current != version_id:
+        evict(root=root)
+        print(f"Version {version_id} was replaced by {current} during the render: no refs written")
+        return 0
+
+    for kind, entity_id, digest in refs:
+        _write_ref(version_id, kind, entity_id, digest, root)
+    count = len(refs)
+
+    evict(root=root)
+    print(f"Pre-rendered {count} PDFs for version {version_id} in {time.time() - start:.2f}s")
+    return count
+
+
+def start_background_prerender(version_id):
+    """Pre-render a version's PDFs in a detached process."""
+    return subprocess.Popen(
+        [sys.executable, "-m", "scripts.pdf_cache", str(version_id)],
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+if __name__ == "__main__":
+    prerender(int(sys.argv[1]))
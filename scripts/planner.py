@@ -0,0 +1,319 @@
+"""
+What-if Resource Planner
+
+Finds the minimum flexible resources (amphitheaters, salles TD, professors
+per department) that keep a schedule with zero violations and the target
+session spread, on the in-memory model, without repopulating the database.
+
+Slots (phases 1-2) do not depend on rooms or professors, so they are solved
+once and reused by every scenario; each scenario only re-runs the room and
+proctor assignment (phases 3-4, scripts/solver.py).
+
+- rooms: the peak, over the slots, of the amphis and salles TD the exams
+  take in their preferred room types (SlotRooms demand), read off the
+  slots directly. With fewer amphis, large groups still fit in several
+  salles, so seating alone would report almost no amphis as a minimum.
+- professors: searched jointly, as one total split between departments in
+  proportion to the sessions of their exams, so each department covers
+  its own exams first. A department searched alone with the others at
+  their current headcount would lean on them and report almost nobody.
+  The probes of each round run in parallel, one per process.
+- the scenario with every minimum is then grown (salles TD for unseated
+  students, professors for missing sessions) until it is valid.
+
+Usage:
+    python -m scripts.planner [--spread 1] [--workers N]
+"""
+
+import argparse
+import copy
+import math
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from scripts.hardcoded import AMPHI_CAPACITY, SALLE_TD_CAPACITY
+from scripts.helpers import create_connection
+from scripts.loader import load_model
+from scripts.optimize import SLOTS_PER_DAY, get_exam_days
+from scripts.solver import (
+    Problem, SlotRooms, assign_proctors, assign_rooms, count_student_violations,
+    proctors_needed, schedule_days, sessions_needed, unseated_students,
+)
+
+TARGET_SPREAD = 1  # max - min proctoring sessions per professor
+MAX_SESSIONS_PER_DAY = 3
+MAX_GROWTH = 64  # give up beyond this multiple of the current professors
+
+AMPHI = "Amphi"
+SALLE_TD = "Salle_TD"
+ROOM_CAPACITY = {AMPHI: AMPHI_CAPACITY, SALLE_TD: SALLE_TD_CAPACITY}
+
+
+def solve_slots(problem, num_days):
+    """Phases 1-2, shared by all scenarios: (module_day, module_slot, student violations)."""
+    # Capacity-blind (no SlotRooms): the slots must not depend on the rooms being searched
+    module_day, module_slot, _ = schedule_days(problem, num_days, SLOTS_PER_DAY)
+    return module_day, module_slot, count_student_violations(problem, module_day)
+
+
+def current_resources(problem):
+    """{"Amphi": n, "Salle_TD": n, dept_id: professor count}."""
+    resources = {AMPHI: 0, SALLE_TD: 0}
+    for _, _, room_type in problem.locations:
+        resources[room_type] += 1
+    for prof in problem.professors.values():
+        resources[prof["dept_id"]] = resources.get(prof["dept_id"], 0) + 1
+    return resources
+
+
+def scenario(problem, resources):
+    """Copy of the problem with the given room and professor counts.
+
+    Existing rooms and professors are kept in order; missing ones are added
+    with the standard capacity (rooms) or as new professors of the department.
+    """
+    rooms = {AMPHI: [], SALLE_TD: []}
+    for location in problem.locations:
+        rooms[location[2]].append(location)
+    next_room = max((loc[0] for loc in problem.locations), default=0) + 1
+    locations = []
+    for room_type in (AMPHI, SALLE_TD):  # largest first, like the model
+        kept = rooms[room_type][:resources[room_type]]
+        for _ in range(resources[room_type] - len(kept)):
+            kept.append((next_room, ROOM_CAPACITY[room_type], room_type))
+            next_room += 1
+        locations.extend(kept)
+
+    dept_profs = {}
+    for prof_id, prof in problem.professors.items():
+        dept_profs.setdefault(prof["dept_id"], []).append(prof_id)
+    next_prof = max(problem.prof_ids, default=0) + 1
+    professors = {}
+    for dept_id, prof_ids in dept_profs.items():
+        count = resources.get(dept_id, len(prof_ids))
+        for prof_id in prof_ids[:count]:
+            professors[prof_id] = {"dept_id": dept_id}
+        for _ in range(count - len(prof_ids)):
+            professors[next_prof] = {"dept_id": dept_id}
+            next_prof += 1
+
+    planned = copy.copy(problem)
+    planned.locations = locations
+    planned.professors = professors
+    planned.prof_ids = sorted(professors)
+    return planned
+
+
+def evaluate(problem, slots, resources, target_spread=TARGET_SPREAD):
+    """Phases 3-4 of one scenario. Return its metrics (ok: no violation, spread met)."""
+    module_day, module_slot, student_violations = slots
+    planned = scenario(problem, resources)
+    if not planned.prof_ids:
+        return {"ok": False, "etudiants_sans_place": None, "surveillances_manquantes": None,
+                "ecart_sessions": None, "conflits_etudiants": student_violations}
+
+    module_rooms = assign_rooms(planned, module_day, module_slot)
+    exam_proctors, prof_sessions = assign_proctors(planned, module_day, module_slot, module_rooms)
+    sessions = [prof_sessions.get(p, 0) for p in planned.prof_ids]
+    metrics = {
+        "conflits_etudiants": student_violations,
+        "etudiants_sans_place": unseated_students(planned, module_rooms),
+        "surveillances_manquantes": sessions_needed(module_rooms, planned.sittings) - sum(sessions),
+        "ecart_sessions": max(sessions) - min(sessions),
+        "surveillances_hors_departement": sum(
+            planned.professors[p]["dept_id"] != planned.modules[m]["dept_id"]
+            for m, profs in exam_proctors.items() for p in profs
+        ),
+    }
+    metrics["ok"] = (
+        student_violations == 0
+        and metrics["etudiants_sans_place"] == 0
+        and metrics["surveillances_manquantes"] == 0
+        and metrics["ecart_sessions"] <= target_spread
+    )
+    return metrics
+
+
+# Worker state: the problem and its slots are sent once per process
+_worker = {}
+
+
+def _init_worker(problem, slots, target_spread):
+    _worker.update(problem=problem, slots=slots, target_spread=target_spread)
+
+
+def _evaluate(resources):
+    return evaluate(_worker["problem"], _worker["slots"], resources, _worker["target_spread"])
+
+
+def _covered(metrics, target_spread):
+    """Every session covered within the spread."""
+    return (metrics["ecart_sessions"] is not None
+            and metrics["surveillances_manquantes"] == 0
+            and metrics["ecart_sessions"] <= target_spread)
+
+
+def _valid(metrics, target_spread):
+    """Everyone seated and every session covered within the spread.
+
+    Student violations come from the slots, which no resource changes.
+    """
+    return _covered(metrics, target_spread) and metrics["etudiants_sans_place"] == 0
+
+
+def room_minimums(problem, slots):
+    """{"Amphi": n, "Salle_TD": n}: the peak preferred demand of a slot, per room type."""
+    module_day, module_slot, _ = slots
+    rooms = SlotRooms(problem)
+    slot_demand = defaultdict(lambda: [0, 0])
+    for module_id in problem.module_ids:
+        if problem.sittings.get(module_id, (module_id,))[0] != module_id:
+            continue  # seated by its sitting's lead
+        demand = slot_demand[module_day[module_id], module_slot[module_id]]
+        demand[0] += rooms.demand[module_id][0]
+        demand[1] += rooms.demand[module_id][1]
+    return {
+        AMPHI: max((amphis for amphis, _ in slot_demand.values()), default=0),
+        SALLE_TD: max((salles for _, salles in slot_demand.values()), default=0),
+    }
+
+
+def session_demand(problem, slots, resources):
+    """({dept_id: sessions of its exams}, sessions on the busiest day, sessions
+    in the busiest slot) for these rooms."""
+    module_day, module_slot, _ = slots
+    planned = scenario(problem, resources)
+    module_rooms = assign_rooms(planned, module_day, module_slot)
+    dept_sessions = Counter()
+    day_sessions = Counter()
+    slot_sessions = Counter()
+    for module_id, count in proctors_needed(module_rooms, planned.sittings).items():
+        dept_sessions[problem.modules[module_id]["dept_id"]] += count
+        day_sessions[module_day[module_id]] += count
+        slot_sessions[(module_day[module_id], module_slot[module_id])] += count
+    return (dept_sessions, max(day_sessions.values(), default=0),
+            max(slot_sessions.values(), default=0))
+
+
+def split_professors(dept_sessions, depts, total):
+    """{dept_id: professors}: `total` split in proportion to each department's sessions."""
+    sessions = sum(dept_sessions.values()) or 1
+    return {d: math.ceil(total * dept_sessions[d] / sessions) for d in depts}
+
+
+def _search(pool, resources_of, accept, lo, hi, width):
+    """Smallest n in [lo, hi] whose scenario resources_of(n) is accepted, as hi is.
+
+    `width` probes per round, evaluated in parallel (a binary search for 1).
+    Return (n, probes).
+    """
+    probes = 0
+    while lo < hi:
+        points = sorted({lo + (hi - lo) * (i + 1) // (width + 1) for i in range(width)})
+        results = pool.map(_evaluate, [resources_of(n) for n in points])
+        probes += len(points)
+        passed = [n for n, metrics in zip(points, results) if accept(metrics)]
+        if passed:
+            hi = passed[0]
+            lo = max([n + 1 for n in points if n < hi] + [lo])
+        else:
+            lo = points[-1] + 1
+    return hi, probes
+
+
+def plan_resources(problem, num_days, target_spread=TARGET_SPREAD, workers=None):
+    """Minimum of each flexible resource, checked together.
+
+    Return (current resources, {resource: minimum or None}, metrics of the
+    scenario with every minimum, scenarios evaluated).
+    """
+    slots = solve_slots(problem, num_days)
+    base = current_resources(problem)
+    depts = [r for r in base if r not in ROOM_CAPACITY]
+    base_profs = sum(base[d] for d in depts)
+
+    rooms = room_minimums(problem, slots)
+    dept_sessions, busiest_day, busiest_slot = session_demand(problem, slots, {**base, **rooms})
+    total_sessions = sum(dept_sessions.values())
+
+    def professors(total):
+        return {**base, **rooms, **split_professors(dept_sessions, depts, total)}
+
+    def covered(metrics):
+        return _covered(metrics, target_spread)
+
+    # Nobody proctors more than 3 sessions a day, nor twice in one slot
+    lo = max(math.ceil(total_sessions / (num_days * MAX_SESSIONS_PER_DAY)),
+             math.ceil(busiest_day / MAX_SESSIONS_PER_DAY), busiest_slot, 1)
+    workers = workers or os.cpu_count() or 1
+    probes = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(problem, slots, target_spread)) as pool:
+        # Grow the current headcount until it is enough, then search below it
+        hi = max(base_profs, lo)
+        while True:
+            probes += 1
+            if covered(pool.submit(_evaluate, professors(hi)).result()):
+                break
+            if hi > MAX_GROWTH * max(base_profs, 1):
+                hi = None
+                break
+            hi *= 2
+        if hi is not None:
+            hi, count = _search(pool, professors, covered, min(lo, hi), hi, workers)
+            probes += count
+
+    if hi is None:
+        minimums = {**rooms, **{d: None for d in depts}}
+        return base, minimums, evaluate(problem, slots, {**base, **rooms}, target_spread), probes
+
+    # Rooms and professors interact (salles TD seat amphi groups, more rooms need
+    # more proctors): grow the scenario until every minimum holds at once
+    total = hi
+    resources = professors(total)
+    metrics = evaluate(problem, slots, resources, target_spread)
+    probes += 1
+    while not _valid(metrics, target_spread) and total <= MAX_GROWTH * max(base_profs, 1):
+        if metrics["etudiants_sans_place"]:
+            resources[SALLE_TD] += math.ceil(metrics["etudiants_sans_place"] / SALLE_TD_CAPACITY)
+        else:
+            total += max(1, total // 50)
+            resources.update(split_professors(dept_sessions, depts, total))
+        metrics = evaluate(problem, slots, resources, target_spread)
+        probes += 1
+
+    minimums = {r: resources[r] for r in (AMPHI, SALLE_TD, *depts)}
+    return base, minimums, metrics, probes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Minimum rooms and professors for a valid schedule")
+    parser.add_argument("--spread", type=int, default=TARGET_SPREAD,
+                        help="max session spread between professors")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.time()
+    conn = create_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, nom FROM departements")
+    dept_names = dict(cur.fetchall())
+    problem = Problem(load_model(conn))
+    loaded = time.time() - start
+
+    base, minimums, combined, probes = plan_resources(
+        problem, len(get_exam_days()), args.spread, args.workers
+    )
+
+    print(f"{'Ressource':<28} {'Actuel':>7} {'Minimum':>8}")
+    for resource, minimum in minimums.items():
+        name = dept_names.get(resource, resource)
+        label = f"Professeurs {name}" if resource in dept_names else name
+        shown = minimum if minimum is not None else "-"
+        print(f"{label:<28} {base[resource]:>7} {shown:>8}")
+    print(f"All minimums together: {'OK' if combined['ok'] else 'NOT OK'} {combined}")
+    print(f"{probes} scenarios evaluated")
+    print(f"Loaded in {loaded:.2f}s, planned in {time.time() - start - loaded:.2f}s")
+    conn.close()
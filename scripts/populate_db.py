@@ -1,3 +1,35 @@
+"""
+Database Populator
+
+Generates the synthetic faculty (departments, specialites, formations,
+students, modules, professors, exam rooms) and bulk-loads it:
+
+- the dataset is deterministic: the same --seed and --scale always produce
+  the same rows, ids included
+- --scale N replicates the faculty N times (N x departments, formations,
+  students, professors and rooms) for benchmarks at 10x or 100x our size
+- ids are planned in the main process; the rows of each department are
+  generated by a process pool, each department with its own seeded RNG, so
+  the output does not depend on the number of workers
+- names are sampled from pre-built Faker pools instead of calling Faker per row
+- each table is written with executemany() in large chunks, or through
+  LOAD DATA LOCAL INFILE from a temporary CSV (--load-data)
+- foreign key and unique checks are disabled for the session during the load
+- existing data is truncated first, so a run always resets the database;
+  schedule version ids keep counting (see reset_tables)
+
+Usage:
+    python -m scripts.populate_db [--seed 42] [--scale 10] [--workers 8] [--load-data]
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 from scripts.helpers import create_connection
 from scripts.hardcoded import (
     departments,
@@ -15,292 +47,366 @@ from scripts.hardcoded import (
 from faker import Faker
 
 import random
-import mysql
-
-
-def insert_departments(conn, cur):
-
-    print(f"Inserting {len(departments)} depts...")
-    for dept in departments:
-        try:
-            cur.execute("INSERT INTO departements (nom) VALUES (%s)", (dept,))
-        except mysql.connector.Error as e:
-            print(f"Error inserting department {dept}: {e}")
-
-    conn.commit()
-    print("Done.")
-
-
-def insert_specialites(conn, cur):
-    print("Inserting specialites...")
-    for dept_name, levels in formations.items():
-        try:
-            cur.execute("SELECT id FROM departements WHERE nom = %s", (dept_name,))
-            row = cur.fetchone()
-            if not row:
-                print(f"Department '{dept_name}' not found.")
-                continue
-            dept_id = row[0]
-        except mysql.connector.Error as e:
-            print(f"Error retrieving department '{dept_name}': {e}")
-            continue
-
-        for cycle, specialite_list in levels.items():
-            for specialite_name in specialite_list:
-                try:
-                    cur.execute(
-                        "INSERT INTO specialites (nom, cycle, dept_id) VALUES (%s, %s, %s)",
-                        (specialite_name, cycle, dept_id),
-                    )
-                except mysql.connector.Error as e:
-                    print(f"Error inserting specialite '{
-                          specialite_name}': {e}")
-
-    conn.commit()
-    print("Done.")
-
-
-def insert_formations(conn, cur):
-    print("Inserting formations...")
+import mysql.connector
+
+CHUNK_SIZE = 10_000
+NAME_POOL_SIZE = 2_000
+
+DEFAULT_SEED = 42
+
+# Per faculty (multiplied by --scale)
+TOTAL_STUDENTS = 13000
+GROUP_SIZE_TARGET = 30
+MODULES_PER_FORMATION = 6
+
+# Weights for popularity
+POPULARITY_WEIGHTS = {"high": 3.0, "medium": 1.5, "low": 0.8}
+
+# Child tables first, so they can be emptied in order
+TABLES = [
+    "conflits_etudiants",
+    "conflits_formations",
+    "conflits_professeurs",
+    "conflits_capacite",
+    "occupation_salles",
+    "kpi_planning",
+    "versions_planning",
+    "surveillances",
+    "examens",
+    "inscriptions",
+    "lieu_examens",
+    "professeurs",
+    "modules",
+    "etudiants",
+    "formations",
+    "specialites",
+    "departements",
+]
+
+# Schedule version ids key the caches (PDF store, ICS feeds, student index,
+# API snapshot) and the run history: emptied with DELETE, which keeps the
+# AUTO_INCREMENT counter, so a repopulated database never reuses an id
+KEEP_IDS = {"versions_planning"}
+
+
+def chunked(rows, size):
+    """Yield lists of at most `size` rows from any iterable."""
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def bulk_insert(cur, table, columns, rows, load_data=False):
+    """Write rows (any iterable of tuples) into a table, report rows/second."""
+    start = time.time()
+    count = 0
     try:
-        cur.execute("SELECT id, cycle FROM specialites")
-        specialites_list = cur.fetchall()
-    except mysql.connector.Error as e:
-        print(f"Error retrieving specialites: {e}")
-        return
-
-    for specialite_id, cycle in specialites_list:
-        semesters = 6 if cycle == "Licence" else 3
-        for semester in range(1, semesters + 1):
+        if load_data:
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".csv", newline="", encoding="utf-8", delete=False
+            ) as f:
+                writer = csv.writer(f)
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+                path = f.name
             try:
                 cur.execute(
-                    "INSERT INTO formations (specialite_id, cycle, semestre) VALUES (%s, %s, %s)",
-                    (specialite_id, cycle, semester),
+                    f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+                    "CHARACTER SET utf8mb4 "
+                    "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+                    f"LINES TERMINATED BY '\\r\\n' ({', '.join(columns)})",
+                    (path,),
                 )
-            except mysql.connector.Error as e:
-                print(f"Error inserting formation for specialite {
-                      specialite_id} S{semester}: {e}")
-
-    conn.commit()
-    print("Done.")
-
-
-def insert_modules(conn, cur):
-    print("Inserting modules...")
-    try:
-        cur.execute("""
-            SELECT f.id, s.nom, d.nom
-            FROM formations f
-            JOIN specialites s ON f.specialite_id = s.id
-            JOIN departements d ON s.dept_id = d.id
-            """)
-        formations_list = cur.fetchall()
-    except mysql.connector.Error as e:
-        print(f"Error retrieving formations: {e}")
-        return
-
-    for form_id, form_nom, dept_nom in formations_list:
-        # Create 6 modules per formation (semester)
-
-        # Determine how many common modules (1 or 2)
-        num_common = random.randint(1, 2)
-        num_specialized = 6 - num_common
-
-        # Select common modules
-        selected_common = random.sample(common_modules, num_common)
-
-        # Select specialized modules
-        dept_modules = modules.get(dept_nom, [])
-        selected_specialized = random.sample(dept_modules, num_specialized)
-
-        # Combine
-        module_names = selected_common + selected_specialized
-        random.shuffle(module_names)
-
-        for module_name in module_names:
-            try:
-                cur.execute(
-                    "INSERT INTO modules (nom, formation_id) VALUES (%s, %s)",
-                    (module_name, form_id),
-                )
-            except mysql.connector.Error as e:
-                print(f"Error inserting module '{module_name}': {e}")
-    conn.commit()
-    print("Done.")
-
-
-def insert_students(conn, cur):
-    try:
-        cur.execute("""
-            SELECT f.id, f.cycle, f.semestre, d.nom
-            FROM formations f
-            JOIN specialites s ON f.specialite_id = s.id
-            JOIN departements d ON s.dept_id = d.id
-        """)
-        formations_list = cur.fetchall()
-    except mysql.connector.Error as e:
-        print(f"Error retrieving formations: {e}")
-        return
-
-    # Constants
-    TOTAL_STUDENTS = 13000
-    GROUP_SIZE_MIN = 25
-    GROUP_SIZE_MAX = 35
-    GROUP_SIZE_TARGET = 30
-
-    # Weights for popularity
-    pop_weights = {"high": 3.0, "medium": 1.5, "low": 0.8}
-
-    def get_semester_weight(cycle, semestre):
-        # Licence
-        if cycle == "Licence":
-            if semestre in (1, 2):
-                return 1.0
-            if semestre in (3, 4):
-                return 0.6
-            if semestre in (5, 6):
-                return 0.4
-        # Master
-        elif cycle == "Master":
-            if semestre in (1, 2):
-                return 0.2
-            if semestre == 3:
-                return 0.1
-
-    # First pass: calculate total weight
-    formation_weights = {}
-    total_weight = 0
-
-    for form_id, cycle, semestre, dept_nom in formations_list:
-        pop = department_popularities.get(dept_nom)
-        p_weight = pop_weights.get(pop)
-        s_weight = get_semester_weight(cycle, semestre)
-
-        final_weight = p_weight * s_weight
-        formation_weights[form_id] = final_weight
-        total_weight += final_weight
-
-    # Second pass: allocate students with groups
-    student_count = 0
-    fake = Faker("fr_FR")
-
-    print("Inserting students with groups...")
-    for form_id, cycle, semestre, dept_nom in formations_list:
-        weight = formation_weights[form_id]
-        if total_weight > 0:
-            count = int((weight / total_weight) * TOTAL_STUDENTS)
+            finally:
+                os.remove(path)
         else:
-            count = 0
-
-        # Calculate number of groups for this formation
-        if count > 0:
-            num_groups = max(1, round(count / GROUP_SIZE_TARGET))
-            students_per_group = count // num_groups
-            remainder = count % num_groups
+            query = (
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join(['%s'] * len(columns))})"
+            )
+            for chunk in chunked(rows, CHUNK_SIZE):
+                cur.executemany(query, chunk)
+                count += len(chunk)
+    except mysql.connector.Error as e:
+        print(f"Error inserting into {table}: {e}")
+        raise
+
+    elapsed = time.time() - start
+    rate = count / elapsed if elapsed > 0 else float("inf")
+    print(f"  {table}: {count:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+    return count
+
+
+def reset_tables(cur):
+    """Empty every table.
+
+    TRUNCATE commits implicitly: a load that fails afterwards cannot be
+    rolled back, and leaves the tables empty or partly filled until the
+    next run.
+    """
+    print("Resetting tables...")
+    for table in TABLES:
+        if table in KEEP_IDS:
+            cur.execute(f"DELETE FROM {table}")
         else:
-            num_groups = 0
-            students_per_group = 0
-            remainder = 0
-
-        # Insert students with group assignments
-        current_group = 1
-        students_in_current_group = 0
-        group_target = students_per_group + (1 if current_group <= remainder else 0)
-
-        for _ in range(count):
-            student_count += 1
-            nom = fake.last_name()
-            prenom = fake.first_name()
-            try:
-                cur.execute(
-                    "INSERT INTO etudiants (nom, prenom, formation_id, groupe) VALUES (%s, %s, %s, %s)",
-                    (nom, prenom, form_id, current_group),
-                )
-            except mysql.connector.Error as e:
-                print(f"Error inserting student: {e}")
+            cur.execute(f"TRUNCATE TABLE {table}")
 
-            students_in_current_group += 1
-
-            # Move to next group if current group is full
-            if students_in_current_group >= group_target and current_group < num_groups:
-                current_group += 1
-                students_in_current_group = 0
-                group_target = students_per_group + (
-                    1 if current_group <= remainder else 0
-                )
-
-    print(f"Total students inserted: {student_count}")
-    conn.commit()
-
-
-def insert_professors(conn, cur):
-    try:
-        cur.execute("SELECT id, nom FROM departements")
-        departments_list = cur.fetchall()
-    except mysql.connector.Error as e:
-        print(f"Error retrieving departments: {e}")
-        return
 
+def build_name_pools(seed, size=NAME_POOL_SIZE):
+    """Pre-build last/first name pools so Faker is not called per row."""
     fake = Faker("fr_FR")
-    prof_count = 0
-
-    print("Inserting professors...")
-    for dept_id, dept_nom in departments_list:
-        profs_for_dept = professors_per_department.get(dept_nom, 50)
-        for _ in range(profs_for_dept):
-            prof_count += 1
-            nom = fake.last_name()
-            try:
-                cur.execute(
-                    "INSERT INTO professeurs (nom, dept_id) VALUES (%s, %s)",
-                    (nom, dept_id),
-                )
-            except mysql.connector.Error as e:
-                print(f"Error inserting professor: {e}")
+    fake.seed_instance(seed)
+    last_names = [fake.last_name() for _ in range(size)]
+    first_names = [fake.first_name() for _ in range(size)]
+    return last_names, first_names
+
+
+def get_semester_weight(cycle, semestre):
+    # Licence
+    if cycle == "Licence":
+        if semestre in (1, 2):
+            return 1.0
+        if semestre in (3, 4):
+            return 0.6
+        if semestre in (5, 6):
+            return 0.4
+    # Master
+    elif cycle == "Master":
+        if semestre in (1, 2):
+            return 0.2
+        if semestre == 3:
+            return 0.1
+
+
+def plan_departments(scale):
+    """Return [(dept_id, nom, catalogue_nom)] for `scale` copies of the faculty."""
+    planned = []
+    for replica in range(1, scale + 1):
+        for dept in departments:
+            nom = dept if replica == 1 else f"{dept} {replica}"
+            planned.append((len(planned) + 1, nom, dept))
+    return planned
+
+
+def plan_specialites(planned_depts):
+    """Return specialite rows and [(id, cycle, dept_id, catalogue_nom)]."""
+    rows = []
+    specialites_list = []
+    for dept_id, _, catalogue_nom in planned_depts:
+        for cycle, specialite_list in formations[catalogue_nom].items():
+            for specialite_name in specialite_list:
+                spec_id = len(rows) + 1
+                rows.append((spec_id, specialite_name, cycle, dept_id))
+                specialites_list.append((spec_id, cycle, dept_id, catalogue_nom))
+    return rows, specialites_list
 
-    print(f"Total professors inserted: {prof_count}")
-    conn.commit()
 
+def plan_formations(specialites_list, total_students):
+    """Return formation rows and {dept_id: [(form_id, student_count)]}.
 
-def insert_exam_locations(conn, cur):
+    Students are spread over formations by department popularity and
+    semester (fewer students in later semesters and in Master).
+    """
+    rows = []
+    weighted = []
+    for specialite_id, cycle, dept_id, catalogue_nom in specialites_list:
+        semesters = 6 if cycle == "Licence" else 3
+        for semester in range(1, semesters + 1):
+            form_id = len(rows) + 1
+            rows.append((form_id, specialite_id, cycle, semester))
+            weight = (
+                POPULARITY_WEIGHTS[department_popularities[catalogue_nom]]
+                * get_semester_weight(cycle, semester)
+            )
+            weighted.append((dept_id, form_id, weight))
+
+    total_weight = sum(w for _, _, w in weighted)
+    dept_formations = {}
+    for dept_id, form_id, weight in weighted:
+        count = int((weight / total_weight) * total_students) if total_weight > 0 else 0
+        dept_formations.setdefault(dept_id, []).append((form_id, count))
+    return rows, dept_formations
+
+
+def plan_tasks(seed, planned_depts, dept_formations):
+    """One generation task per department, with its precomputed id ranges."""
+    tasks = []
+    next_student_id = 1
+    next_module_id = 1
+    next_prof_id = 1
+    for dept_id, _, catalogue_nom in planned_depts:
+        form_plan = []
+        for form_id, count in dept_formations.get(dept_id, []):
+            form_plan.append((form_id, count, next_student_id, next_module_id))
+            next_student_id += count
+            next_module_id += MODULES_PER_FORMATION
+        num_profs = professors_per_department.get(catalogue_nom, 50)
+        tasks.append((seed, dept_id, catalogue_nom, form_plan, next_prof_id, num_profs))
+        next_prof_id += num_profs
+    return tasks
+
+
+_name_pools = None
+
+
+def _init_worker(name_pools):
+    global _name_pools
+    _name_pools = name_pools
+
+
+def generate_department(task):
+    """Generate the student, module and professor rows of one department."""
+    seed, dept_id, catalogue_nom, form_plan, prof_id_start, num_profs = task
+    rng = random.Random(f"{seed}-{dept_id}")
+    last_names, first_names = _name_pools
+
+    students = []
+    module_rows = []
+    for form_id, count, student_id, module_id in form_plan:
+        # 6 modules per formation: 1 or 2 common, the rest from the department
+        num_common = rng.randint(1, 2)
+        num_specialized = MODULES_PER_FORMATION - num_common
+        module_names = rng.sample(common_modules, num_common) + rng.sample(
+            modules[catalogue_nom], num_specialized
+        )
+        rng.shuffle(module_names)
+        for offset, module_name in enumerate(module_names):
+            module_rows.append((module_id + offset, module_name, form_id))
+
+        if count == 0:
+            continue
 
-    total_capacity = 0
+        # Consecutive students fill group 1, then group 2, ...
+        num_groups = max(1, round(count / GROUP_SIZE_TARGET))
+        students_per_group = count // num_groups
+        remainder = count % num_groups
+        noms = rng.choices(last_names, k=count)
+        prenoms = rng.choices(first_names, k=count)
+        i = 0
+        for group in range(1, num_groups + 1):
+            group_size = students_per_group + (1 if group <= remainder else 0)
+            for _ in range(group_size):
+                students.append((student_id + i, noms[i], prenoms[i], form_id, group))
+                i += 1
+
+    professors = [
+        (prof_id_start + i, nom, dept_id)
+        for i, nom in enumerate(rng.choices(last_names, k=num_profs))
+    ]
+    return students, module_rows, professors
+
+
+def generate_departments(tasks, name_pools, workers):
+    """Run generate_department over all tasks, in task order."""
+    if workers <= 1:
+        _init_worker(name_pools)
+        return [generate_department(task) for task in tasks]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(name_pools,)
+    ) as pool:
+        return list(pool.map(generate_department, tasks))
+
+
+def plan_exam_locations(scale):
     locations = []
-
-    for i in range(AMPHI_COUNT):
+    for i in range(AMPHI_COUNT * scale):
         locations.append((f"Amphi {i + 1}", AMPHI_CAPACITY, "Amphi"))
-        total_capacity += AMPHI_CAPACITY
-
-    for i in range(SALLE_TD_COUNT):
+    for i in range(SALLE_TD_COUNT * scale):
         locations.append((f"Salle {i + 1}", SALLE_TD_CAPACITY, "Salle_TD"))
-        total_capacity += SALLE_TD_CAPACITY
+    return locations
 
-    print(f"Inserting {len(locations)
-                       } exam locations (Total Capacity: {total_capacity})...")
 
-    for nom, cap, type_loc in locations:
-        try:
-            cur.execute(
-                "INSERT INTO lieu_examens (nom, capacite, type) VALUES (%s, %s, %s)",
-                (nom, cap, type_loc),
-            )
-        except mysql.connector.Error as e:
-            print(f"Error inserting location {nom}: {e}")
-
-    conn.commit()
+def populate(conn, seed=DEFAULT_SEED, scale=1, workers=None, load_data=False):
+    """Reset the database and bulk-load the whole synthetic dataset."""
+    start = time.time()
+    workers = workers or os.cpu_count() or 1
 
+    print(f"Generating dataset (seed={seed}, scale={scale}, workers={workers})...")
+    planned_depts = plan_departments(scale)
+    specialite_rows, specialites_list = plan_specialites(planned_depts)
+    formation_rows, dept_formations = plan_formations(
+        specialites_list, TOTAL_STUDENTS * scale
+    )
+    tasks = plan_tasks(seed, planned_depts, dept_formations)
+    results = generate_departments(tasks, build_name_pools(seed), workers)
+    locations = plan_exam_locations(scale)
+    print(f"Generated in {time.time() - start:.2f}s")
 
-if __name__ == "__main__":
-
-    conn = create_connection()
     cur = conn.cursor()
 
-    insert_departments(conn, cur)
-    insert_specialites(conn, cur)
-    insert_formations(conn, cur)
-    insert_students(conn, cur)
-    insert_modules(conn, cur)
-    insert_professors(conn, cur)
-    insert_exam_locations(conn, cur)
+    # Keys are checked once the load is complete, not row by row
+    cur.execute("SET SESSION foreign_key_checks = 0")
+    cur.execute("SET SESSION unique_checks = 0")
+    try:
+        reset_tables(cur)
+
+        print("Inserting rows...")
+        bulk_insert(
+            cur, "departements", ("id", "nom"),
+            [(dept_id, nom) for dept_id, nom, _ in planned_depts],
+            load_data,
+        )
+        bulk_insert(
+            cur, "specialites", ("id", "nom", "cycle", "dept_id"), specialite_rows, load_data
+        )
+        bulk_insert(
+            cur, "formations", ("id", "specialite_id", "cycle", "semestre"),
+            formation_rows, load_data,
+        )
+        student_count = bulk_insert(
+            cur, "etudiants", ("id", "nom", "prenom", "formation_id", "groupe"),
+            (row for students, _, _ in results for row in students),
+            load_data,
+        )
+        bulk_insert(
+            cur, "modules", ("id", "nom", "formation_id"),
+            (row for _, module_rows, _ in results for row in module_rows),
+            load_data,
+        )
+        prof_count = bulk_insert(
+            cur, "professeurs", ("id", "nom", "dept_id"),
+            (row for _, _, professors in results for row in professors),
+            load_data,
+        )
+        bulk_insert(cur, "lieu_examens", ("nom", "capacite", "type"), locations, load_data)
+
+        conn.commit()
+    except mysql.connector.Error:
+        conn.rollback()  # only the rows inserted since the reset (see reset_tables)
+        raise
+    finally:
+        cur.execute("SET SESSION unique_checks = 1")
+        cur.execute("SET SESSION foreign_key_checks = 1")
+
+    total_capacity = sum(cap for _, cap, _ in locations)
+    print(
+        f"Total: {len(planned_depts)} depts, {len(formation_rows)} formations, "
+        f"{student_count} students, {prof_count} professors, "
+        f"{len(locations)} exam locations (Total Capacity: {total_capacity})"
+    )
+    print(f"Database populated in {time.time() - start:.2f}s")
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Populate the exam database")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="random seed")
+    parser.add_argument(
+        "--scale", type=int, default=1, help="number of copies of the faculty (default: 1)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="generator processes (default: CPU count)"
+    )
+    parser.add_argument(
+        "--load-data",
+        action="store_true",
+        help="load through LOAD DATA LOCAL INFILE instead of batched INSERTs",
+    )
+    args = parser.parse_args()
+
+    conn = create_connection(allow_local_infile=args.load_data)
+    populate(conn, seed=args.seed, scale=args.scale, workers=args.workers, load_data=args.load_data)
     conn.close()
@@ -0,0 +1,220 @@
+"""
+Static Timetable Export
+
+Writes the active schedule version as static files, to be served by any web
+server without MariaDB or Streamlit:
+
+    <out>/index.html, index.json                     version and links
+    <out>/formations.{html,json}                     formation list
+    <out>/formations/<id>.{html,json}                all groups of a formation
+    <out>/formations/<id>/groupes/<g>.{html,json}    one group
+    <out>/professeurs/<id>.{html,json}, <out>/salles/<id>.{html,json}
+
+The content is the same as the schedule API's: formations and groups come
+from the bulk loader of the PDF export (scripts/snapshot.py), so the files and
+the PDFs show the same rows. Files are
+written in parallel; a manifest of content hashes lets a re-publication skip
+unchanged files and remove the ones that no longer exist, so a small schedule
+change rewrites only the files it affects.
+
+Usage:
+    python -m scripts.publish public/ [--workers 8]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+
+from scripts.api import schedule_payloads
+from scripts.helpers import create_connection
+from scripts.snapshot import (
+    load_formation_schedules,
+    load_professor_schedules,
+    load_room_schedules,
+)
+
+MANIFEST = "manifest.json"
+
+PAGE = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 10px; text-align: left; }}
+th {{ background: #eee; }}
+</style>
+</head>
+<body>
+<p><a href="{root}index.html">Index</a></p>
+<h1>{title}</h1>
+{body}
+</body>
+</html>
+"""
+
+
+def _table(headers, rows):
+    if not rows:
+        return "<p>Aucun examen planifie.</p>"
+    head = "".join(f"<th>{escape(h)}</th>" for h in headers)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{escape(str(cell))}</td>" for cell in row) + "</tr>"
+        for row in rows
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def _links(items):
+    return "<ul>" + "".join(
+        f'<li><a href="{href}">{escape(label)}</a></li>' for href, label in items
+    ) + "</ul>"
+
+
+def _exam_rows(exams, *keys):
+    return [[exam[key] for key in keys] for exam in exams]
+
+
+def render_html(name, payload):
+    """(title, body) of the HTML page for a resource."""
+    parts = name.split("/")
+    if name == "formations":
+        return "Formations", _links((f"formations/{f['id']}.html", f["nom"]) for f in payload)
+    if name == "professeurs":
+        return "Professeurs", _links(
+            (f"professeurs/{p['id']}.html", f"{p['nom']} ({p['departement']})") for p in payload)
+    if name == "salles":
+        return "Salles", _links(
+            (f"salles/{s['id']}.html", f"{s['nom']} ({s['type']}, {s['capacite']} places)")
+            for s in payload)
+    if parts[0] == "formations" and len(parts) == 2:
+        body = []
+        for group in payload["groupes"]:
+            body.append(
+                f'<h2><a href="{payload["id"]}/groupes/{group["groupe"]}.html">'
+                f'Groupe {group["groupe"]}</a> ({group["effectif"]} etudiants)</h2>'
+            )
+            body.append(_table(["Date", "Heure", "Module", "Salle"],
+                               _exam_rows(group["examens"], "date", "heure", "module", "salle")))
+        return payload["nom"], "\n".join(body)
+    if parts[0] == "formations":
+        return (f'{payload["formation"]} - Groupe {payload["groupe"]}',
+                _table(["Date", "Heure", "Module", "Salle"],
+                       _exam_rows(payload["examens"], "date", "heure", "module", "salle")))
+    if parts[0] == "professeurs":
+        return (f'{payload["nom"]} ({payload["departement"]})',
+                _table(["Date", "Heure", "Module", "Salle", "Formation"],
+                       _exam_rows(payload["examens"], "date", "heure", "module", "salle", "formation")))
+    if parts[0] == "salles":
+        rows = [[e["date"], e["heure"], e["module"], e["formation"],
+                 ", ".join(f"G{g}" for g in e["groupes"])] for e in payload["examens"]]
+        return (f'{payload["nom"]} ({payload["type"]}, {payload["capacite"]} places)',
+                _table(["Date", "Heure", "Module", "Formation", "Groupes"], rows))
+    raise ValueError(f"No HTML page for {name}")
+
+
+def _files(name, payload):
+    """[(relative path, bytes)] of the JSON and HTML files of a resource."""
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    title, body = render_html(name, payload)
+    root = "../" * name.count("/")
+    html = PAGE.format(title=escape(title), body=body, root=root).encode()
+    return [(f"{name}.json", data), (f"{name}.html", html)]
+
+
+def _index_files(version_id, counts):
+    payload = {"version": version_id, **counts}
+    body = _links([
+        ("formations.html", f"Formations ({counts['formations']})"),
+        ("professeurs.html", f"Professeurs ({counts['professeurs']})"),
+        ("salles.html", f"Salles ({counts['salles']})"),
+    ])
+    html = PAGE.format(title=f"Examens - version {version_id}", body=body, root="")
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+    return [("index.json", data), ("index.html", html.encode())]
+
+
+def _write_if_changed(out_dir, manifest, rel_path, data):
+    """Write a file unless the manifest has the same hash. Return (path, hash, written)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(out_dir, rel_path)
+    if manifest.get(rel_path) == digest and os.path.exists(path):
+        return rel_path, digest, False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return rel_path, digest, True
+
+
+def publish(cur, out_dir, workers=None):
+    """Write the static export of the current schedule version into out_dir."""
+    start = time.time()
+    cur.execute("SELECT MAX(id) FROM versions_planning")
+    version_id = cur.fetchone()[0]
+    formations = load_formation_schedules(cur)
+    professors = load_professor_schedules(cur)
+    rooms = load_room_schedules(cur)
+    loaded = time.time() - start
+
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            old_manifest = json.load(f)
+    except FileNotFoundError:
+        old_manifest = {}
+
+    def write(item):
+        name, payload = item
+        return [_write_if_changed(out_dir, old_manifest, rel_path, data)
+                for rel_path, data in _files(name, payload)]
+
+    os.makedirs(out_dir, exist_ok=True)
+    items = (
+        (path.removeprefix("/api/"), payload)
+        for path, payload in schedule_payloads(formations, professors, rooms)
+    )
+    counts = {"formations": len(formations), "professeurs": len(professors),
+              "salles": len(rooms)}
+    results = [_write_if_changed(out_dir, old_manifest, rel_path, data)
+               for rel_path, data in _index_files(version_id, counts)]
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+        for written in pool.map(write, items):
+            results.extend(written)
+
+    manifest = {rel_path: digest for rel_path, digest, _ in results}
+    removed = 0
+    for rel_path in old_manifest.keys() - manifest.keys():
+        try:
+            os.remove(os.path.join(out_dir, rel_path))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+
+    changed = sum(1 for *_, written in results if written)
+    print(f"Version {version_id}: {len(manifest):,} files, {changed:,} written, "
+          f"{len(manifest) - changed:,} unchanged, {removed:,} removed "
+          f"(load {loaded:.2f}s, total {time.time() - start:.2f}s)")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Static HTML/JSON export of the schedule")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    conn = create_connection()
+    cur = conn.cursor()
+    publish(cur, args.output, args.workers)
+    conn.close()
@@ -0,0 +1,285 @@
+"""
+Page Queries
+
+The SQL the frontend pages issue themselves, in one place: the pages execute
+these constants and the query benchmark (scripts/benchmark.py) times the same
+text, so a query changed on a page is the query benchmarked. Queries issued
+by the shared loaders the pages call (scripts/snapshot.py, scripts/students.py,
+scripts/kpi.py, scripts/runs.py) stay next to their loader as module
+constants, and the benchmark imports them from there.
+
+Usage:
+    from scripts import queries
+    cur.execute(queries.DEPARTMENTS)
+"""
+
+# === Shared ===
+
+DEPARTMENTS = "SELECT id, nom FROM departements ORDER BY nom"
+
+# Current schedule version (None if never optimized)
+SCHEDULE_VERSION = "SELECT MAX(id) FROM versions_planning"
+
+COUNT_STUDENTS = "SELECT COUNT(*) FROM etudiants"
+COUNT_MODULES = "SELECT COUNT(*) FROM modules"
+COUNT_PROFESSORS = "SELECT COUNT(*) FROM professeurs"
+COUNT_EXAMS = "SELECT COUNT(*) FROM examens"
+
+# Conflict facts (scripts/analytics.py): Conflits summary, Optimisation checks
+STUDENT_CONFLICTS = "SELECT COALESCE(SUM(nb_etudiants), 0) FROM conflits_etudiants"
+PROFESSOR_CONFLICTS = "SELECT COUNT(*) FROM conflits_professeurs"
+CAPACITY_CONFLICTS = "SELECT COUNT(*) FROM conflits_capacite"
+
+# === Emplois du Temps ===
+
+SPECIALTIES = "SELECT id, nom, cycle FROM specialites ORDER BY nom"
+
+SPECIALTIES_OF_DEPT = "SELECT id, nom, cycle FROM specialites WHERE dept_id = %s ORDER BY nom"
+
+FORMATIONS = """
+    SELECT f.id, CONCAT(s.nom, ' ', f.cycle, ' S', f.semestre) as name
+    FROM formations f
+    JOIN specialites s ON f.specialite_id = s.id
+    ORDER BY s.nom, f.cycle, f.semestre
+"""
+
+FORMATIONS_OF_DEPT = """
+    SELECT f.id, CONCAT(s.nom, ' ', f.cycle, ' S', f.semestre) as name
+    FROM formations f
+    JOIN specialites s ON f.specialite_id = s.id
+    WHERE s.dept_id = %s
+    ORDER BY s.nom, f.cycle, f.semestre
+"""
+
+FORMATIONS_OF_SPECIALTY = """
+    SELECT f.id, CONCAT(s.nom, ' ', f.cycle, ' S', f.semestre) as name
+    FROM formations f
+    JOIN specialites s ON f.specialite_id = s.id
+    WHERE f.specialite_id = %s
+    ORDER BY f.semestre
+"""
+
+FORMATION_SUMMARY = """
+    SELECT
+        d.nom as departement,
+        CONCAT(s.nom, ' ', f.cycle, ' S', f.semestre) as formation,
+        COUNT(DISTINCT m.id) as modules,
+        COUNT(DISTINCT ex.id) as examens,
+        COUNT(DISTINCT e.id) as etudiants
+    FROM departements d
+    JOIN specialites s ON s.dept_id = d.id
+    JOIN formations f ON f.specialite_id = s.id
+    LEFT JOIN modules m ON m.formation_id = f.id
+    LEFT JOIN examens ex ON ex.module_id = m.id
+    LEFT JOIN etudiants e ON e.formation_id = f.id
+    GROUP BY d.id, d.nom, f.id, s.nom, f.cycle, f.semestre
+    ORDER BY d.nom, s.nom, f.cycle, f.semestre
+"""
+
+# === Professeurs ===
+
+PROFESSORS = """
+    SELECT p.id, p.nom, d.nom as dept,
+           (SELECT COUNT(*) FROM surveillances s WHERE s.prof_id = p.id) as sessions
+    FROM professeurs p
+    JOIN departements d ON p.dept_id = d.id
+    ORDER BY p.nom
+"""
+
+PROFESSORS_OF_DEPT = """
+    SELECT p.id, p.nom, d.nom as dept,
+           (SELECT COUNT(*) FROM surveillances s WHERE s.prof_id = p.id) as sessions
+    FROM professeurs p
+    JOIN departements d ON p.dept_id = d.id
+    WHERE p.dept_id = %s
+    ORDER BY p.nom
+"""
+
+PROFESSOR_SCHEDULE = """
+    SELECT
+        DATE_FORMAT(ex.date_heure, '%d/%m/%Y') as date,
+        DATE_FORMAT(ex.date_heure, '%H:%i') as heure,
+        m.nom as module,
+        l.nom as salle,
+        CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre) as formation
+    FROM surveillances s
+    JOIN examens ex ON s.examen_id = ex.id
+    JOIN modules m ON ex.module_id = m.id
+    JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+    JOIN formations f ON m.formation_id = f.id
+    JOIN specialites sp ON f.specialite_id = sp.id
+    WHERE s.prof_id = %s
+    ORDER BY ex.date_heure
+"""
+
+# Days on which a professor has more than 3 surveillances
+PROFESSOR_OVERLOADED_DAYS = """
+    SELECT DATE(ex.date_heure) as jour, COUNT(*) as cnt
+    FROM surveillances s
+    JOIN examens ex ON s.examen_id = ex.id
+    WHERE s.prof_id = %s
+    GROUP BY DATE(ex.date_heure)
+    HAVING COUNT(*) > 3
+"""
+
+PROFESSOR_DAILY_SESSIONS = """
+    SELECT DATE_FORMAT(ex.date_heure, '%d/%m/%Y') as jour, COUNT(*) as sessions
+    FROM surveillances s
+    JOIN examens ex ON s.examen_id = ex.id
+    WHERE s.prof_id = %s
+    GROUP BY DATE(ex.date_heure)
+    ORDER BY DATE(ex.date_heure)
+"""
+
+PROFESSOR_SUMMARY = """
+    SELECT
+        d.nom as departement,
+        COUNT(p.id) as professeurs,
+        SUM(COALESCE(surv.cnt, 0)) as total_sessions,
+        AVG(COALESCE(surv.cnt, 0)) as moy_sessions
+    FROM departements d
+    LEFT JOIN professeurs p ON p.dept_id = d.id
+    LEFT JOIN (
+        SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id
+    ) surv ON surv.prof_id = p.id
+    GROUP BY d.id, d.nom
+    ORDER BY d.nom
+"""
+
+SESSION_DISTRIBUTION = """
+    SELECT cnt as sessions, COUNT(*) as professeurs
+    FROM (
+        SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id
+    ) t
+    GROUP BY cnt
+    ORDER BY cnt
+"""
+
+# === Salles (frontend/utils/occupancy.py) ===
+
+OCCUPANCY_CUBE = """
+    SELECT o.lieu_examen_id, l.nom, o.type, l.capacite, o.jour,
+           TIME_FORMAT(o.heure, '%H:%i'), d.nom, o.modules,
+           o.places_utilisees, o.places_perdues
+    FROM occupation_salles o
+    JOIN lieu_examens l ON o.lieu_examen_id = l.id
+    JOIN departements d ON o.dept_id = d.id
+"""
+
+ROOMS = "SELECT id, nom, type, capacite FROM lieu_examens"
+
+SLOTS_PER_DAY = "SELECT creneaux_par_jour FROM versions_planning WHERE id = %s"
+
+# === Conflits ===
+
+STUDENT_CONFLICT_DETAIL = """
+    SELECT
+        d.nom as departement,
+        CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre) as formation,
+        DATE_FORMAT(c.jour, '%d/%m/%Y') as date,
+        c.nb_examens,
+        c.nb_etudiants
+    FROM conflits_etudiants c
+    JOIN departements d ON c.dept_id = d.id
+    JOIN formations f ON c.formation_id = f.id
+    JOIN specialites sp ON f.specialite_id = sp.id
+    ORDER BY c.nb_examens DESC, c.jour
+    LIMIT 100
+"""
+
+DEPT_CONFLICT_RATES = """
+    SELECT
+        d.nom as departement,
+        SUM(c.total_etudiants) as total_etudiants,
+        SUM(c.etudiants_en_conflit) as etudiants_en_conflit,
+        ROUND(SUM(c.etudiants_en_conflit) * 100.0 /
+              NULLIF(SUM(c.total_etudiants), 0), 2) as taux_conflit
+    FROM conflits_formations c
+    JOIN departements d ON c.dept_id = d.id
+    GROUP BY d.id, d.nom
+    ORDER BY taux_conflit DESC
+"""
+
+FORMATION_CONFLICTS = """
+    SELECT
+        d.nom as departement,
+        CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre) as formation,
+        c.total_etudiants,
+        c.etudiants_en_conflit as en_conflit
+    FROM conflits_formations c
+    JOIN departements d ON c.dept_id = d.id
+    JOIN formations f ON c.formation_id = f.id
+    JOIN specialites sp ON f.specialite_id = sp.id
+    WHERE c.etudiants_en_conflit > 0
+    ORDER BY en_conflit DESC
+    LIMIT 50
+"""
+
+PROFESSOR_OVERLOADS = """
+    SELECT
+        p.nom as professeur,
+        d.nom as departement,
+        DATE_FORMAT(c.jour, '%d/%m/%Y') as date,
+        c.nb_surveillances as surveillances
+    FROM conflits_professeurs c
+    JOIN professeurs p ON c.prof_id = p.id
+    JOIN departements d ON c.dept_id = d.id
+    ORDER BY surveillances DESC
+"""
+
+SESSION_BRACKETS = """
+    SELECT
+        CASE
+            WHEN cnt <= 5 THEN '1-5'
+            WHEN cnt <= 8 THEN '6-8'
+            WHEN cnt <= 10 THEN '9-10'
+            ELSE '11+'
+        END as tranche,
+        COUNT(*) as professeurs
+    FROM (
+        SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id
+    ) t
+    GROUP BY tranche
+    ORDER BY MIN(cnt)
+"""
+
+# === Optimisation ===
+
+SCHEDULED_MODULES = "SELECT COUNT(DISTINCT module_id) FROM examens"
+
+FRIDAY_EXAMS = """
+    SELECT COUNT(*) FROM examens
+    WHERE DAYOFWEEK(date_heure) = 6
+"""
+
+SESSION_SPREAD = """
+    SELECT MAX(cnt) - MIN(cnt)
+    FROM (SELECT prof_id, COUNT(*) as cnt FROM surveillances GROUP BY prof_id) t
+"""
+
+# Share of surveillances given to a professor of the exam's department
+DEPT_PRIORITY = """
+    SELECT
+        ROUND(SUM(CASE WHEN p.dept_id = d.id THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1)
+    FROM surveillances s
+    JOIN examens ex ON s.examen_id = ex.id
+    JOIN modules m ON ex.module_id = m.id
+    JOIN formations f ON m.formation_id = f.id
+    JOIN specialites sp ON f.specialite_id = sp.id
+    JOIN departements d ON sp.dept_id = d.id
+    JOIN professeurs p ON s.prof_id = p.id
+"""
+
+EXAMS_PER_DAY = """
+    SELECT DATE_FORMAT(date_heure, '%d/%m') as jour, COUNT(*) as examens
+    FROM examens
+    GROUP BY DATE(date_heure)
+    ORDER BY DATE(date_heure)
+"""
+
+EXAMS_PER_SLOT = """
+    SELECT TIME_FORMAT(TIME(date_heure), '%H:%i') as heure, COUNT(*) as examens
+    FROM examens
+    GROUP BY TIME(date_heure)
+    ORDER BY TIME(date_heure)
+"""
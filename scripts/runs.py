@@ -0,0 +1,179 @@
+"""
+Optimization Run History
+
+Every optimizer run is recorded in executions_optimisation: its parameters,
+solver mode, per-phase timings, peak memory and quality metrics (violations,
+session spread, seat fill rate). The Optimisation page charts them across
+runs and flags regressions against the best previous run on the same data.
+
+Usage:
+    python -m scripts.runs          # print the last runs and their flags
+"""
+
+import json
+import os
+import resource
+import threading
+import time
+
+from scripts.helpers import create_connection
+
+# Performance regression: slower (or bigger) than the best previous run by
+# this ratio and by at least the given margin
+TIME_RATIO = 1.5
+TIME_MIN_S = 0.5
+MEMORY_RATIO = 1.5
+# Quality regression: fill rate below the best previous run by this many points
+FILL_MIN_POINTS = 5.0
+
+RUN_COLUMNS = [
+    "id", "lance_le", "version_id", "mode", "parametres", "durees", "duree_totale",
+    "memoire_pic_mo", "conflits_etudiants", "conflits_professeurs", "conflits_capacite",
+    "sessions_min", "sessions_max", "taux_remplissage",
+]
+
+RUNS_LIMIT = 50
+
+# The last runs (LIMIT %s), shared with the query benchmark (scripts/benchmark.py)
+RUNS_SQL = f"""
+    SELECT {", ".join(RUN_COLUMNS)}
+    FROM executions_optimisation
+    ORDER BY id DESC
+    LIMIT %s
+"""
+
+
+class PhaseTimer:
+    """Wall time of consecutive phases: lap(name) closes the current phase."""
+
+    def __init__(self):
+        self.durations = {}
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.durations[name] = self.durations.get(name, 0.0) + now - self._last
+        self._last = now
+
+
+class PeakMemory:
+    """Peak resident memory (MB) while running, sampled by a background thread.
+
+    Cheaper than tracemalloc, which slows the optimizer's allocation-heavy
+    phases down by an order of magnitude.
+    """
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = self._rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+        except OSError:  # no procfs: the process high-water mark
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+        return self.peak
+
+
+def store_run(cur, version_id, mode, params, durations, peak_mb, facts, kpis):
+    """Insert one run. facts: refresh_conflict_facts() result, kpis: compute_kpis() result."""
+    cur.execute(
+        """
+        INSERT INTO executions_optimisation
+            (version_id, mode, parametres, durees, duree_totale, memoire_pic_mo,
+             conflits_etudiants, conflits_professeurs, conflits_capacite,
+             sessions_min, sessions_max, taux_remplissage)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            version_id, mode, json.dumps(params, sort_keys=True), json.dumps(durations),
+            sum(durations.values()), peak_mb,
+            facts["student_conflicts"], facts["prof_conflicts"], facts["room_conflicts"],
+            kpis["sessions"]["min"], kpis["sessions"]["max"],
+            kpis["salles"]["taux_remplissage"],
+        ),
+    )
+    return cur.lastrowid
+
+
+def load_runs(cur, limit=RUNS_LIMIT):
+    """The last runs, oldest first, as dicts (parametres and durees decoded)."""
+    cur.execute(RUNS_SQL, (limit,))
+    runs = []
+    for row in reversed(cur.fetchall()):
+        run = dict(zip(RUN_COLUMNS, row))
+        run["parametres"] = json.loads(run["parametres"])
+        run["durees"] = json.loads(run["durees"])
+        run["conflits"] = (run["conflits_etudiants"] + run["conflits_professeurs"]
+                           + run["conflits_capacite"])
+        run["ecart_sessions"] = run["sessions_max"] - run["sessions_min"]
+        runs.append(run)
+    return runs
+
+
+def flag_regressions(runs):
+    """[(metric, message)] for the last run against the best previous comparable run.
+
+    Runs are comparable when they have the same solver mode and parameters
+    (days, slots and data size): a bigger dataset is expected to be slower.
+    """
+    if len(runs) < 2:
+        return []
+    last = runs[-1]
+    previous = [run for run in runs[:-1]
+                if run["mode"] == last["mode"] and run["parametres"] == last["parametres"]]
+    if not previous:
+        return []
+
+    flags = []
+    best_time = min(run["duree_totale"] for run in previous)
+    if (last["duree_totale"] > best_time * TIME_RATIO
+            and last["duree_totale"] - best_time >= TIME_MIN_S):
+        flags.append(("Temps", f"{last['duree_totale']:.2f}s (meilleur: {best_time:.2f}s)"))
+
+    best_memory = min(run["memoire_pic_mo"] for run in previous)
+    if last["memoire_pic_mo"] > best_memory * MEMORY_RATIO:
+        flags.append(("Memoire", f"{last['memoire_pic_mo']:.1f} Mo (meilleur: {best_memory:.1f} Mo)"))
+
+    best_conflicts = min(run["conflits"] for run in previous)
+    if last["conflits"] > best_conflicts:
+        flags.append(("Conflits", f"{last['conflits']} (meilleur: {best_conflicts})"))
+
+    best_spread = min(run["ecart_sessions"] for run in previous)
+    if last["ecart_sessions"] > best_spread:
+        flags.append(("Ecart sessions", f"{last['ecart_sessions']} (meilleur: {best_spread})"))
+
+    best_fill = max(run["taux_remplissage"] for run in previous)
+    if last["taux_remplissage"] < best_fill - FILL_MIN_POINTS:
+        flags.append(("Remplissage",
+                      f"{last['taux_remplissage']:.1f}% (meilleur: {best_fill:.1f}%)"))
+    return flags
+
+
+if __name__ == "__main__":
+    conn = create_connection()
+    runs = load_runs(conn.cursor())
+    conn.close()
+
+    print(f"{'Run':>5} {'Date':<17} {'Mode':<10} {'Temps':>8} {'Memoire':>9} "
+          f"{'Conflits':>9} {'Ecart':>6} {'Remplissage':>12}")
+    for run in runs:
+        print(f"{run['id']:>5} {run['lance_le']:%d/%m/%Y %H:%M} {run['mode']:<10} "
+              f"{run['duree_totale']:7.2f}s {run['memoire_pic_mo']:7.1f}Mo "
+              f"{run['conflits']:9} {run['ecart_sessions']:6} {run['taux_remplissage']:11.1f}%")
+    for metric, message in flag_regressions(runs):
+        print(f"REGRESSION {metric}: {message}")
@@ -0,0 +1,227 @@
+"""
+Schedule Snapshot
+
+Bulk reads of the published schedule: a couple of queries fetch what the
+per-formation pages used to fetch with several queries per formation. The
+exporters (PDF, ...) all go through this path.
+"""
+
+from collections import defaultdict
+
+# The loaders' queries, shared with the query benchmark (scripts/benchmark.py).
+# {where}: empty, or the filter on the requested ids
+FORMATION_EXAMS_SQL = """
+    SELECT f.id, CONCAT(s.nom, ' ', f.cycle, ' S', f.semestre),
+           m.nom, ex.groupes, l.nom,
+           DATE_FORMAT(ex.date_heure, '%d/%m/%Y'),
+           DATE_FORMAT(ex.date_heure, '%H:%i')
+    FROM formations f
+    JOIN specialites s ON f.specialite_id = s.id
+    JOIN modules m ON m.formation_id = f.id
+    LEFT JOIN examens ex ON ex.module_id = m.id
+    LEFT JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+    {where}
+    ORDER BY f.id, m.nom, ex.groupes
+"""
+
+FORMATION_GROUPS_SQL = """
+    SELECT formation_id, groupe, COUNT(*)
+    FROM etudiants
+    {where}
+    GROUP BY formation_id, groupe
+    ORDER BY formation_id, groupe
+"""
+
+PROFESSORS_SQL = """
+    SELECT p.id, p.nom, d.id, d.nom
+    FROM professeurs p
+    JOIN departements d ON p.dept_id = d.id
+    {where}
+    ORDER BY p.id
+"""
+
+SURVEILLANCES_SQL = """
+    SELECT
+        s.prof_id,
+        DATE_FORMAT(ex.date_heure, '%d/%m/%Y'),
+        DATE_FORMAT(ex.date_heure, '%H:%i'),
+        m.nom,
+        l.nom,
+        CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre)
+    FROM surveillances s
+    JOIN examens ex ON s.examen_id = ex.id
+    JOIN modules m ON ex.module_id = m.id
+    JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+    JOIN formations f ON m.formation_id = f.id
+    JOIN specialites sp ON f.specialite_id = sp.id
+    {where}
+    ORDER BY s.prof_id, ex.date_heure
+"""
+
+ROOMS_SQL = "SELECT id, nom, type, capacite FROM lieu_examens ORDER BY id"
+
+ROOM_EXAMS_SQL = """
+    SELECT
+        ex.lieu_examen_id,
+        DATE_FORMAT(ex.date_heure, '%d/%m/%Y'),
+        DATE_FORMAT(ex.date_heure, '%H:%i'),
+        m.nom,
+        CONCAT(sp.nom, ' ', f.cycle, ' S', f.semestre),
+        ex.groupes
+    FROM examens ex
+    JOIN modules m ON ex.module_id = m.id
+    JOIN formations f ON ex.formation_id = f.id
+    JOIN specialites sp ON f.specialite_id = sp.id
+    ORDER BY ex.lieu_examen_id, ex.date_heure
+"""
+
+
+def exam_order(exam):
+    """Sort key of an exam dict ({date: dd/mm/yyyy, heure, module, ...}): by date and time."""
+    date = exam["date"]
+    return date[6:], date[3:5], date[:2], exam["heure"], exam["module"]
+
+
+class FormationSchedule:
+    """Everything needed to render one formation's timetable."""
+
+    __slots__ = ("formation_id", "name", "modules", "groups", "exams")
+
+    def __init__(self, formation_id, name):
+        self.formation_id = formation_id
+        self.name = name
+        self.modules = []  # module names, sorted
+        self.groups = []  # [(groupe, effectif)], sorted by groupe
+        self.exams = []  # [(module, groupes, salle, date, heure)], date dd/mm/yyyy
+
+    def pivot(self):
+        """Rows of the group x module grid: [["G1", "Salle\\ndate heure", ...], ...]."""
+        cells = {groupe: {module: "-" for module in self.modules} for groupe, _ in self.groups}
+        for module, groupes, salle, date, heure in self.exams:
+            if not groupes:
+                continue
+            # groupes can be "1" or "1,2" etc.
+            for g in groupes.split(","):
+                g = int(g.strip())
+                if g in cells:
+                    # dd/mm: the grid has no room for the year
+                    cells[g][module] = f"{salle}\n{date[:5]} {heure}"
+        return [
+            [f"G{groupe}"] + [cells[groupe][module] for module in self.modules]
+            for groupe in sorted(cells)
+        ]
+
+    def group_exams(self, groupe):
+        """Exams of one group, by date: [{date, heure, module, salle}].
+
+        The same rows as the grid, for the schedule API and the static export.
+        """
+        exams = [
+            {"date": date, "heure": heure, "module": module, "salle": salle}
+            for module, groupes, salle, date, heure in self.exams
+            if groupes and groupe in (int(g) for g in groupes.split(","))
+        ]
+        exams.sort(key=exam_order)
+        return exams
+
+
+class ProfessorSchedule:
+    """A professor's surveillances."""
+
+    __slots__ = ("prof_id", "name", "dept_id", "dept_name", "rows")
+
+    def __init__(self, prof_id, name, dept_id, dept_name):
+        self.prof_id = prof_id
+        self.name = name
+        self.dept_id = dept_id
+        self.dept_name = dept_name
+        self.rows = []  # [(date, heure, module, salle, formation)], by date
+
+
+class RoomSchedule:
+    """The exams held in one room."""
+
+    __slots__ = ("room_id", "name", "type", "capacity", "rows")
+
+    def __init__(self, room_id, name, type, capacity):
+        self.room_id = room_id
+        self.name = name
+        self.type = type
+        self.capacity = capacity
+        self.rows = []  # [(date, heure, module, formation, groupes)], by date
+
+
+def load_formation_schedules(cur, formation_ids=None):
+    """Return {formation_id: FormationSchedule} for all (or the given) formations."""
+    where_f = where_e = ""
+    params = ()
+    if formation_ids is not None:
+        formation_ids = list(formation_ids)
+        if not formation_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(formation_ids))
+        where_f = f"WHERE f.id IN ({placeholders})"
+        where_e = f"WHERE formation_id IN ({placeholders})"
+        params = tuple(formation_ids)
+
+    cur.execute(FORMATION_EXAMS_SQL.format(where=where_f), params)
+    schedules = {}
+    module_names = defaultdict(set)
+    for form_id, name, module, groupes, salle, date, heure in cur.fetchall():
+        schedule = schedules.get(form_id)
+        if schedule is None:
+            schedule = schedules[form_id] = FormationSchedule(form_id, name)
+        module_names[form_id].add(module)
+        if groupes is not None:
+            schedule.exams.append((module, groupes, salle, date, heure))
+
+    cur.execute(FORMATION_GROUPS_SQL.format(where=where_e), params)
+    for form_id, groupe, count in cur.fetchall():
+        if form_id in schedules:
+            schedules[form_id].groups.append((groupe, count))
+
+    for form_id, schedule in schedules.items():
+        schedule.modules = sorted(module_names[form_id])
+    return schedules
+
+
+def load_professor_schedules(cur, prof_ids=None):
+    """Return {prof_id: ProfessorSchedule} for all (or the given) professors."""
+    where_p = where_s = ""
+    params = ()
+    if prof_ids is not None:
+        prof_ids = list(prof_ids)
+        if not prof_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(prof_ids))
+        where_p = f"WHERE p.id IN ({placeholders})"
+        where_s = f"WHERE s.prof_id IN ({placeholders})"
+        params = tuple(prof_ids)
+
+    cur.execute(PROFESSORS_SQL.format(where=where_p), params)
+    schedules = {
+        prof_id: ProfessorSchedule(prof_id, name, dept_id, dept_name)
+        for prof_id, name, dept_id, dept_name in cur.fetchall()
+    }
+
+    # All surveillances in one joined query, grouped in memory
+    cur.execute(SURVEILLANCES_SQL.format(where=where_s), params)
+    for prof_id, *row in cur.fetchall():
+        if prof_id in schedules:
+            schedules[prof_id].rows.append(tuple(row))
+    return schedules
+
+
+def load_room_schedules(cur):
+    """Return {room_id: RoomSchedule} for all exam locations."""
+    cur.execute(ROOMS_SQL)
+    schedules = {
+        room_id: RoomSchedule(room_id, name, type, capacity)
+        for room_id, name, type, capacity in cur.fetchall()
+    }
+
+    cur.execute(ROOM_EXAMS_SQL)
+    for room_id, *row in cur.fetchall():
+        if room_id in schedules:
+            schedules[room_id].rows.append(tuple(row))
+    return schedules
@@ -0,0 +1,755 @@
+"""
+Scheduling Phases
+
+The optimizer's phases as functions over a Problem (plain dicts and lists
+derived from the loaded ScheduleModel), shared by the optimizer, the
+resource planner and the department decomposition:
+
+1. build_conflicts: modules sharing students
+2. assign_slots: day coloring, least loaded slot first
+   (assign_slots_by_formation: the same without a graph, when enrollment
+   is purely formation-based; schedule_days picks one)
+   common_sittings optionally synchronizes the common modules: each
+   sitting is one node of the coloring and shares its rooms and proctors
+3. assign_rooms: rooms per slot, by group
+4. assign_proctors: proctors per exam, same department first
+"""
+
+from collections import defaultdict
+
+from scripts.enrollment import Enrollment
+from scripts.loader import ROOM_TYPES
+
+# Common-module synchronization: modules with the same common name sit
+# together across the formations of a department (same cycle), or of a cycle
+SYNC_SCOPES = ("departement", "cycle")
+# Largest sitting, as a share of the seats of one slot
+MAX_SITTING_SHARE = 0.5
+
+
+class Problem:
+    """Solver inputs derived from a ScheduleModel.
+
+    The phases only read these; a what-if scenario is a copy with other
+    professors or locations (scripts/planner.py), a department subproblem a
+    copy restricted to its modules, rooms and professors (scripts/decompose.py).
+    """
+
+    __slots__ = (
+        "modules", "module_ids", "modules_by_formation",
+        "formation_groups", "formation_headcount",
+        "professors", "prof_ids", "locations", "retakes", "module_retakers",
+        "sittings",
+    )
+
+    def __init__(self, model):
+        # common: index in hardcoded.common_modules (-1: specific to the formation)
+        self.modules = {
+            m: {"formation_id": f, "dept_id": d, "common": c, "cycle": cycle}
+            for m, f, d, c, cycle in zip(
+                model.module_ids.tolist(),
+                model.module_formation.tolist(),
+                model.module_dept.tolist(),
+                model.module_common.tolist(),
+                model.module_cycle.tolist(),
+            )
+        }
+        self.module_ids = list(self.modules.keys())
+
+        # Students take all modules of their formation, so the optimizer only
+        # needs per-group headcounts, not one record per student
+        self.modules_by_formation = defaultdict(list)
+        for module_id, data in self.modules.items():
+            self.modules_by_formation[data["formation_id"]].append(module_id)
+
+        # formation_id -> {groupe: student count}
+        self.formation_groups = model.formation_group_sizes()
+        self.formation_headcount = {f: sum(g.values()) for f, g in self.formation_groups.items()}
+
+        # Professors with their departments
+        self.professors = {
+            p: {"dept_id": d}
+            for p, d in zip(model.prof_ids.tolist(), model.prof_dept.tolist())
+        }
+        self.prof_ids = list(self.professors.keys())
+
+        # Exam locations (largest first)
+        self.locations = [
+            (room_id, capacity, ROOM_TYPES[room_type])
+            for room_id, capacity, room_type in zip(
+                model.room_ids.tolist(),
+                model.room_capacity.tolist(),
+                model.room_type.tolist(),
+            )
+        ]
+
+        # Explicit enrollment outside the student's formation (retakes);
+        # empty: every student takes exactly their formation's modules
+        self.retakes = Enrollment(model)
+        self.module_retakers = self.retakes.retakers_per_module()
+
+        # Synchronized common modules (common_sittings): module_id -> modules of
+        # its sitting, the first one leading; empty: every module sits alone
+        self.sittings = {}
+
+
+def build_conflicts(problem):
+    """Phase 1: module -> set of modules sharing at least one student."""
+    # Two modules conflict if they share at least one student
+    # For day-level conflicts (students can't have 2 exams same day)
+    # All students of a formation share the same modules: one clique each
+    conflicts = defaultdict(set)
+    for formation_id in problem.formation_headcount:
+        mods_list = problem.modules_by_formation[formation_id]
+        for i in range(len(mods_list)):
+            for j in range(i + 1, len(mods_list)):
+                conflicts[mods_list[i]].add(mods_list[j])
+                conflicts[mods_list[j]].add(mods_list[i])
+
+    # Retakers link modules across formations
+    if problem.retakes:
+        module_a, module_b, _ = problem.retakes.conflict_pairs()
+        for a, b in zip(module_a.tolist(), module_b.tolist()):
+            conflicts[a].add(b)
+            conflicts[b].add(a)
+    return conflicts
+
+
+def common_sittings(problem, scope, conflicts=None):
+    """Sittings of the common modules: {module_id: (lead, other members...)}.
+
+    Modules with the same hardcoded.common_modules name and cycle, within
+    a department (scope "departement") or across departments ("cycle"),
+    sit together in one slot. A sitting never holds two modules of one
+    formation or sharing a student (conflicts, with retakes), nor more than
+    MAX_SITTING_SHARE of the seats of a slot: the rest opens another one.
+    """
+    candidates = defaultdict(list)
+    for module_id in problem.module_ids:
+        data = problem.modules[module_id]
+        if data["common"] < 0 or not problem.formation_headcount.get(data["formation_id"]):
+            continue
+        key = (data["common"], data["cycle"])
+        if scope == "departement":
+            key += (data["dept_id"],)
+        candidates[key].append(module_id)
+    return pack_sittings(problem, candidates.values(), conflicts)
+
+
+def pack_sittings(problem, candidates, conflicts=None):
+    """Sittings from lists of modules that may sit together, first fit within each list.
+
+    Also re-packs existing sittings for a problem with fewer rooms (a
+    department subproblem): {module_id: (lead, other members...)}.
+    """
+    seats = sum(cap for _, cap, _ in problem.locations) * MAX_SITTING_SHARE
+    sittings = {}
+    for module_ids in candidates:
+        chunks = []  # [members, formations, students], first fit
+        for module_id in module_ids:
+            formation_id = problem.modules[module_id]["formation_id"]
+            students = sum(size for _, size in module_groups(problem, module_id))
+            for chunk in chunks:
+                members, formations, seated = chunk
+                if (formation_id not in formations and seated + students <= seats
+                        and not (conflicts and conflicts[module_id].intersection(members))):
+                    break
+            else:
+                chunk = [[], set(), 0]
+                chunks.append(chunk)
+            chunk[0].append(module_id)
+            chunk[1].add(formation_id)
+            chunk[2] += students
+        for members, _, _ in chunks:
+            if len(members) > 1:
+                for module_id in members:
+                    sittings[module_id] = tuple(members)
+    return sittings
+
+
+def sitting_graph(problem, conflicts):
+    """(module_ids, conflicts) with each sitting contracted into its lead module."""
+    if not problem.sittings:
+        return problem.module_ids, conflicts
+    lead = {m: members[0] for m, members in problem.sittings.items()}
+    graph = defaultdict(set)
+    for module_id, others in conflicts.items():
+        node = lead.get(module_id, module_id)
+        graph[node].update(lead.get(m, m) for m in others)
+        graph[node].discard(node)
+    return [m for m in problem.module_ids if lead.get(m, m) == m], graph
+
+
+def assign_slots(module_ids, conflicts, num_days, slots_per_day, scorer=None, rooms=None,
+                 sittings=None):
+    """Phase 2: greedy day coloring, least loaded slot first.
+
+    scorer (optional, scripts/objectives.py) breaks ties between equally
+    loaded slots by the soft objectives, and records the placements.
+    rooms (optional SlotRooms) restricts each module to the conflict-free
+    slots where its rooms are still free, then to those where it can be
+    seated with substitution, and ignores capacity only when neither exists.
+    sittings (optional, Problem.sittings): module_ids and conflicts are
+    those of sitting_graph, and each lead places its whole sitting.
+    Return (module_day, module_slot, chromatic number estimate).
+    """
+    # First, calculate minimum days needed (chromatic number estimate)
+    sorted_modules = sorted(module_ids, key=lambda m: len(conflicts[m]), reverse=True)
+    temp_colors = {}
+    for module_id in sorted_modules:
+        used = {temp_colors[m] for m in conflicts[module_id] if m in temp_colors}
+        c = 0
+        while c in used:
+            c += 1
+        temp_colors[module_id] = c
+    num_colors_needed = max(temp_colors.values()) + 1 if temp_colors else 0
+
+    # We need to assign modules to (day, slot) pairs
+    # Constraint: modules sharing students must be on DIFFERENT DAYS
+    # This is graph coloring where colors = days (not slots)
+
+    module_day = {}  # module_id -> day index (0 to NUM_DAYS-1)
+    module_slot = {}  # module_id -> slot index (0 to SLOTS_PER_DAY-1)
+
+    # Track slots used per day for load balancing
+    day_slot_counts = defaultdict(lambda: defaultdict(int))
+
+    for module_id in sorted_modules:
+        members = sittings.get(module_id, (module_id,)) if sittings else (module_id,)
+
+        def cost(day):
+            return sum(scorer.cost(m, day) for m in members)
+
+        # Find days that don't conflict with already-assigned modules
+        used_days = {module_day[m] for m in conflicts[module_id] if m in module_day}
+
+        # Try to find a valid day (prefer days with fewer exams for balance)
+        best_day = None
+        best_slot = None
+        # With rooms: preferred room types first, then substitution, then anything
+        for max_level in ((0, 1, 2) if rooms else (2,)):
+            min_load = float("inf")
+            best_cost = 0
+
+            for day in range(num_days):
+                if day in used_days:
+                    continue
+                # Find the least loaded slot on this day
+                for slot in range(slots_per_day):
+                    if max_level < 2 and rooms.fit(module_id, day, slot)[0] > max_level:
+                        continue
+                    load = day_slot_counts[day][slot]
+                    if load < min_load:
+                        min_load = load
+                        best_day = day
+                        best_slot = slot
+                        best_cost = cost(day) if scorer else 0
+                    elif scorer and load == min_load and day != best_day:
+                        day_cost = cost(day)
+                        if day_cost < best_cost:
+                            best_day, best_slot, best_cost = day, slot, day_cost
+            if best_day is not None:
+                break
+
+        if best_day is None:
+            # No conflict-free day available - find day with minimum conflict
+            # This means some students will have >1 exam per day (constraint violation)
+            conflict_counts = defaultdict(int)
+            for day in range(num_days):
+                for m in conflicts[module_id]:
+                    if m in module_day and module_day[m] == day:
+                        conflict_counts[day] += 1
+
+            best_day = min(range(num_days), key=lambda d: conflict_counts[d])
+            best_slot = min(
+                range(slots_per_day), key=lambda s: day_slot_counts[best_day][s]
+            )
+
+        for m in members:
+            module_day[m] = best_day
+            module_slot[m] = best_slot
+            if scorer:
+                scorer.place(m, best_day)
+        day_slot_counts[best_day][best_slot] += len(members)
+        if rooms:
+            rooms.take(module_id, best_day, best_slot)
+
+    return module_day, module_slot, num_colors_needed
+
+
+def is_formation_based(problem):
+    """True when the conflict graph is one disjoint clique per formation."""
+    return not problem.retakes and not problem.sittings
+
+
+def assign_slots_by_formation(problem, num_days, slots_per_day, scorer=None, rooms=None):
+    """Phase 2 for formation-based enrollment, without building the conflict graph.
+
+    Each formation is a clique of its modules: they need distinct days, and
+    the chromatic number is the size of the largest formation. Formations,
+    largest first, take the days whose least loaded slot is lightest, one
+    module per day, each in the least loaded slot of its day. With more
+    modules than days the days are reused round-robin (violations, as with
+    the greedy coloring). With a scorer or rooms, each module takes the
+    free day whose best slot fits its rooms best (SlotRooms level), is the
+    least loaded and, among those, has the lowest soft cost.
+    Return (module_day, module_slot, days needed).
+    """
+    slot_load = [[0] * slots_per_day for _ in range(num_days)]
+    module_day = {}
+    module_slot = {}
+    cliques = sorted(problem.modules_by_formation.values(), key=len, reverse=True)
+    for modules in cliques:
+        days = sorted(range(num_days), key=lambda d: min(slot_load[d]))
+        free = list(days)
+        for i, module_id in enumerate(modules):
+            day = days[i % num_days]
+            slot = None
+            if (scorer or rooms) and free:
+                options = [
+                    (d, *(rooms.best_slot(module_id, d, slot_load[d]) if rooms
+                          else (0, slot_load[d].index(min(slot_load[d])))))
+                    for d in free
+                ]
+                day, _, slot = min(options, key=lambda o: (
+                    o[1], slot_load[o[0]][o[2]], scorer.cost(module_id, o[0]) if scorer else 0
+                ))
+                free.remove(day)
+            loads = slot_load[day]
+            if slot is None:
+                slot = loads.index(min(loads))
+            module_day[module_id] = day
+            module_slot[module_id] = slot
+            loads[slot] += 1
+            if scorer:
+                scorer.place(module_id, day)
+            if rooms:
+                rooms.take(module_id, day, slot)
+    return module_day, module_slot, len(cliques[0]) if cliques else 0
+
+
+def schedule_days(problem, num_days, slots_per_day, scorer=None, rooms=None):
+    """Phases 1-2: the formation fast path when it applies, else the graph coloring."""
+    if is_formation_based(problem):
+        return assign_slots_by_formation(problem, num_days, slots_per_day, scorer, rooms)
+    module_ids, conflicts = sitting_graph(problem, build_conflicts(problem))
+    return assign_slots(module_ids, conflicts, num_days, slots_per_day, scorer, rooms,
+                        problem.sittings)
+
+
+def count_student_violations(problem, module_day):
+    """Student-days with more than one exam."""
+    # Retakers are checked one by one (vectorized); the others by formation
+    retakers = problem.retakes.retakers_per_formation() if problem.retakes else {}
+    student_violations = problem.retakes.student_day_violations(module_day) if problem.retakes else 0
+    for formation_id, headcount in problem.formation_headcount.items():
+        headcount -= retakers.get(formation_id, 0)
+        day_counts = defaultdict(int)
+        for m in problem.modules_by_formation[formation_id]:
+            day_counts[module_day[m]] += 1
+        for day, count in day_counts.items():
+            if count > 1:
+                student_violations += (count - 1) * headcount
+    return student_violations
+
+
+def module_groups(problem, module_id):
+    """Groups of a module, largest first: [((formation_id, groupe), size)].
+
+    Students retaking the module form an extra group 0 of its formation.
+    """
+    formation_id = problem.modules[module_id]["formation_id"]
+    groups = problem.formation_groups.get(formation_id, {})
+    pending = [((formation_id, groupe), count) for groupe, count in groups.items()]
+    if module_id in problem.module_retakers:
+        pending.append(((formation_id, 0), problem.module_retakers[module_id]))
+    return sorted(pending, key=lambda x: x[1], reverse=True)
+
+
+def sitting_groups(problem, module_id):
+    """Groups of a module's whole sitting, largest first (module_groups when it sits alone)."""
+    members = problem.sittings.get(module_id, (module_id,))
+    return sorted((group for m in members for group in module_groups(problem, m)),
+                  key=lambda x: x[1], reverse=True)
+
+
+def _room_entries(room_id, rtype, group_keys):
+    """One (room_id, room_type, formation_id, "group_str") entry per formation in a room."""
+    by_formation = defaultdict(list)
+    for formation_id, groupe in group_keys:
+        by_formation[formation_id].append(groupe)
+    return [
+        (room_id, rtype, formation_id, ",".join(str(g) for g in sorted(groupes)))
+        for formation_id, groupes in by_formation.items()
+    ]
+
+
+def place_groups(pending_groups, available_amphis, available_salles, mix=False):
+    """Seat one module's groups in the available rooms of its slot (popped from the lists).
+
+    mix: groups of different formations (a sitting) may share a room.
+    Return (assigned rooms, [(group_key, students left without a seat)]).
+    """
+    pending_groups = list(pending_groups)
+    assigned_rooms = []
+    unplaced = []
+
+    # Assign groups to rooms
+    while pending_groups:
+        group_key, size = pending_groups.pop(0)
+        formation_id, groupe_num = group_key
+
+        if size > 20:
+            # Large group needs Amphi (60 capacity)
+            if available_amphis:
+                room_id, cap, rtype = available_amphis.pop(0)
+                remaining_cap = cap - size
+                if remaining_cap < 0:
+                    unplaced.append((group_key, -remaining_cap))
+                groups_in_room = [group_key]
+
+                # Try to add more groups from SAME formation (any, mixed) to fill amphi
+                i = 0
+                while i < len(pending_groups) and remaining_cap >= 10:
+                    pg_key, pg_size = pending_groups[i]
+                    if (mix or pg_key[0] == formation_id) and pg_size <= remaining_cap:
+                        groups_in_room.append(pg_key)
+                        remaining_cap -= pg_size
+                        pending_groups.pop(i)
+                    else:
+                        i += 1
+
+                assigned_rooms.extend(_room_entries(room_id, rtype, groups_in_room))
+            elif available_salles:
+                # Fallback: use multiple salles for large group
+                needed = size
+                group_str = str(groupe_num)
+                while needed > 0 and available_salles:
+                    room_id, cap, rtype = available_salles.pop(0)
+                    assigned_rooms.append((room_id, rtype, formation_id, group_str))
+                    needed -= cap
+                if needed > 0:
+                    unplaced.append((group_key, needed))
+            else:
+                unplaced.append((group_key, size))
+        else:
+            # Small group can use Salle_TD (20 capacity)
+            if available_salles:
+                room_id, cap, rtype = available_salles.pop(0)
+                remaining_cap = cap - size
+                groups_in_room = [group_key]
+
+                # Try to combine with another small group from SAME formation (any, mixed)
+                i = 0
+                while i < len(pending_groups) and remaining_cap >= 5:
+                    pg_key, pg_size = pending_groups[i]
+                    if (mix or pg_key[0] == formation_id) and pg_size <= remaining_cap:
+                        groups_in_room.append(pg_key)
+                        remaining_cap -= pg_size
+                        pending_groups.pop(i)
+                    else:
+                        i += 1
+
+                assigned_rooms.extend(_room_entries(room_id, rtype, groups_in_room))
+            elif available_amphis:
+                # Fallback: use amphi for small group
+                room_id, cap, rtype = available_amphis.pop(0)
+                assigned_rooms.append((room_id, rtype, formation_id, str(groupe_num)))
+            else:
+                unplaced.append((group_key, size))
+
+    return assigned_rooms, unplaced
+
+
+class SlotRooms:
+    """Rooms left per (day, slot) during Phase 2, against each module's room demand.
+
+    A module's demand is the (amphis, salles TD) that place_groups gives it
+    when its slot has rooms to spare, split from its amphi-sized and TD-sized
+    groups (a sitting's lead: the whole sitting, packed across formations).
+    Each placement is ranked by fit level:
+    0: the demand fits, Phase 3 seats the module in the preferred room types
+    1: only with substitution (large groups over several salles, small
+       groups in amphis), everyone still seated
+    2: some students would have no seat
+    """
+
+    def __init__(self, problem):
+        self.amphis = [loc for loc in problem.locations if loc[2] == "Amphi"]
+        self.salles = [loc for loc in problem.locations if loc[2] == "Salle_TD"]
+        self.capacity = (len(self.amphis), len(self.salles))
+        self._memo = {}
+        self.groups = {}
+        self.demand = {}
+        self.unseatable = []  # modules place_groups cannot seat even in an empty slot
+        self.mixed = set(problem.sittings)
+        for module_id in problem.module_ids:
+            self.groups[module_id] = sitting_groups(problem, module_id)
+            self.demand[module_id], seated = self._usage(module_id, *self.capacity)
+            if not seated:
+                self.unseatable.append(module_id)
+        self.left = {}  # (day, slot) -> [amphis, salles] left
+        self.used = {}  # module_id -> (amphis, salles) taken
+
+    @staticmethod
+    def _count(rooms):
+        rooms = {(room_id, rtype) for room_id, rtype, _, _ in rooms}  # shared rooms once
+        amphis = sum(rtype == "Amphi" for _, rtype in rooms)
+        return amphis, len(rooms) - amphis
+
+    def _usage(self, module_id, amphis_left, salles_left):
+        """((amphis, salles) taken, everyone seated) with that many rooms left.
+
+        The largest rooms go first, so the rooms left are the smallest ones.
+        """
+        key = (module_id, amphis_left, salles_left)
+        if key not in self._memo:
+            rooms, unseated = place_groups(
+                self.groups[module_id],
+                self.amphis[len(self.amphis) - amphis_left:],
+                self.salles[len(self.salles) - salles_left:],
+                mix=module_id in self.mixed,
+            )
+            self._memo[key] = (self._count(rooms), not unseated)
+        return self._memo[key]
+
+    def fit(self, module_id, day, slot):
+        """(fit level, (amphis, salles) the module would take) in a slot."""
+        amphis_left, salles_left = self.left.get((day, slot), self.capacity)
+        need_amphis, need_salles = self.demand[module_id]
+        if need_amphis <= amphis_left and need_salles <= salles_left:
+            return 0, self.demand[module_id]
+        usage, seated = self._usage(module_id, max(amphis_left, 0), max(salles_left, 0))
+        return (1, usage) if seated else (2, self.demand[module_id])
+
+    def best_slot(self, module_id, day, loads):
+        """(fit level, slot): the best fitting, then least loaded slot of a day."""
+        return min(((self.fit(module_id, day, s)[0], s) for s in range(len(loads))),
+                   key=lambda option: (option[0], loads[option[1]]))
+
+    def take(self, module_id, day, slot):
+        usage = self.used[module_id] = self.fit(module_id, day, slot)[1]
+        left = self.left.setdefault((day, slot), list(self.capacity))
+        left[0] -= usage[0]
+        left[1] -= usage[1]
+
+    def overbooked(self):
+        """Slots whose modules need more rooms of a type than exist."""
+        return sum(1 for amphis, salles in self.left.values() if amphis < 0 or salles < 0)
+
+
+def assign_rooms(problem, module_day, module_slot, unplaced=None):
+    """Phase 3: rooms per (day, slot), by group.
+
+    Return {module_id: [(room_id, room_type, formation_id, "group_str"), ...]}.
+    unplaced (optional dict) receives {module_id: [(group_key, students left)]}.
+    """
+    # Group by (day, slot)
+    slot_modules = defaultdict(list)
+    for module_id in problem.module_ids:
+        day = module_day[module_id]
+        slot = module_slot[module_id]
+        slot_modules[(day, slot)].append(module_id)
+
+    # module_rooms[module_id] = [(room_id, room_type, formation_id, "group_str"), ...]
+    module_rooms = {}
+
+    # Separate rooms by type for easier assignment
+    amphitheaters = [(r[0], r[1], r[2]) for r in problem.locations if r[2] == "Amphi"]
+    salles_td = [(r[0], r[1], r[2]) for r in problem.locations if r[2] == "Salle_TD"]
+
+    for (day, slot), mods in slot_modules.items():
+        # Track available rooms for this slot
+        available_amphis = list(amphitheaters)
+        available_salles = list(salles_td)
+
+        for module_id in mods:
+            members = problem.sittings.get(module_id)
+            if members is None:
+                module_rooms[module_id], left = place_groups(
+                    module_groups(problem, module_id), available_amphis, available_salles
+                )
+                if left and unplaced is not None:
+                    unplaced[module_id] = left
+            elif module_id == members[0]:
+                # The lead seats its whole sitting; rooms go back to each formation's module
+                rooms, left = place_groups(
+                    sitting_groups(problem, module_id), available_amphis, available_salles,
+                    mix=True,
+                )
+                member_of = {problem.modules[m]["formation_id"]: m for m in members}
+                for m in members:
+                    module_rooms[m] = []
+                for room in rooms:
+                    module_rooms[member_of[room[2]]].append(room)
+                if unplaced is not None:
+                    for group_key, count in left:
+                        unplaced.setdefault(member_of[group_key[0]], []).append((group_key, count))
+
+    return module_rooms
+
+
+def unseated_students(problem, module_rooms):
+    """Students without a seat: rooms are filled group by group, as in the KPIs.
+
+    A room shared by the modules of a sitting holds its capacity once: the
+    members fill it in module order.
+    """
+    capacity = {room_id: cap for room_id, cap, _ in problem.locations}
+    seats_left = {}  # (sitting lead or module, room_id) -> seats not taken yet
+    unseated = 0
+    for module_id in problem.module_ids:
+        lead = problem.sittings.get(module_id, (module_id,))[0]
+        remaining = {groupe: size for (_, groupe), size in module_groups(problem, module_id)}
+        for room_id, _, _, group_str in module_rooms.get(module_id, []):
+            left = seats_left.get((lead, room_id), capacity[room_id])
+            for g in (int(g) for g in group_str.split(",")):
+                take = min(left, remaining.get(g, 0))
+                remaining[g] = remaining.get(g, 0) - take
+                left -= take
+            seats_left[(lead, room_id)] = left
+        unseated += sum(remaining.values())
+    return unseated
+
+
+def proctors_for_room(room_type):
+    # Salle_TD (20 seats): 1 proctor
+    # Amphi (60 seats): 3 proctors (1 per 20 students)
+    return 3 if room_type == "Amphi" else 1
+
+
+def proctors_needed(module_rooms, sittings=None):
+    """{module_id: proctors its rooms need}.
+
+    A room shared by the modules of a sitting is proctored once, by the
+    lowest module id seated in it.
+    """
+    sittings = sittings or {}
+    owner = {}  # (sitting lead, room_id) -> module proctoring the room
+    for module_id, rooms in module_rooms.items():
+        if module_id in sittings:
+            for room_id, _, _, _ in rooms:
+                key = (sittings[module_id][0], room_id)
+                owner[key] = min(owner.get(key, module_id), module_id)
+    needed = {}
+    for module_id, rooms in module_rooms.items():
+        lead = sittings.get(module_id, (None,))[0]
+        needed[module_id] = sum(
+            proctors_for_room(rtype) for room_id, rtype, _, _ in rooms
+            if owner.get((lead, room_id), module_id) == module_id
+        )
+    return needed
+
+
+def sessions_needed(module_rooms, sittings=None):
+    """Total proctoring sessions the room assignment needs."""
+    return sum(proctors_needed(module_rooms, sittings).values())
+
+
+def session_caps(total_sessions, prof_ids):
+    """(sessions per professor, extra): the professors in the set extra, the
+    first (total_sessions % professors) of prof_ids, may take one more.
+
+    Positional, not by id value: the ids need not be 1..N (planner scenarios,
+    department parts).
+    """
+    prof_ids = sorted(prof_ids)
+    per_prof, extra = divmod(total_sessions, len(prof_ids))
+    return per_prof, frozenset(prof_ids[:extra])
+
+
+def assign_proctors(problem, module_day, module_slot, module_rooms, caps=None, scorer=None):
+    """Phase 4: proctors per module, same department first, max 3 per day.
+
+    A professor proctors at most one exam per (day, slot).
+    caps: session_caps() of the whole schedule when problem is only a part
+    of it (default: this problem's own).
+    scorer (optional): among equally loaded professors, prefer those already
+    proctoring in another slot of that day (compacite), and record the sessions.
+    Return ({module_id: [prof_id, ...]}, {prof_id: sessions}).
+    """
+    prof_ids = problem.prof_ids
+    needed = proctors_needed(module_rooms, problem.sittings)
+    if caps is None:
+        caps = session_caps(sum(needed.values()), prof_ids)
+    sessions_per_prof, extra_sessions = caps
+
+    # Build department to professors mapping
+    dept_profs = defaultdict(list)
+    for prof_id, prof_data in problem.professors.items():
+        dept_profs[prof_data["dept_id"]].append(prof_id)
+
+    # Track professor assignments
+    prof_sessions = defaultdict(int)  # prof_id -> count
+    prof_day_count = defaultdict(lambda: defaultdict(int))  # prof_id -> day -> count
+    busy = set()  # (prof_id, day, slot) already proctored
+
+    exam_proctors = {}  # module_id -> list of prof_ids
+
+    # Sort modules: prioritize by department to help with department priority constraint
+    # Group modules by department
+    dept_modules = defaultdict(list)
+    for module_id, data in problem.modules.items():
+        dept_modules[data["dept_id"]].append(module_id)
+
+    # Process each module
+    for module_id in problem.module_ids:
+        day = module_day[module_id]
+        slot = module_slot[module_id]
+        # Proctors needed based on room types (a sitting's shared rooms once)
+        num_proctors_needed = needed[module_id]
+        dept_id = problem.modules[module_id]["dept_id"]
+
+        assigned_proctors = []
+
+        # Eligible professors are free in this slot, so the day they already
+        # proctor (compacite) is always another slot of it
+        def load_key(prof_id):
+            if scorer:
+                return prof_sessions[prof_id], scorer.proctor_cost(prof_id, day)
+            return prof_sessions[prof_id]
+
+        # Get eligible professors (free in the slot, not at max for the day or sessions)
+        def is_eligible(prof_id):
+            max_sessions = sessions_per_prof + (1 if prof_id in extra_sessions else 0)
+            return (
+                prof_day_count[prof_id][day] < 3
+                and prof_sessions[prof_id] < max_sessions
+                and (prof_id, day, slot) not in busy
+                and prof_id not in assigned_proctors
+            )
+
+        # First, try same-department professors
+        same_dept_profs = [p for p in dept_profs[dept_id] if is_eligible(p)]
+        # Sort by current load (least loaded first)
+        same_dept_profs.sort(key=load_key)
+
+        for prof_id in same_dept_profs:
+            if len(assigned_proctors) >= num_proctors_needed:
+                break
+            assigned_proctors.append(prof_id)
+            prof_sessions[prof_id] += 1
+            prof_day_count[prof_id][day] += 1
+            busy.add((prof_id, day, slot))
+
+        # If still need more, use other department professors
+        if len(assigned_proctors) < num_proctors_needed:
+            other_profs = [
+                p for p in prof_ids if p not in dept_profs[dept_id] and is_eligible(p)
+            ]
+            other_profs.sort(key=load_key)
+
+            for prof_id in other_profs:
+                if len(assigned_proctors) >= num_proctors_needed:
+                    break
+                assigned_proctors.append(prof_id)
+                prof_sessions[prof_id] += 1
+                prof_day_count[prof_id][day] += 1
+                busy.add((prof_id, day, slot))
+
+        exam_proctors[module_id] = assigned_proctors
+        if scorer:
+            for prof_id in assigned_proctors:
+                scorer.add_proctor(prof_id, day)
+
+    return exam_proctors, prof_sessions
@@ -0,0 +1,263 @@
+"""
+Student Schedule Lookup
+
+In-memory index from a student id or name prefix to the student's formation,
+group and exams (module, room, date, time). It is built from a few bulk
+queries and rebuilt only when the schedule version changes, so a lookup is a
+dict access or a bisect, never a join.
+
+Students with retakes (inscriptions table) sit them as group 0 of the
+retaken module's formation; seat_retakers resolves that group to the room
+of each retaker, and their schedule adds those exams to their group's.
+
+Usage:
+    python -m scripts.students 1234
+    python -m scripts.students "ben"
+"""
+
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from scripts import queries
+from scripts.helpers import create_connection
+from scripts.snapshot import exam_order
+
+MAX_RESULTS = 20
+
+# The index's queries, shared with the query benchmark (scripts/benchmark.py)
+RETAKERS_SQL = """
+    SELECT i.module_id, i.etudiant_id
+    FROM inscriptions i
+    JOIN etudiants e ON i.etudiant_id = e.id
+    JOIN modules m ON i.module_id = m.id
+    WHERE m.formation_id <> e.formation_id
+    ORDER BY i.module_id, i.etudiant_id
+"""
+
+GROUP_SIZES_SQL = "SELECT formation_id, groupe, COUNT(*) FROM etudiants GROUP BY formation_id, groupe"
+
+EXAM_ROOMS_SQL = """
+    SELECT ex.id, ex.module_id, ex.formation_id, ex.groupes, l.capacite
+    FROM examens ex
+    JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+    ORDER BY ex.id
+"""
+
+FORMATION_NAMES_SQL = """
+    SELECT f.id, CONCAT(s.nom, ' ', f.cycle, ' S', f.semestre)
+    FROM formations f
+    JOIN specialites s ON f.specialite_id = s.id
+"""
+
+GROUP_EXAMS_SQL = """
+    SELECT ex.id, ex.formation_id, ex.groupes,
+           DATE_FORMAT(ex.date_heure, '%d/%m/%Y'),
+           DATE_FORMAT(ex.date_heure, '%H:%i'),
+           m.nom, l.nom
+    FROM examens ex
+    JOIN modules m ON ex.module_id = m.id
+    JOIN lieu_examens l ON ex.lieu_examen_id = l.id
+    ORDER BY ex.date_heure, m.nom
+"""
+
+STUDENTS_SQL = "SELECT id, nom, prenom, formation_id, groupe FROM etudiants"
+
+
+def normalize_name(text):
+    """Case- and accent-insensitive key for name prefix search."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c)).strip()
+
+
+class StudentIndex:
+    """Students, their group's exams and a sorted name index."""
+
+    __slots__ = ("version_id", "formations", "students", "exams", "retakes", "_keys", "_ids")
+
+    def __init__(self, version_id):
+        self.version_id = version_id
+        self.formations = {}  # formation_id -> name
+        self.students = {}  # student_id -> (nom, prenom, formation_id, groupe)
+        self.exams = {}  # (formation_id, groupe) -> [{date, heure, module, salle}]
+        self.retakes = {}  # student_id -> [{date, heure, module, salle}] of their retakes
+        self._keys = []  # sorted normalized "nom prenom" / "prenom nom"
+        self._ids = []  # student id of each key
+
+    def index_names(self):
+        """(Re)build the sorted name keys from self.students."""
+        keys = []
+        for student_id, (nom, prenom, _, _) in self.students.items():
+            keys.append((normalize_name(f"{nom} {prenom}"), student_id))
+            keys.append((normalize_name(f"{prenom} {nom}"), student_id))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._ids = [student_id for _, student_id in keys]
+
+    def schedule(self, student_id):
+        """The student's formation, group and exams, or None if unknown."""
+        student = self.students.get(student_id)
+        if student is None:
+            return None
+        nom, prenom, formation_id, groupe = student
+        exams = self.exams.get((formation_id, groupe), [])
+        retakes = self.retakes.get(student_id, [])
+        if retakes:
+            exams = sorted(exams + retakes, key=exam_order)
+        return {
+            "id": student_id,
+            "nom": nom,
+            "prenom": prenom,
+            "formation_id": formation_id,
+            "formation": self.formations.get(formation_id, ""),
+            "groupe": groupe,
+            "examens": exams,
+            "rattrapages": len(retakes),
+        }
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Student ids matching an id or a name prefix (either name order)."""
+        query = query.strip()
+        if query.isdigit():
+            student_id = int(query)
+            return [student_id] if student_id in self.students else []
+        prefix = normalize_name(query)
+        if not prefix:
+            return []
+        found = []
+        i = bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix) and len(found) < limit:
+            if self._ids[i] not in found:
+                found.append(self._ids[i])
+            i += 1
+        return found
+
+    def lookup(self, query, limit=MAX_RESULTS):
+        """Schedules of the students matching an id or a name prefix."""
+        return [self.schedule(student_id) for student_id in self.search(query, limit)]
+
+
+def seat_retakers(cur):
+    """Return {student_id: [examen_id, ...]}: the room of each of their retakes.
+
+    The retakers of a module are its group 0, possibly split over several
+    rooms; they fill those rooms by student id, in the order the occupancy
+    cube seats the groups (scripts/analytics.py). Retakers the rooms cannot
+    hold (a capacity conflict) are listed in the module's last room.
+    """
+    cur.execute(RETAKERS_SQL)
+    module_students = defaultdict(list)
+    for module_id, student_id in cur.fetchall():
+        module_students[module_id].append(student_id)
+    if not module_students:
+        return {}
+
+    cur.execute(GROUP_SIZES_SQL)
+    group_sizes = {(form_id, groupe): count for form_id, groupe, count in cur.fetchall()}
+    cur.execute(EXAM_ROOMS_SQL)
+    remaining = {}
+    module_rooms = defaultdict(list)  # module_id -> [(examen_id, retakers seated)]
+    for exam_id, module_id, form_id, groupes, capacity in cur.fetchall():
+        if module_id not in module_students:
+            continue
+        seated = 0
+        for g in (groupes or "").split(","):
+            if not g.strip():
+                continue
+            g = int(g)
+            key = (module_id, g)
+            size = len(module_students[module_id]) if g == 0 else group_sizes.get((form_id, g), 0)
+            left = remaining.get(key, size)
+            take = min(left, capacity - seated)
+            remaining[key] = left - take
+            seated += take
+            if g == 0:
+                module_rooms[module_id].append((exam_id, take))
+
+    seats = defaultdict(list)
+    for module_id, rooms in module_rooms.items():
+        students = module_students[module_id]
+        start = 0
+        for exam_id, take in rooms:
+            for student_id in students[start:start + take]:
+                seats[student_id].append(exam_id)
+            start += take
+        for student_id in students[start:]:
+            seats[student_id].append(rooms[-1][0])
+    return seats
+
+
+def build_student_index(cur, version_id=None):
+    """Build the StudentIndex with bulk queries."""
+    index = StudentIndex(version_id)
+
+    cur.execute(FORMATION_NAMES_SQL)
+    index.formations = dict(cur.fetchall())
+
+    # Exams are shared by every student of a group: one list per (formation, group).
+    # Group 0 (retakers) is resolved per student below
+    cur.execute(GROUP_EXAMS_SQL)
+    retake_exams = {}
+    for exam_id, formation_id, groupes, date, heure, module, salle in cur.fetchall():
+        if not groupes:
+            continue
+        exam = {"date": date, "heure": heure, "module": module, "salle": salle}
+        for g in groupes.split(","):
+            if int(g) == 0:
+                retake_exams[exam_id] = exam
+            else:
+                index.exams.setdefault((formation_id, int(g)), []).append(exam)
+
+    if retake_exams:
+        for student_id, exam_ids in seat_retakers(cur).items():
+            index.retakes[student_id] = [retake_exams[e] for e in exam_ids]
+
+    cur.execute(STUDENTS_SQL)
+    for student_id, *student in cur.fetchall():
+        index.students[student_id] = tuple(student)
+    index.index_names()
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_student_index(cur):
+    """Return the index of the current schedule version, rebuilding it on change."""
+    global _index
+    cur.execute(queries.SCHEDULE_VERSION)
+    version_id = cur.fetchone()[0]
+    index = _index
+    if index is not None and index.version_id == version_id:
+        return index
+    with _index_lock:
+        if _index is None or _index.version_id != version_id:
+            _index = build_student_index(cur, version_id)
+        return _index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python -m scripts.students <id | name prefix>")
+        sys.exit(1)
+
+    conn = create_connection()
+    cur = conn.cursor()
+    start = time.time()
+    index = get_student_index(cur)
+    print(f"Index of {len(index.students):,} students built in {time.time() - start:.2f}s")
+    conn.close()
+
+    start = time.perf_counter()
+    results = index.lookup(sys.argv[1])
+    elapsed = time.perf_counter() - start
+    for student in results:
+        print(f"\n{student['id']} {student['nom']} {student['prenom']} - "
+              f"{student['formation']} G{student['groupe']}")
+        for exam in student["examens"]:
+            print(f"  {exam['date']} {exam['heure']}  {exam['module']}  ({exam['salle']})")
+    print(f"\n{len(results)} result(s) in {elapsed * 1e6:.0f} us")
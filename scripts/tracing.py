@@ -0,0 +1,275 @@
+"""
+SQL Tracing
+
+Records every statement run through the shared connection helpers while a
+trace is active (one Streamlit page render, one optimizer run):
+- normalized text (literals replaced by ?, IN lists collapsed)
+- parameters fingerprint, to tell identical re-runs from N+1 loops
+- duration (execute + fetches) and rows returned or affected
+- caller: the current phase (page section, optimizer phase) and call site
+
+Tracing is off by default; a connection is only wrapped when a trace is
+active in the current thread, so untraced code pays nothing.
+
+    trace = tracing.start("optimize")      # or SQL_TRACE=1 for the optimizer
+    tracing.phase("Phase 6: write")
+    ...
+    print(tracing.format_summary(trace.summary()))
+    trace.dump("trace.json")
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+TOP_N = 10
+# A shape run this many times with different parameters is an N+1 candidate
+N_PLUS_ONE_MIN = 5
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Statement shape: literals become ?, IN lists collapse, whitespace is squeezed."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+def fingerprint(params):
+    if not params:
+        return None
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+
+def _call_site():
+    """file:line of the first frame outside this module."""
+    frame = sys._getframe(2)
+    while frame and frame.f_code.co_filename == __file__:
+        frame = frame.f_back
+    if frame is None:
+        return "?"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno}"
+
+
+class QueryTrace:
+    """Statements recorded during one page render or optimizer run."""
+
+    def __init__(self, name):
+        self.name = name
+        self.phase = name
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.records = []
+
+    def record(self, sql, params):
+        entry = {
+            "sql": normalize_sql(sql),
+            "params": fingerprint(params),
+            "ms": 0.0,
+            "rows": 0,
+            "caller": self.phase,
+            "site": _call_site(),
+        }
+        self.records.append(entry)
+        return entry
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self, top=TOP_N, n_plus_one_min=N_PLUS_ONE_MIN):
+        """Query count, DB time, slowest statements, per-caller totals, N+1 suspects."""
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self.started
+        shapes = defaultdict(lambda: {"count": 0, "ms": 0.0, "rows": 0, "params": set(),
+                                      "sites": set()})
+        callers = defaultdict(lambda: {"count": 0, "ms": 0.0})
+        for entry in self.records:
+            shape = shapes[entry["sql"]]
+            shape["count"] += 1
+            shape["ms"] += entry["ms"]
+            shape["rows"] += entry["rows"]
+            shape["params"].add(entry["params"])
+            shape["sites"].add(entry["site"])
+            caller = callers[entry["caller"]]
+            caller["count"] += 1
+            caller["ms"] += entry["ms"]
+
+        def shape_row(sql, shape):
+            return {"sql": sql, "count": shape["count"], "ms": round(shape["ms"], 3),
+                    "rows": shape["rows"], "sites": sorted(shape["sites"])}
+
+        slowest = sorted(self.records, key=lambda entry: entry["ms"], reverse=True)[:top]
+        n_plus_one = [
+            shape_row(sql, shape) for sql, shape in shapes.items()
+            if shape["count"] >= n_plus_one_min and len(shape["params"]) > 1
+        ]
+        n_plus_one.sort(key=lambda row: row["count"], reverse=True)
+
+        db_ms = sum(entry["ms"] for entry in self.records)
+        return {
+            "name": self.name,
+            "queries": len(self.records),
+            "db_ms": round(db_ms, 3),
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "shapes": len(shapes),
+            "slowest": [dict(entry, ms=round(entry["ms"], 3)) for entry in slowest],
+            "by_shape": sorted((shape_row(sql, shape) for sql, shape in shapes.items()),
+                               key=lambda row: row["ms"], reverse=True)[:top],
+            "by_caller": [
+                {"caller": name, "count": caller["count"], "ms": round(caller["ms"], 3)}
+                for name, caller in sorted(callers.items(), key=lambda item: -item[1]["ms"])
+            ],
+            "n_plus_one": n_plus_one,
+        }
+
+    def to_json(self, top=TOP_N):
+        """The summary and every recorded statement, as JSON."""
+        return json.dumps({"summary": self.summary(top), "statements": self.records}, indent=1)
+
+    def dump(self, path, top=TOP_N):
+        with open(path, "w") as f:
+            f.write(self.to_json(top))
+
+
+class TracingCursor:
+    """Cursor proxy that records each statement into a QueryTrace."""
+
+    def __init__(self, cursor, trace):
+        self._cursor = cursor
+        self._trace = trace
+        self._entry = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def _run(self, method, sql, params, fingerprinted):
+        entry = self._entry = self._trace.record(sql, fingerprinted)
+        start = time.perf_counter()
+        try:
+            return method(sql, params)
+        finally:
+            entry["ms"] += (time.perf_counter() - start) * 1000
+            if not self._cursor.description:  # DML: rows affected
+                entry["rows"] = max(self._cursor.rowcount, 0)
+
+    def execute(self, sql, params=None):
+        return self._run(self._cursor.execute, sql, params, params)
+
+    def executemany(self, sql, seq_params):
+        # One record per batch; hashing every row would cost more than the insert
+        seq_params = list(seq_params)
+        return self._run(self._cursor.executemany, sql, seq_params, ("batch", len(seq_params)))
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = method(*args)
+        if self._entry is not None:
+            self._entry["ms"] += (time.perf_counter() - start) * 1000
+            if isinstance(result, list):
+                self._entry["rows"] += len(result)
+            elif result is not None:
+                self._entry["rows"] += 1
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+
+class TracingConnection:
+    """Connection proxy whose cursors are TracingCursors."""
+
+    def __init__(self, conn, trace):
+        self._conn = conn
+        self._trace = trace
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TracingCursor(self._conn.cursor(*args, **kwargs), self._trace)
+
+
+def start(name):
+    """Start a trace for the current thread and return it."""
+    trace = _local.trace = QueryTrace(name)
+    return trace
+
+
+def stop():
+    """End the current thread's trace and return it (None if none was active)."""
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    if trace is not None:
+        trace.finish()
+    return trace
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+def phase(name):
+    """Attribute the following statements to a phase (page section, optimizer step)."""
+    trace = current()
+    if trace is not None:
+        trace.phase = name
+
+
+def wrap(conn):
+    """Trace a connection if a trace is active in this thread, else return it as is."""
+    trace = current()
+    if trace is None or isinstance(conn, TracingConnection):
+        return conn
+    return TracingConnection(conn, trace)
+
+
+def format_summary(summary):
+    """Plain text report of a summary, for the console."""
+    lines = [
+        f"SQL trace '{summary['name']}': {summary['queries']} queries, "
+        f"{summary['shapes']} shapes, {summary['db_ms']:.1f} ms in the database "
+        f"({summary['elapsed_ms']:.1f} ms total)",
+        "By caller:",
+    ]
+    lines += [f"  {row['ms']:10.1f} ms {row['count']:7} x  {row['caller']}"
+              for row in summary["by_caller"]]
+    lines.append("Slowest statements:")
+    lines += [f"  {row['ms']:10.1f} ms {row['rows']:9,} rows  {row['site']}  {row['sql'][:90]}"
+              for row in summary["slowest"]]
+    if summary["n_plus_one"]:
+        lines.append("Repeated shapes (N+1 suspects):")
+        lines += [f"  {row['count']:7} x {row['ms']:10.1f} ms  {', '.join(row['sites'])}  "
+                  f"{row['sql'][:80]}" for row in summary["n_plus_one"]]
+    return "\n".join(lines)
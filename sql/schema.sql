@@ -68,6 +68,17 @@ CREATE TABLE professeurs (
     FOREIGN KEY (dept_id) REFERENCES departements(id)
 );
 
+-- Optional explicit enrollment: modules retaken outside the student's formation
+-- (scripts/enrollment.py). Empty: students take exactly their formation's modules.
+CREATE TABLE inscriptions (
+    etudiant_id INT NOT NULL,
+    module_id INT NOT NULL,
+    PRIMARY KEY (etudiant_id, module_id),
+    INDEX (module_id),
+    FOREIGN KEY (etudiant_id) REFERENCES etudiants(id),
+    FOREIGN KEY (module_id) REFERENCES modules(id)
+);
+
 CREATE TABLE examens (
     id INT AUTO_INCREMENT PRIMARY KEY,
     module_id INT,
@@ -87,3 +98,116 @@ CREATE TABLE surveillances (
     FOREIGN KEY (examen_id) REFERENCES examens(id),
     FOREIGN KEY (prof_id) REFERENCES professeurs(id)
 );
+
+-- Precomputed conflict facts (rebuilt by scripts/analytics.py after each optimization)
+
+CREATE TABLE conflits_etudiants (
+    dept_id INT NOT NULL,
+    formation_id INT NOT NULL,
+    jour DATE NOT NULL,
+    nb_examens TINYINT UNSIGNED NOT NULL,
+    nb_etudiants INT NOT NULL,
+    PRIMARY KEY (formation_id, jour),
+    INDEX (dept_id, jour)
+);
+
+CREATE TABLE conflits_formations (
+    formation_id INT PRIMARY KEY,
+    dept_id INT NOT NULL,
+    total_etudiants INT NOT NULL,
+    etudiants_en_conflit INT NOT NULL,
+    INDEX (dept_id)
+);
+
+CREATE TABLE conflits_professeurs (
+    prof_id INT NOT NULL,
+    dept_id INT NOT NULL,
+    jour DATE NOT NULL,
+    nb_surveillances INT NOT NULL,
+    PRIMARY KEY (prof_id, jour),
+    INDEX (dept_id, jour)
+);
+
+CREATE TABLE conflits_capacite (
+    module_id INT PRIMARY KEY,
+    formation_id INT NOT NULL,
+    dept_id INT NOT NULL,
+    inscrits INT NOT NULL,
+    capacite INT NOT NULL,
+    INDEX (dept_id)
+);
+
+-- Schedule versions: one row per optimization run that wrote a schedule
+
+CREATE TABLE versions_planning (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    cree_le DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    nb_jours INT NOT NULL,
+    creneaux_par_jour TINYINT UNSIGNED NOT NULL
+);
+
+-- Dashboard KPIs of a schedule version (JSON, written by the optimizer)
+CREATE TABLE kpi_planning (
+    version_id INT PRIMARY KEY,
+    donnees LONGTEXT NOT NULL,
+    FOREIGN KEY (version_id) REFERENCES versions_planning(id)
+);
+
+-- Room occupancy cube for the current schedule version (one row per used room and slot)
+
+CREATE TABLE occupation_salles (
+    lieu_examen_id INT NOT NULL,
+    type ENUM('Salle_TD', 'Amphi') NOT NULL,
+    jour DATE NOT NULL,
+    heure TIME NOT NULL,
+    dept_id INT NOT NULL,
+    places_utilisees INT NOT NULL,
+    places_perdues INT NOT NULL,
+    modules TEXT NOT NULL,  -- Module names examined in the cell, comma-separated
+    PRIMARY KEY (lieu_examen_id, jour, heure, dept_id),
+    INDEX (jour, heure),
+    INDEX (type)
+);
+
+-- Query benchmark history (python -m scripts.benchmark, Dashboard)
+
+CREATE TABLE executions_benchmark (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    lance_le DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    version_id INT,
+    repetitions INT NOT NULL
+);
+
+CREATE TABLE resultats_benchmark (
+    execution_id INT NOT NULL,
+    page VARCHAR(50) NOT NULL,
+    requete VARCHAR(100) NOT NULL,
+    p50_ms DOUBLE NOT NULL,
+    p95_ms DOUBLE NOT NULL,
+    p99_ms DOUBLE NOT NULL,
+    moyenne_ms DOUBLE NOT NULL,
+    lignes_examinees BIGINT NOT NULL,
+    lignes_retournees INT NOT NULL,
+    plan LONGTEXT NOT NULL,
+    PRIMARY KEY (execution_id, requete),
+    FOREIGN KEY (execution_id) REFERENCES executions_benchmark(id)
+);
+
+-- Optimization run history (one row per optimizer run, kept across repopulations)
+
+CREATE TABLE executions_optimisation (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    lance_le DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    version_id INT,
+    mode VARCHAR(30) NOT NULL,
+    parametres TEXT NOT NULL,
+    durees TEXT NOT NULL,
+    duree_totale DOUBLE NOT NULL,
+    memoire_pic_mo DOUBLE NOT NULL,
+    conflits_etudiants INT NOT NULL,
+    conflits_professeurs INT NOT NULL,
+    conflits_capacite INT NOT NULL,
+    sessions_min INT NOT NULL,
+    sessions_max INT NOT NULL,
+    taux_remplissage DOUBLE NOT NULL
+);
@@ -0,0 +1,60 @@
+"""Synthetic ScheduleModels for the solver, planner and API checks (no database)."""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from scripts.loader import ROOM_TYPES, ScheduleModel  # noqa: E402
+
+
+def synthetic_model(formations=8, depts=4, modules=6, groups=3, group_size=30,
+                    profs_per_dept=20, amphis=6, salles=12, retakes=()):
+    """A ScheduleModel with formations spread over departments round-robin.
+
+    Professors are numbered department by department (dept 1: 1..n, dept 2:
+    n+1..2n, ...), like a database filled one department at a time.
+    retakes: (student_id, module_id) enrollments outside the student's formation.
+    """
+    module_rows = [
+        (f * modules + k + 1, f + 1, f % depts + 1)
+        for f in range(formations) for k in range(modules)
+    ]
+    student_rows = [
+        (f * groups * group_size + g * group_size + i + 1, f + 1, g + 1)
+        for f in range(formations) for g in range(groups) for i in range(group_size)
+    ]
+    prof_rows = [(d * profs_per_dept + i + 1, d + 1)
+                 for d in range(depts) for i in range(profs_per_dept)]
+    room_rows = ([(r + 1, 60, ROOM_TYPES.index("Amphi")) for r in range(amphis)]
+                 + [(amphis + r + 1, 20, ROOM_TYPES.index("Salle_TD")) for r in range(salles)])
+    retakes = list(retakes)
+
+    def column(rows, index, dtype):
+        return np.array([row[index] for row in rows], dtype=dtype)
+
+    return ScheduleModel(
+        module_ids=column(module_rows, 0, np.int32),
+        module_formation=column(module_rows, 1, np.int32),
+        module_dept=column(module_rows, 2, np.int32),
+        module_common=np.full(len(module_rows), -1, dtype=np.int8),
+        module_cycle=np.zeros(len(module_rows), dtype=np.uint8),
+        student_ids=column(student_rows, 0, np.int32),
+        student_formation=column(student_rows, 1, np.int32),
+        student_group=column(student_rows, 2, np.uint8),
+        prof_ids=column(prof_rows, 0, np.int32),
+        prof_dept=column(prof_rows, 1, np.int32),
+        room_ids=column(room_rows, 0, np.int32),
+        room_capacity=column(room_rows, 1, np.int32),
+        room_type=column(room_rows, 2, np.uint8),
+        enroll_student=column(retakes, 0, np.int32),
+        enroll_module=column(retakes, 1, np.int32),
+    )
+
+
+@pytest.fixture
+def make_model():
+    return synthetic_model
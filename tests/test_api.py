@@ -0,0 +1,79 @@
+"""Schedule API: encodings, ETags and 304s on a live server with synthetic data."""
+
+import gzip
+import http.client
+import threading
+
+import pytest
+
+from scripts.api import ApiServer, ApiSnapshot, accepts_gzip, synthetic_schedule
+
+PATH = "/api/professeurs"  # large enough to be gzipped
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ApiServer(("127.0.0.1", 0), ApiSnapshot(7, *synthetic_schedule(500)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path=PATH, **headers):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request("GET", path, headers={k.replace("_", "-"): v for k, v in headers.items()})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_accepts_gzip_honors_qvalues():
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("br;q=1.0, gzip;q=0.5")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("")
+    assert not accepts_gzip("identity")
+    assert not accepts_gzip("gzip;q=0")
+    assert not accepts_gzip("gzip;q=0.000, *;q=1")
+    assert not accepts_gzip("*;q=0")
+
+
+def test_each_encoding_has_its_own_etag(server):
+    plain, body = get(server)
+    assert plain.status == 200 and plain.getheader("Content-Encoding") is None
+    zipped, zbody = get(server, Accept_Encoding="gzip")
+    assert zipped.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(zbody) == body
+    assert zipped.getheader("ETag") == plain.getheader("ETag")[:-1] + '-gz"'
+    assert plain.getheader("ETag").startswith('"7-')
+    assert plain.getheader("Vary") == zipped.getheader("Vary") == "Accept-Encoding"
+
+
+def test_refused_gzip_gets_the_identity_body(server):
+    response, _ = get(server, Accept_Encoding="gzip;q=0, identity")
+    assert response.getheader("Content-Encoding") is None
+    assert not response.getheader("ETag").endswith('-gz"')
+
+
+def test_matching_tag_gets_304(server):
+    etag = get(server)[0].getheader("ETag")
+    response, body = get(server, If_None_Match=f'"other", {etag}')
+    assert response.status == 304 and body == b""
+    assert response.getheader("ETag") == etag
+    assert response.getheader("Vary") == "Accept-Encoding"
+
+    gz_etag = get(server, Accept_Encoding="gzip")[0].getheader("ETag")
+    assert get(server, Accept_Encoding="gzip", If_None_Match=gz_etag)[0].status == 304
+
+
+def test_tag_of_the_other_encoding_gets_200(server):
+    etag = get(server)[0].getheader("ETag")
+    response, body = get(server, Accept_Encoding="gzip", If_None_Match=etag)
+    assert response.status == 200 and response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body)
+
+
+def test_unknown_path_gets_404(server):
+    assert get(server, "/api/professeurs/999999")[0].status == 404
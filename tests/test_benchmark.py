@@ -0,0 +1,20 @@
+"""The query benchmark times the SQL the pages execute."""
+
+from scripts import queries
+from scripts.benchmark import QUERY_CATALOG
+
+
+def test_catalog_covers_every_page_query():
+    benchmarked = {sql for _, _, sql, _ in QUERY_CATALOG}
+    page_queries = {
+        name: sql for name, sql in vars(queries).items()
+        if name.isupper() and isinstance(sql, str)
+    }
+    missing = [name for name, sql in page_queries.items() if sql not in benchmarked]
+    assert not missing
+
+
+def test_catalog_names_are_unique():
+    # Runs are compared query by query on the name (flag_regressions)
+    names = [name for _, name, _, _ in QUERY_CATALOG]
+    assert len(names) == len(set(names))
@@ -0,0 +1,39 @@
+"""Department subproblems and their reconciliation on synthetic models."""
+
+from collections import defaultdict
+
+import pytest
+
+from scripts.decompose import reconcile_rooms, subproblem
+from scripts.solver import Problem, assign_rooms
+
+
+def solve_parts(problem, rooms_per_part):
+    """Every module on day 0, slot 0; each department seated in its own rooms."""
+    module_day = {m: 0 for m in problem.module_ids}
+    module_slot = {m: 0 for m in problem.module_ids}
+    module_rooms, unplaced = {}, {}
+    for i, module_id in enumerate(problem.module_ids):
+        rooms = problem.locations[i * rooms_per_part:(i + 1) * rooms_per_part]
+        part = subproblem(problem, {problem.modules[module_id]["dept_id"]}, [module_id], rooms)
+        module_rooms.update(assign_rooms(part, module_day, module_slot, unplaced))
+    return module_day, module_slot, module_rooms, unplaced
+
+
+@pytest.mark.parametrize("amphis, seated", [(4, 2), (3, 1), (2, 0)])
+def test_reconcile_rooms_seats_leftover_groups_in_free_rooms(make_model, amphis, seated):
+    # Two formations of three groups of 30, one module each: two amphis (60 seats) apiece
+    problem = Problem(make_model(formations=2, depts=2, modules=1, amphis=amphis, salles=0))
+    module_day, module_slot, module_rooms, unplaced = solve_parts(problem, 1)
+    assert {m: len(groups) for m, groups in unplaced.items()} == {1: 1, 2: 1}
+
+    assert reconcile_rooms(problem, module_day, module_slot, module_rooms, unplaced) == seated
+
+    # Reconciliation only takes rooms no other exam of the slot uses
+    owners = defaultdict(set)
+    for module_id, rooms in module_rooms.items():
+        for room_id, *_ in rooms:
+            owners[room_id].add(module_id)
+    assert all(len(modules) == 1 for modules in owners.values())
+    groups = sum(len(r[3].split(",")) for rooms in module_rooms.values() for r in rooms)
+    assert groups == 4 + seated
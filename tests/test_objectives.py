@@ -0,0 +1,60 @@
+"""Soft-objective scoring and local improvement on synthetic models."""
+
+from collections import Counter
+
+import pytest
+
+from scripts.objectives import Scorer, improve_days, score_schedule
+from scripts.planner import solve_slots
+from scripts.solver import Problem, SlotRooms, build_conflicts, count_student_violations
+
+NUM_DAYS = 18
+
+# Students of formation 1 retaking modules of other formations, and back
+RETAKES = [(1, 7), (2, 13), (3, 13), (95, 1), (200, 30), (201, 31), (202, 7)]
+
+
+@pytest.mark.parametrize("retakes", [(), RETAKES], ids=["formations", "retakes"])
+def test_scorer_moves_match_a_fresh_score(make_model, retakes):
+    problem = Problem(make_model(retakes=retakes))
+    module_day, _, _ = solve_slots(problem, NUM_DAYS)
+    scorer = score_schedule(problem, module_day)
+
+    for module_id in problem.module_ids[::3]:
+        module_day[module_id] = (module_day[module_id] + 1) % NUM_DAYS
+        scorer.move(module_id, module_day[module_id])
+    assert scorer.total() == pytest.approx(score_schedule(problem, module_day).total())
+
+    for module_id in problem.module_ids:
+        scorer.remove(module_id)
+    assert scorer.total() == pytest.approx(0)
+
+
+def test_scorer_counts_retakers_of_adjacent_exams_once(make_model):
+    problem = Problem(make_model(retakes=[(1, 7), (2, 7)]))
+    scorer = Scorer(problem, {"regroupement": 0})
+    scorer.place(1, 0)
+    # Modules 1 (formation 1) and 7 (formation 2) share two retakers
+    assert scorer.place(7, 1) == 2
+    assert scorer.move(7, 3) == -2
+    assert scorer.move(1, 2) == 2
+
+
+@pytest.mark.parametrize("retakes", [(), RETAKES], ids=["formations", "retakes"])
+def test_improve_days_lowers_the_score_without_conflicts(make_model, retakes):
+    problem = Problem(make_model(retakes=retakes))
+    module_day, module_slot, violations = solve_slots(problem, NUM_DAYS)
+    assert violations == 0
+    slots = Counter((module_day[m], module_slot[m]) for m in problem.module_ids)
+    scorer = score_schedule(problem, module_day)
+    before = scorer.total()
+
+    conflicts = build_conflicts(problem) if retakes else None
+    swaps = improve_days(problem, module_day, module_slot, scorer, conflicts, SlotRooms(problem))
+
+    assert swaps > 0
+    assert scorer.total() < before
+    assert scorer.total() == pytest.approx(score_schedule(problem, module_day).total())
+    assert count_student_violations(problem, module_day) == 0
+    # Swaps exchange (day, slot) pairs: every slot keeps its exam count
+    assert Counter((module_day[m], module_slot[m]) for m in problem.module_ids) == slots
@@ -0,0 +1,57 @@
+from scripts.planner import (
+    current_resources, evaluate, plan_resources, scenario, session_demand, solve_slots,
+)
+from scripts.solver import Problem, assign_rooms, session_caps
+
+NUM_DAYS = 18
+
+
+def test_session_caps_are_positional():
+    # Ids need not be 1..N: the extra sessions go to the first professors listed
+    assert session_caps(7, [51, 5, 80]) == (2, frozenset({5}))
+    assert session_caps(6, [51, 5, 80]) == (2, frozenset())
+
+
+def test_shrunk_scenario_covers_every_session(make_model):
+    problem = Problem(make_model(formations=16, profs_per_dept=50))
+    slots = solve_slots(problem, NUM_DAYS)
+    base = current_resources(problem)
+    # The first 30 professors of each department: ids 1-30, 51-80, ...
+    resources = {**base, **{d: 30 for d in base if d not in ("Amphi", "Salle_TD")}}
+    planned = scenario(problem, resources)
+    assert planned.prof_ids[30] == 51
+
+    metrics = evaluate(problem, slots, resources)
+    assert metrics["surveillances_manquantes"] == 0
+    assert metrics["ecart_sessions"] <= 1
+
+
+def test_scenario_adds_professors_above_the_largest_id(make_model):
+    problem = Problem(make_model(depts=2, profs_per_dept=3))
+    planned = scenario(problem, {**current_resources(problem), 1: 5})
+    assert planned.prof_ids == [1, 2, 3, 4, 5, 6, 7, 8]
+    assert [planned.professors[p]["dept_id"] for p in (7, 8)] == [1, 1]
+
+
+def test_plan_resources_minimum_is_close_to_the_bound(make_model):
+    problem = Problem(make_model(formations=16, profs_per_dept=50))
+    base, minimums, combined, _ = plan_resources(problem, NUM_DAYS, workers=1)
+    assert combined["ok"]
+
+    slots = solve_slots(problem, NUM_DAYS)
+    rooms = {r: minimums[r] for r in ("Amphi", "Salle_TD")}
+    dept_sessions, _, busiest_slot = session_demand(problem, slots, {**base, **rooms})
+    professors = sum(minimums[d] for d in dept_sessions)
+    # Every professor can take a share of the sessions: far fewer than the 200 there are
+    assert busiest_slot <= professors < sum(base[d] for d in dept_sessions) // 2
+    assert min(minimums[d] for d in dept_sessions) > 0
+
+
+def test_room_minimums_seat_everyone(make_model):
+    problem = Problem(make_model(formations=16))
+    slots = solve_slots(problem, NUM_DAYS)
+    _, minimums, combined, _ = plan_resources(problem, NUM_DAYS, workers=1)
+    planned = scenario(problem, {**current_resources(problem), **minimums})
+    module_day, module_slot, _ = slots
+    assert assign_rooms(planned, module_day, module_slot)
+    assert combined["etudiants_sans_place"] == 0
@@ -0,0 +1,75 @@
+"""Phases 2-4 of the solver on synthetic models."""
+
+from collections import Counter
+
+import pytest
+
+from scripts.planner import solve_slots
+from scripts.solver import Problem, SlotRooms, assign_proctors, assign_rooms, proctors_needed
+
+NUM_DAYS = 18
+
+
+def schedule(model):
+    """(problem, module_day, module_slot, module_rooms) of a model, Phases 1-3."""
+    problem = Problem(model)
+    module_day, module_slot, violations = solve_slots(problem, NUM_DAYS)
+    assert violations == 0
+    return problem, module_day, module_slot, assign_rooms(problem, module_day, module_slot)
+
+
+@pytest.mark.parametrize("id_scale", [1, 10])
+def test_proctors_cover_every_room_within_the_limits(make_model, id_scale):
+    model = make_model()
+    # Professor ids far above the professor count (1, 11, 21, ...): caps are positional
+    model.prof_ids = model.prof_ids * id_scale + (id_scale > 1)
+    problem, module_day, module_slot, module_rooms = schedule(model)
+    exam_proctors, prof_sessions = assign_proctors(problem, module_day, module_slot, module_rooms)
+
+    needed = proctors_needed(module_rooms, problem.sittings)
+    assert all(len(exam_proctors[m]) == needed[m] for m in problem.module_ids)
+
+    per_day = Counter()
+    per_slot = Counter()
+    for module_id, proctors in exam_proctors.items():
+        assert len(set(proctors)) == len(proctors)
+        for prof_id in proctors:
+            per_day[prof_id, module_day[module_id]] += 1
+            per_slot[prof_id, module_day[module_id], module_slot[module_id]] += 1
+    assert max(per_day.values()) <= 3
+    assert max(per_slot.values()) == 1
+
+    sessions = [prof_sessions.get(p, 0) for p in problem.prof_ids]
+    assert max(sessions) - min(sessions) <= 1
+
+
+def test_slot_rooms_rank_fits_as_rooms_run_out(make_model):
+    # Groups of 30: two amphis (60 seats) per module, or six salles TD (20 seats)
+    problem = Problem(make_model(amphis=4, salles=12))
+    rooms = SlotRooms(problem)
+    assert rooms.capacity == (4, 12)
+    assert set(rooms.demand.values()) == {(2, 0)}
+
+    levels = []
+    for module_id in problem.module_ids[:6]:
+        levels.append(rooms.fit(module_id, 0, 0)[0])
+        rooms.take(module_id, 0, 0)
+    # Amphis first, then groups split over salles TD, then students without a seat
+    assert levels == [0, 0, 1, 1, 2, 2]
+    assert rooms.left[0, 0] == [-4, 0]
+    assert rooms.overbooked() == 1
+
+
+def test_slot_rooms_prefer_a_fitting_slot_to_a_less_loaded_one(make_model):
+    problem = Problem(make_model(amphis=2, salles=12))
+    rooms = SlotRooms(problem)
+    first, second = problem.module_ids[:2]
+    rooms.take(first, 0, 1)
+    # Slot 1 has no amphi left: slot 0 wins although it carries more exams
+    assert rooms.best_slot(second, 0, [5, 0, 9, 9]) == (0, 0)
+    assert rooms.best_slot(second, 0, [5, 0, 0, 9]) == (0, 2)
+
+
+def test_slot_rooms_report_unseatable_modules(make_model):
+    problem = Problem(make_model(formations=2, groups=1, group_size=200, amphis=1, salles=2))
+    assert SlotRooms(problem).unseatable == problem.module_ids